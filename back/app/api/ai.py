@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, status
 from dependency_injector.wiring import inject, Provide
 
 from app.core.container import Container
-from app.schemas.ai import AIPredictionRequest, AIPredictionResponse
+from app.schemas.ai import AIPredictionRequest, AIPredictionResponse, AIPredictionJob
 from app.services.ai import AIService
+from app.workers.prediction_jobs import PredictionJobManager
 
 router = APIRouter(
     prefix="/api/ai",
@@ -15,13 +16,54 @@ router = APIRouter(
 async def predict_demand(
     body: AIPredictionRequest,
     svc: AIService = Depends(Provide[Container.ai_service]),
+    jobs: PredictionJobManager = Depends(Provide[Container.prediction_jobs]),
 ):
     """
-    Прогноз спроса по складу.
+    Прогноз спроса по складу (синхронно).
+    Одинаковый запрос в окне свежести отдаётся из кеша без вызова LLM.
     """
     try:
+        key = await jobs.cache_key(body)
+        cached = await jobs.get_cached_result(key)
+        if cached is not None:
+            return cached
+
         result = await svc.predict(body)
+        await jobs.store_result(key, result)
         return result
     except Exception as e:
         # можно по-умному логировать здесь
         raise HTTPException(status_code=500, detail=f"Prediction failed: {e}")
+
+
+@router.post(
+    "/predict/jobs",
+    response_model=AIPredictionJob,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+@inject
+async def submit_prediction_job(
+    body: AIPredictionRequest,
+    jobs: PredictionJobManager = Depends(Provide[Container.prediction_jobs]),
+):
+    """
+    Поставить прогноз в фоновую очередь.
+    Возвращает job_id сразу; по готовности по WS приходит ai_prediction_ready.
+    Если такой же прогноз уже есть в кеше — задача сразу в статусе done.
+    """
+    return await jobs.submit(body)
+
+
+@router.get("/predict/jobs/{job_id}", response_model=AIPredictionJob)
+@inject
+async def get_prediction_job(
+    job_id: str,
+    jobs: PredictionJobManager = Depends(Provide[Container.prediction_jobs]),
+):
+    """
+    Опрос состояния задачи прогноза: pending / running / done / failed.
+    """
+    job = await jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Prediction job not found")
+    return job
@@ -1,7 +1,11 @@
 # app/api/dashboard.py
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from dependency_injector.wiring import inject, Provide
 
+from app.core.http_cache import conditional_get
+from app.core.serialization import model_response
+from app.core.settings import settings
+
 from app.schemas.dashboard import DashboardResponse
 from app.services.dashboard import DashboardService
 from app.core.container import Container  # контейнер DI
@@ -12,6 +16,8 @@ router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 @router.get("/current", response_model=DashboardResponse)
 @inject
 async def get_dashboard_current(
+    request: Request,
+    response: Response,
     svc: DashboardService = Depends(Provide[Container.dashboard_service]),
 ):
     """
@@ -23,5 +29,18 @@ async def get_dashboard_current(
       "recent_scans": [...],
       "statistics": {...}
     }
+
+    Поддерживает If-None-Match / If-Modified-Since: пока не было ни телеметрии,
+    ни новых сканов, отвечает 304 без запросов в БД — но не дольше
+    DASHBOARD_ETAG_BUCKET_SECONDS: "сканов за последний час" стареет и без них.
     """
-    return await svc.get_dashboard_data()
+    not_modified = await conditional_get(
+        request, response, ("inventory", "robots"), "dashboard",
+        bucket_seconds=settings.DASHBOARD_ETAG_BUCKET_SECONDS,
+    )
+    if not_modified is not None:
+        return not_modified
+    # версия данных — в ключ single-flight: тело соответствует отданному ETag;
+    # модель уже провалидирована сервисом — сериализуем напрямую, без второго прохода
+    data = await svc.get_dashboard_data(version=getattr(request.state, "etag", None))
+    return model_response(data, response)
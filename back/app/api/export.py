@@ -1,11 +1,12 @@
-from typing import List
+from datetime import datetime
+from typing import List, Literal, Optional
 from fastapi import APIRouter, Query, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from dependency_injector.wiring import inject, Provide
 from io import BytesIO
 
 from app.core.container import Container
-from app.services.export_service import ExportService
+from app.services.export_service import EXPORT_FORMATS, ExportFormatUnavailable, ExportService
 
 router = APIRouter(
     prefix="/api/export",
@@ -46,3 +47,45 @@ async def export_excel(
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers=headers,
     )
+
+
+@router.get("/history")
+@inject
+async def export_history(
+    format: Literal["ndjson", "csv", "arrow"] = Query("ndjson"),
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = Query(None, alias="to"),
+    zone: Optional[str] = Query(None),
+    status: Optional[str] = Query(None),
+    product_id: Optional[str] = Query(None),
+    batch_size: int = Query(5000, ge=100, le=50_000),
+    svc: ExportService = Depends(Provide[Container.export_service]),
+):
+    """
+    Массовая выгрузка истории (без пагинации), фильтры — как у /api/inventory/history:
+    GET /api/export/history?format=csv&from=2025-10-01T00:00:00&zone=A
+
+    format:
+      ndjson — по JSON-объекту на строку (application/x-ndjson)
+      csv    — с заголовком
+      arrow  — Apache Arrow IPC stream, record batch на каждые batch_size строк
+    """
+    try:
+        body = svc.stream_inventory_history(
+            format,
+            dt_from=from_,
+            dt_to=to,
+            zones=[zone] if zone else None,
+            statuses=[status.upper()] if status else None,
+            product_id=product_id,
+            batch_size=batch_size,
+        )
+    except ExportFormatUnavailable as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    media_type, ext = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="inventory_history.{ext}"'},
+    )
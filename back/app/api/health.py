@@ -1,4 +1,17 @@
-from fastapi import APIRouter
+import asyncio
+import time
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends, Response
+from fastapi.responses import JSONResponse
+from dependency_injector.wiring import inject, Provide
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.container import Container
+from app.core.metrics import CONTENT_TYPE_LATEST, render_latest
+from app.core.settings import settings
+from app.services.cache import CacheService
 
 router = APIRouter(
     tags=["health"],
@@ -7,4 +20,59 @@ router = APIRouter(
 
 @router.get("/ping", summary="Liveness probe")
 async def ping():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+async def _check_db(engine: AsyncEngine) -> Dict[str, Any]:
+    # время включает ожидание соединения из пула — так видно и насыщение пула
+    started = time.perf_counter()
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    rtt_ms = (time.perf_counter() - started) * 1000
+    return {"ok": rtt_ms <= settings.READY_DB_MAX_RTT_MS, "rtt_ms": round(rtt_ms, 2)}
+
+
+async def _check_redis(cache: CacheService) -> Dict[str, Any]:
+    if not settings.REDIS_URL:
+        return {"ok": True, "rtt_ms": None, "detail": "not configured"}
+    rtt_ms = await cache.ping()
+    if rtt_ms is None:
+        # CacheService переподключается в фоне; пока без кеша
+        return {"ok": not settings.READY_REQUIRE_REDIS, "rtt_ms": None, "detail": "disconnected"}
+    return {"ok": rtt_ms <= settings.READY_REDIS_MAX_RTT_MS, "rtt_ms": round(rtt_ms, 2)}
+
+
+async def _run_check(check) -> Dict[str, Any]:
+    try:
+        return await asyncio.wait_for(check, timeout=settings.READY_CHECK_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return {"ok": False, "rtt_ms": None, "detail": "timeout"}
+    except Exception as e:
+        return {"ok": False, "rtt_ms": None, "detail": str(e)}
+
+
+@router.get(
+    "/ready",
+    summary="Readiness probe",
+    description=(
+        "Проверяет Postgres (SELECT 1 через пул) и Redis (PING) и сравнивает время ответа "
+        "с порогами READY_DB_MAX_RTT_MS / READY_REDIS_MAX_RTT_MS. "
+        "503, если хотя бы одна проверка не прошла — балансировщик снимает трафик с воркера."
+    ),
+)
+@inject
+async def ready(
+    engine: AsyncEngine = Depends(Provide[Container.engine]),
+    cache: CacheService = Depends(Provide[Container.cache_service]),
+):
+    db, redis = await asyncio.gather(_run_check(_check_db(engine)), _run_check(_check_redis(cache)))
+    is_ready = db["ok"] and redis["ok"]
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"status": "ready" if is_ready else "degraded", "checks": {"db": db, "redis": redis}},
+    )
+
+
+@router.get("/metrics", summary="Метрики Prometheus", include_in_schema=False)
+async def metrics():
+    return Response(content=render_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,10 +1,12 @@
 from datetime import datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from dependency_injector.wiring import inject, Provide
 
 from app.core.container import Container
+from app.core.http_cache import conditional_get
+from app.core.serialization import model_response
 from app.services.history import HistoryService
 from app.schemas.inventory import (
     InventoryHistoryResponse,
@@ -21,6 +23,9 @@ router = APIRouter(
 @router.get("/history", response_model=InventoryHistoryResponse)
 @inject
 async def get_history(
+    request: Request,
+    response: Response,
+
     # фильтры периода и выборок
     from_: Optional[datetime] = Query(None, alias="from"),
     to: Optional[datetime] = Query(None, alias="to"),
@@ -45,7 +50,13 @@ async def get_history(
       "items": [...],
       "pagination": { "limit": x, "offset": y }
     }
+
+    ETag зависит только от версии истории: повторный запрос той же страницы
+    без новых сканов получает 304 без запросов в БД.
     """
+    not_modified = await conditional_get(request, response, ("inventory",), "inventory_history")
+    if not_modified is not None:
+        return not_modified
 
     # адаптация query-параметров к сигнатуре сервиса HistoryService.get_history
     zones = [zone] if zone else None
@@ -65,14 +76,14 @@ async def get_history(
         sort_dir=sort_dir,
     )
 
-
-    response = InventoryHistoryResponse(
+    body = InventoryHistoryResponse.model_construct(
         total=service_result.total,
         items=service_result.items,
-        pagination=PaginationOut(
+        pagination=PaginationOut.model_construct(
             limit=service_result.limit,
             offset=service_result.offset,
         ),
     )
-    return response
+    # строки уже собраны сервисом; без повторной валидации (ни здесь, ни в response_model)
+    return model_response(body, response)
 
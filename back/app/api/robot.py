@@ -1,20 +1,68 @@
 # app/api/robot.py
 
-from fastapi import APIRouter, Depends, status, Request, HTTPException
+import time
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends, status, Request, Response, HTTPException
+from fastapi.exceptions import RequestValidationError
 from dependency_injector.wiring import inject, Provide
+from pydantic import ValidationError
 import structlog
 
-from app.services.robot import RobotService
+from app.core.admission import AdmissionController
+from app.services.robot import RobotService, validate_scans
 from app.core.container import Container
+from app.core.http_cache import conditional_get
+from app.core.metrics import INGEST_FAILURES, INGEST_FRAMES, INGEST_LATENCY
 
 from app.schemas.robot import RobotBase, RobotRegisterRequest, RobotRegisterResponse, RobotsListResponse
 from app.schemas.request import RobotIngestResponse, RobotIngestResult
+from app.schemas import robot_compact
 
 logger = structlog.get_logger(__name__)
 
 router = APIRouter(prefix="/robots", tags=["robot"])
 
 
+def _inline_schema(model) -> Dict[str, Any]:
+    """JSON Schema модели без $defs (подставляем определения на место ссылок) — для openapi_extra."""
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    def resolve(node):
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if ref and ref.startswith("#/$defs/"):
+                return resolve(defs[ref[len("#/$defs/"):]])
+            return {k: resolve(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [resolve(v) for v in node]
+        return node
+
+    return resolve(schema)
+
+
+async def _read_robot_payload(request: Request) -> RobotBase:
+    """
+    Тело /robots/data: JSON (RobotBase) или компактный msgpack-кадр
+    (Content-Type: application/x-msgpack, см. app/schemas/robot_compact.py).
+    """
+    body = await request.body()
+    if robot_compact.is_msgpack(request.headers.get("content-type")):
+        try:
+            frames = robot_compact.decode_message(body)
+        except robot_compact.CompactFrameError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if len(frames) != 1:
+            raise HTTPException(status_code=422, detail="Exactly one frame expected")
+        return frames[0]
+
+    try:
+        return RobotBase.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+
+
 @router.post(
     "/data",
     status_code=status.HTTP_200_OK,
@@ -23,8 +71,25 @@ router = APIRouter(prefix="/robots", tags=["robot"])
     description=(
         "Робот отправляет своё состояние и результаты сканирования полок. "
         "Запрос должен быть аутентифицирован через RobotAuthMiddleware "
-        "(заголовок `Authorization: Bearer <robot_token>`)."
+        "(заголовок `Authorization: Bearer <robot_token>`).\n\n"
+        "Помимо JSON принимается компактный msgpack-кадр "
+        "(`Content-Type: application/x-msgpack`, формат — в app/schemas/robot_compact.py).\n\n"
+        "При перегрузке или превышении лимита робота — 429 с `Retry-After`.\n\n"
+        "Заголовок `Idempotency-Key` (до 100 символов, уникален в пределах робота) делает "
+        "повтор безопасным: кадр с уже принятым ключом ничего не пишет и получает 200 "
+        "с `duplicate: true`."
     ),
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": _inline_schema(RobotBase)},
+                robot_compact.MSGPACK_MEDIA_TYPE: {
+                    "schema": {"type": "string", "format": "binary"},
+                },
+            },
+        },
+    },
     responses={
         200: {
             "description": "Данные успешно записаны",
@@ -68,6 +133,14 @@ router = APIRouter(prefix="/robots", tags=["robot"])
                 }
             },
         },
+        429: {
+            "description": "Воркер перегружен или робот превысил свой лимит кадров; повторить через Retry-After",
+            "content": {
+                "application/json": {
+                    "example": {"detail": "Rate limit exceeded. Try again in 1 seconds"}
+                }
+            },
+        },
         500: {
             "description": "Ошибка сервера при обработке данных робота",
             "content": {
@@ -83,8 +156,8 @@ router = APIRouter(prefix="/robots", tags=["robot"])
 @inject
 async def upload_robot_data(
     request: Request,
-    payload: RobotBase,
     service: RobotService = Depends(Provide[Container.robot_service]),
+    admission: AdmissionController = Depends(Provide[Container.ingest_admission]),
 ) -> RobotIngestResponse:
     """
     Этот докстринг не попадёт в Swagger (там уже есть summary/description),
@@ -98,6 +171,11 @@ async def upload_robot_data(
 
     robot_id_from_token = robot_ctx["robot_id"]
 
+    # лимит робота — до чтения и разбора тела
+    admission.check_rate(robot_id_from_token)
+
+    payload = await _read_robot_payload(request)
+
     # 2. Проверяем, что робот не подменил свой ID в теле запроса
     if payload.robot_id != robot_id_from_token:
         logger.warning(
@@ -110,19 +188,37 @@ async def upload_robot_data(
             detail="Robot ID mismatch: token does not match payload",
         )
 
-    # 3. Обрабатываем данные робота через доменную логику
     try:
-        result_data = await service.process_robot_data(payload)
-    except Exception as e:
-        logger.exception("robot.upload_failed", robot_id=payload.robot_id, error=str(e))
-        raise HTTPException(
-            status_code=500,
-            detail="Failed to process robot data",
-        )
+        validate_scans(payload)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    idempotency_key = request.headers.get("idempotency-key")
+    if idempotency_key:
+        if len(idempotency_key) > 100:
+            raise HTTPException(status_code=422, detail="Idempotency-Key is too long (max 100)")
+        payload.idempotency_key = idempotency_key
+
+    # 3. Обрабатываем данные робота через доменную логику;
+    #    слот admission ограничивает число одновременных записей (соединений БД)
+    INGEST_FRAMES.labels("http").inc()
+    started = time.perf_counter()
+    async with admission.slot():
+        try:
+            result_data = await service.process_robot_data(payload)
+        except Exception as e:
+            INGEST_FAILURES.labels("http").inc()
+            logger.exception("robot.upload_failed", robot_id=payload.robot_id, error=str(e))
+            raise HTTPException(
+                status_code=500,
+                detail="Failed to process robot data",
+            )
+
+    INGEST_LATENCY.labels("http").observe(time.perf_counter() - started)
 
     # 4. Возвращаем унифицированный ответ
     return RobotIngestResponse(
-        detail="Robot data processed successfully",
+        detail="Duplicate frame ignored" if result_data.get("duplicate") else "Robot data processed successfully",
         result=RobotIngestResult(**result_data),
     )
 
@@ -159,6 +255,12 @@ async def register_robot(
             summary="Получить список всех роботов", description="Возвращает лист всех зарегестрированных роботов")
 @inject
 async def get_all_robots(
+    request: Request,
+    response: Response,
     service: RobotService = Depends(Provide[Container.robot_service]),
 ) -> RobotsListResponse:
+    # ETag по версии состояния роботов: между кадрами телеметрии — 304 без БД
+    not_modified = await conditional_get(request, response, ("robots",), "robots_all")
+    if not_modified is not None:
+        return not_modified
     return await service.get_all_robots()
\ No newline at end of file
@@ -1,9 +1,24 @@
 # app/api/ws.py
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+import asyncio
+import json
+from typing import Any, Set, Tuple, Union
+
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
+from dependency_injector.wiring import inject, Provide
+from pydantic import ValidationError
 import structlog
 
+from app.core.admission import AdmissionController
+from app.core.container import Container
+from app.core.exeptions import RateLimitExceededException
+from app.core.serialization import encode_ws
+from app.core.settings import settings
+from app.schemas.robot import RobotBase
+from app.schemas import robot_compact
+from app.services.robot import validate_scans
 from app.ws.connection_manager import connection_manager
-from app.ws.auth_ws import authenticate_websocket
+from app.ws.auth_ws import authenticate_websocket, authenticate_robot_websocket
+from app.workers.robot_ingest import RobotIngestBatcher, ack_message, error_message
 
 logger = structlog.get_logger(__name__)
 
@@ -41,10 +56,10 @@ async def websocket_notifications(websocket: WebSocket):
             logger.info("ws_client_message", user_id=user_id, data=data)
 
             # Можно тут же отправить что-то обратно
-            await websocket.send_json({
+            await websocket.send_text(encode_ws({
                 "type": "ack",
                 "received": data,
-            })
+            }))
 
     except WebSocketDisconnect:
         logger.info("ws_disconnected_by_client", user_id=user_id)
@@ -56,3 +71,129 @@ async def websocket_notifications(websocket: WebSocket):
         connection_manager.disconnect(user_id, websocket)
         # Явно закрывать websocket не обязательно, если это был WebSocketDisconnect
         # Если хочешь жёстко: await websocket.close()
+
+
+def _parse_json_frame(raw: Any, robot_id: str) -> Tuple[Any, Union[RobotBase, ValueError]]:
+    """
+    JSON-кадр — тот же объект, что тело POST /api/robots/data, плюс необязательный "seq"
+    (и "idempotency_key" — аналог заголовка Idempotency-Key у POST).
+    robot_id можно не присылать: он уже известен из токена.
+    Возвращает (seq, RobotBase) или (seq, ошибка).
+    """
+    if not isinstance(raw, dict):
+        return None, ValueError("Frame must be a JSON object")
+    frame = dict(raw)
+    seq = frame.pop("seq", None)
+    frame.setdefault("robot_id", robot_id)
+    try:
+        return seq, RobotBase.model_validate(frame)
+    except ValidationError as e:
+        return seq, e
+
+
+@ws_router.websocket("/ws/robots")
+@inject
+async def websocket_robots(
+    websocket: WebSocket,
+    batcher: RobotIngestBatcher = Depends(Provide[Container.robot_ingest_batcher]),
+    admission: AdmissionController = Depends(Provide[Container.ingest_admission]),
+):
+    """
+    Стриминговый приём телеметрии: токен робота проверяется один раз при подключении,
+    дальше робот шлёт кадры (объект или массив объектов; в бинарных сообщениях — компактные
+    msgpack-кадры из app/schemas/robot_compact.py) без HTTP-обвязки на каждый тик.
+    Кадры со всех соединений пишутся в БД пачками (RobotIngestBatcher), на каждый кадр
+    приходит {"type": "ack", "seq": ...} или {"type": "error", "seq": ..., "detail": ...}.
+    Не больше ROBOT_WS_MAX_INFLIGHT кадров без ack на соединение — дальше чтение
+    из сокета приостанавливается (backpressure). Кадры сверх лимита робота
+    (ROBOT_RATE_LIMIT_PER_SECOND) отклоняются с "retry_after" в ошибке.
+    """
+    # 1. Проверяем токен робота (один раз на соединение)
+    try:
+        robot_id = await authenticate_robot_websocket(websocket)
+    except Exception as e:
+        logger.warning("ws_robot_auth_failed", error=str(e))
+        raise
+
+    await websocket.accept()
+
+    inflight = asyncio.Semaphore(settings.ROBOT_WS_MAX_INFLIGHT)
+    send_lock = asyncio.Lock()
+    pending: Set[asyncio.Task] = set()
+
+    async def send(message: dict) -> None:
+        async with send_lock:
+            await websocket.send_text(encode_ws(message))
+
+    async def ack_when_written(seq: Any, fut: asyncio.Future) -> None:
+        connection_manager.robot_pending_acks += 1
+        try:
+            try:
+                result = await fut
+            except Exception:
+                await send(error_message(seq, "Failed to process robot data"))
+            else:
+                await send(ack_message(seq, result))
+        except Exception as e:
+            logger.warning("ws_robot_ack_failed", robot_id=robot_id, seq=seq, error=str(e))
+        finally:
+            connection_manager.robot_pending_acks -= 1
+            inflight.release()
+
+    connection_manager.robot_connections += 1
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            # бинарное сообщение — компактные msgpack-кадры, текстовое — JSON
+            if message.get("bytes") is not None:
+                try:
+                    frames = robot_compact.decode_frames_with_seq(message["bytes"], robot_id)
+                except robot_compact.CompactFrameError as e:
+                    await send(error_message(None, str(e)))
+                    continue
+            else:
+                try:
+                    data = json.loads(message.get("text") or "")
+                except ValueError:
+                    await send(error_message(None, "Invalid JSON"))
+                    continue
+                frames = [_parse_json_frame(raw, robot_id) for raw in (data if isinstance(data, list) else [data])]
+
+            for seq, frame in frames:
+                if not isinstance(frame, RobotBase):
+                    logger.warning("ws_robot_frame_rejected", robot_id=robot_id, seq=seq, error=str(frame))
+                    await send(error_message(seq, str(frame)))
+                    continue
+                if frame.robot_id != robot_id:
+                    await send(error_message(seq, "Robot ID mismatch: token does not match payload"))
+                    continue
+                # плохой скан отклоняем здесь: в пачке он откатил бы кадры всех роботов
+                try:
+                    validate_scans(frame)
+                except ValueError as e:
+                    await send(error_message(seq, str(e)))
+                    continue
+                try:
+                    admission.check_rate(robot_id)
+                except RateLimitExceededException as e:
+                    await send(error_message(seq, e.detail, retry_after=int(e.headers["Retry-After"])))
+                    continue
+
+                await inflight.acquire()
+                fut = await batcher.submit(frame)
+                task = asyncio.create_task(ack_when_written(seq, fut))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+
+    except WebSocketDisconnect:
+        logger.info("ws_robot_disconnected", robot_id=robot_id)
+    except Exception as e:
+        logger.warning("ws_robot_error", robot_id=robot_id, error=str(e))
+    finally:
+        connection_manager.robot_connections -= 1
+        # уже принятые кадры батчер допишет; ack слать некуда
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,116 @@
+# app/core/admission.py
+"""
+Admission control для приёма телеметрии (POST /api/robots/data, /ws/robots).
+
+Без ограничений шторм телеметрии запускает столько одновременных записей, сколько
+пришло запросов: каждая держит соединение из пула БД, пул и max_overflow кончаются,
+и все запросы разом падают по таймауту. Здесь:
+
+- на воркер одновременно пишут не больше INGEST_MAX_CONCURRENT запросов;
+- следующие ждут в короткой FIFO-очереди: не больше INGEST_MAX_WAITING запросов,
+  не дольше INGEST_QUEUE_TIMEOUT_MS;
+- очередь полна или ожидание истекло — 429 с Retry-After (INGEST_RETRY_AFTER_SECONDS):
+  робот повторит позже, а не повиснет на таймауте вместе со всеми;
+- per-robot token bucket (ROBOT_RATE_LIMIT_PER_SECOND, ROBOT_RATE_LIMIT_BURST): робот,
+  шлющий кадры чаще лимита, получает 429 с Retry-After до следующего токена ещё до
+  чтения тела и не занимает места в очереди остальных. 0 — без лимита.
+
+Лимиты — в пределах процесса (воркера uvicorn).
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Tuple
+
+from app.core.exeptions import RateLimitExceededException
+from app.core.metrics import INGEST_ADMISSION
+
+_MAX_BUCKETS = 100_000
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrent: int = 24,
+        max_waiting: int = 100,
+        queue_timeout: float = 0.5,
+        retry_after: int = 1,
+        robot_rate: float = 0.0,
+        robot_burst: int = 1,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.robot_rate = robot_rate
+        self.robot_burst = max(1, robot_burst)
+        self.active = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(max_concurrent)
+        # robot_id -> (токены, момент обновления)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    # ---------------------------
+    # PER-ROBOT RATE LIMIT
+    # ---------------------------
+
+    def check_rate(self, robot_id: str) -> None:
+        """Списывает токен робота; нет токена — RateLimitExceededException (429)."""
+        if self.robot_rate <= 0:
+            return
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(robot_id, (float(self.robot_burst), now))
+        tokens = min(float(self.robot_burst), tokens + (now - updated) * self.robot_rate)
+        if tokens < 1.0:
+            self._buckets[robot_id] = (tokens, now)
+            INGEST_ADMISSION.labels("rate_limited").inc()
+            raise RateLimitExceededException(retry_after=max(1, math.ceil((1.0 - tokens) / self.robot_rate)))
+        self._buckets[robot_id] = (tokens - 1.0, now)
+        if len(self._buckets) > _MAX_BUCKETS:
+            self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        # полные корзины ничего не помнят — их можно выбросить
+        refill = self.robot_burst / self.robot_rate
+        for robot_id in [r for r, (_, updated) in self._buckets.items() if now - updated >= refill]:
+            del self._buckets[robot_id]
+
+    # ---------------------------
+    # ОГРАНИЧЕНИЕ КОНКУРЕНТНОСТИ
+    # ---------------------------
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Слот на запись: сразу, если есть свободный; иначе ожидание в очереди.
+        Очередь полна или таймаут — RateLimitExceededException (429, Retry-After).
+        """
+        if self._slots.locked():
+            if self.waiting >= self.max_waiting:
+                INGEST_ADMISSION.labels("rejected").inc()
+                raise RateLimitExceededException(retry_after=self.retry_after)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                INGEST_ADMISSION.labels("timed_out").inc()
+                raise RateLimitExceededException(retry_after=self.retry_after) from None
+            finally:
+                self.waiting -= 1
+            INGEST_ADMISSION.labels("queued").inc()
+        else:
+            await self._slots.acquire()
+            INGEST_ADMISSION.labels("admitted").inc()
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {"active": self.active, "waiting": self.waiting}
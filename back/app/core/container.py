@@ -4,6 +4,7 @@ from dependency_injector import containers, providers
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.settings import settings
+from app.core.admission import AdmissionController
 
 from app.repo.user import UserRepository
 from app.repo.robot import RobotRepository
@@ -12,12 +13,18 @@ from app.repo.product import ProductRepository
 
 from app.services.auth import AuthService
 from app.services.cache import CacheService
+from app.services.product_cache import KnownProductsCache
+from app.services.scan_filter import ScanChangeFilter
 from app.services.robot import RobotService
 from app.services.history import HistoryService
+from app.services.history_archive import create_history_archive
+from app.services.analytics import create_analytics_engine
 from app.services.dashboard import DashboardService
 from app.services.import_inventory import InventoryImportService
 from app.services.export_service import ExportService
-from app.services.ai import AIService
+from app.services.ai import AIService, create_openrouter_client
+from app.workers.prediction_jobs import PredictionJobManager
+from app.workers.robot_ingest import RobotIngestBatcher
 
 
 class Container(containers.DeclarativeContainer):
@@ -46,8 +53,27 @@ class Container(containers.DeclarativeContainer):
         async_session_factory
     )
     cache_service = providers.Singleton(CacheService)
+    known_products_cache = providers.Singleton(
+        KnownProductsCache,
+        cache_service=cache_service,
+        max_size=settings.PRODUCT_CACHE_MAX_SIZE,
+        ttl_seconds=settings.PRODUCT_CACHE_TTL_SECONDS,
+    )
+    scan_change_filter = providers.Singleton(
+        ScanChangeFilter,
+        cache_service=cache_service,
+        enabled=settings.INGEST_STORE_ON_CHANGE,
+        heartbeat_seconds=settings.INGEST_HEARTBEAT_SECONDS,
+    )
     # # message_broker = providers.Singleton(MessageBroker)
 
+    # закрытие лениво созданных ресурсов: их фабрики добавляют сюда корутину закрытия,
+    # lifespan вызывает её на shutdown (несозданное не создаётся ради закрытия)
+    shutdown_hooks = providers.Singleton(list)
+
+    # общий HTTP-клиент (пул keep-alive) для OpenRouter
+    openrouter_client = providers.Singleton(create_openrouter_client, shutdown_hooks=shutdown_hooks)
+
     # repos
     user_repository = providers.Factory(
         UserRepository,
@@ -75,9 +101,21 @@ class Container(containers.DeclarativeContainer):
         user_repo=user_repository,
     )
 
+    # Parquet-архив старой истории (None, если HISTORY_ARCHIVE_DIR не задан)
+    history_archive = providers.Singleton(create_history_archive)
+
+    # DuckDB-реплика истории для тяжёлых агрегатов (None, если ANALYTICS_ENGINE=off)
+    analytics_engine = providers.Singleton(
+        create_analytics_engine,
+        repo_factory=inventory_repository.provider,
+        archive=history_archive,
+    )
+
     history_service = providers.Factory(
         HistoryService,
         repo=inventory_repository,
+        archive=history_archive,
+        analytics=analytics_engine,
     )
 
     robot_service = providers.Factory(
@@ -85,6 +123,11 @@ class Container(containers.DeclarativeContainer):
         robot_repo=robot_repository,
         product_repo=product_repository,
         history_repo=inventory_repository,
+        product_cache=known_products_cache,
+        cache_service=cache_service,
+        idempotency_window=settings.INGEST_IDEMPOTENCY_WINDOW_SECONDS,
+        keys_prune_interval=settings.INGEST_IDEMPOTENCY_PRUNE_SECONDS,
+        scan_filter=scan_change_filter,
     )
 
     dashboard_service = providers.Factory(
@@ -95,6 +138,7 @@ class Container(containers.DeclarativeContainer):
     inventory_import_service = providers.Factory(
         InventoryImportService,
         history_repo=inventory_repository,
+        cache_service=cache_service,
     )
 
     export_service = providers.Factory(
@@ -106,4 +150,32 @@ class Container(containers.DeclarativeContainer):
         AIService,
         product_repo=product_repository,
         inventory_repo=inventory_repository,
+        http_client=openrouter_client,
+        analytics=analytics_engine,
+    )
+
+    prediction_jobs = providers.Singleton(
+        PredictionJobManager,
+        ai_service_factory=ai_service.provider,
+        cache_service=cache_service,
+        result_ttl_seconds=settings.AI_RESULT_CACHE_TTL_SECONDS,
+        job_ttl_seconds=settings.AI_JOB_TTL_SECONDS,
+        max_concurrency=settings.AI_MAX_CONCURRENT_JOBS,
+    )
+
+    robot_ingest_batcher = providers.Singleton(
+        RobotIngestBatcher,
+        robot_service_factory=robot_service.provider,
+        max_batch=settings.ROBOT_WS_BATCH_SIZE,
+        max_delay=settings.ROBOT_WS_BATCH_DELAY_MS / 1000.0,
+    )
+
+    ingest_admission = providers.Singleton(
+        AdmissionController,
+        max_concurrent=settings.INGEST_MAX_CONCURRENT,
+        max_waiting=settings.INGEST_MAX_WAITING,
+        queue_timeout=settings.INGEST_QUEUE_TIMEOUT_MS / 1000.0,
+        retry_after=settings.INGEST_RETRY_AFTER_SECONDS,
+        robot_rate=settings.ROBOT_RATE_LIMIT_PER_SECOND,
+        robot_burst=settings.ROBOT_RATE_LIMIT_BURST,
     )
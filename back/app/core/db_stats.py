@@ -0,0 +1,214 @@
+# app/core/db_stats.py
+"""
+Учёт SQL-запросов на HTTP-запрос и лог медленных запросов.
+
+Слушатели before/after_cursor_execute вешаются на класс Engine, поэтому
+покрывают все движки приложения (контейнер, app.db.session, бенчмарки).
+
+На каждый HTTP-запрос DBStatsMiddleware заводит RequestDBStats в contextvar:
+  - число выражений, суммарное время в БД и самое медленное выражение;
+  - db_queries / db_time_ms / db_slowest_ms кладутся в structlog contextvars,
+    так что их видно во всех логах, написанных в ходе запроса;
+  - по завершении пишется строка "http.db_stats";
+  - при SQL_STATS_HEADER=true (dev) стоимость отдаётся в заголовках ответа
+    X-DB-Cost и Server-Timing.
+
+Выражения дольше SQL_SLOW_QUERY_MS пишутся в "db.slow_query" вместе с параметрами;
+при SQL_SLOW_QUERY_EXPLAIN=true для SELECT дополнительно снимается EXPLAIN
+(в savepoint на том же соединении, чтобы ошибка не ломала транзакцию запроса).
+"""
+from __future__ import annotations
+
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+import structlog
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.settings import settings
+
+logger = structlog.get_logger(__name__)
+
+_STATEMENT_LOG_LIMIT = 2000
+_PARAMS_LOG_LIMIT = 2000
+_STARTED_KEY = "db_stats_started"
+
+
+@dataclass
+class RequestDBStats:
+    queries: int = 0
+    total_ms: float = 0.0
+    slowest_ms: float = 0.0
+    slowest_statement: Optional[str] = None
+
+    def add(self, statement: str, elapsed_ms: float) -> None:
+        self.queries += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms >= self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_statement = statement
+
+    def as_log(self) -> dict:
+        return {
+            "db_queries": self.queries,
+            "db_time_ms": round(self.total_ms, 2),
+            "db_slowest_ms": round(self.slowest_ms, 2),
+        }
+
+    def header_value(self) -> str:
+        return f"queries={self.queries}; time_ms={self.total_ms:.2f}; slowest_ms={self.slowest_ms:.2f}"
+
+
+_current: ContextVar[Optional[RequestDBStats]] = ContextVar("db_request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestDBStats]:
+    return _current.get()
+
+
+def start_request_stats() -> RequestDBStats:
+    """Новый счётчик для текущего контекста (HTTP-запрос, задача, бенчмарк)."""
+    stats = RequestDBStats()
+    _current.set(stats)
+    return stats
+
+
+# ---------------------------
+# Слушатели движка
+# ---------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_STARTED_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started: List[float] = conn.info.get(_STARTED_KEY) or []
+    if not started:
+        return
+    elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+
+    stats = _current.get()
+    if stats is not None:
+        stats.add(statement, elapsed_ms)
+        structlog.contextvars.bind_contextvars(**stats.as_log())
+
+    threshold = settings.SQL_SLOW_QUERY_MS
+    if threshold > 0 and elapsed_ms >= threshold:
+        _log_slow_query(conn, statement, parameters, executemany, elapsed_ms)
+
+
+def _log_slow_query(conn, statement: str, parameters: Any, executemany: bool, elapsed_ms: float) -> None:
+    plan = None
+    if settings.SQL_SLOW_QUERY_EXPLAIN and not executemany and _is_select(statement):
+        plan = _explain(conn, statement, parameters)
+
+    logger.warning(
+        "db.slow_query",
+        elapsed_ms=round(elapsed_ms, 2),
+        statement=_truncate(statement, _STATEMENT_LOG_LIMIT),
+        params=_truncate(repr(parameters), _PARAMS_LOG_LIMIT),
+        executemany=executemany,
+        plan=plan,
+    )
+
+
+def _is_select(statement: str) -> bool:
+    head = statement.lstrip()[:6].upper()
+    return head.startswith("SELECT") or head.startswith("WITH")
+
+
+def _explain(conn, statement: str, parameters: Any) -> Optional[str]:
+    """
+    EXPLAIN того же выражения с теми же параметрами через DBAPI-курсор.
+    Слушатель выполняется внутри execute, поэтому идём мимо Connection.execute
+    (иначе рекурсия событий) и страхуемся savepoint-ом.
+    """
+    dbapi_conn = conn.connection
+    cursor = dbapi_conn.cursor()
+    try:
+        cursor.execute("SAVEPOINT db_stats_explain")
+        try:
+            if parameters:
+                cursor.execute("EXPLAIN " + statement, parameters)
+            else:
+                cursor.execute("EXPLAIN " + statement)
+            rows = cursor.fetchall()
+            cursor.execute("RELEASE SAVEPOINT db_stats_explain")
+        except Exception:
+            cursor.execute("ROLLBACK TO SAVEPOINT db_stats_explain")
+            raise
+        return "\n".join(" ".join(str(col) for col in row) for row in rows)
+    except Exception as e:
+        logger.warning("db.slow_query_explain_failed", error=str(e))
+        return None
+    finally:
+        cursor.close()
+
+
+def _truncate(value: str, limit: int) -> str:
+    return value if len(value) <= limit else value[:limit] + "..."
+
+
+def install_sql_tracing() -> None:
+    """Повесить слушатели на все движки (повторный вызов ничего не делает)."""
+    if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ---------------------------
+# ASGI middleware
+# ---------------------------
+
+class DBStatsMiddleware:
+    """
+    Чистый ASGI (не BaseHTTPMiddleware): заголовок добавляется в http.response.start
+    без буферизации тела, стриминговые ответы (экспорт) не ломаются.
+    """
+
+    def __init__(self, app: ASGIApp, expose_header: Optional[bool] = None):
+        self.app = app
+        self.expose_header = settings.SQL_STATS_HEADER if expose_header is None else expose_header
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestDBStats()
+        token = _current.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.expose_header:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-db-cost", stats.header_value().encode()))
+                    headers.append((
+                        b"server-timing",
+                        f'db;dur={stats.total_ms:.2f};desc="{stats.queries} queries"'.encode(),
+                    ))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            if stats.queries:
+                logger.info(
+                    "http.db_stats",
+                    method=scope.get("method"),
+                    path=scope.get("path"),
+                    status_code=status_code,
+                    db_slowest_statement=_truncate(stats.slowest_statement or "", 300),
+                    **stats.as_log(),
+                )
+            structlog.contextvars.unbind_contextvars("db_queries", "db_time_ms", "db_slowest_ms")
@@ -0,0 +1,135 @@
+# app/core/http_cache.py
+"""
+Условные GET (ETag / Last-Modified -> 304) для опрашиваемых read-эндпойнтов.
+
+Валидатор строится не из тела ответа, а из версий данных в Redis
+(CacheService.get_versions, один MGET): "inventory" растёт на каждый commit
+истории (ingest, импорт), "robots" — на каждый commit телеметрии/регистрации.
+Поэтому неизменившийся ответ отдаётся как 304 до обращения к БД и без
+сериализации — фронт, опрашивающий дашборд раз в несколько секунд, между
+сканами не стоит ничего.
+
+    ETag: W/"inventory.<версия>.<ms изменения>-robots.<версия>.<ms>"
+
+Время изменения в ETag защищает от совпадения после сброса Redis (версии снова с 0).
+Без Redis валидаторов нет — ответ считается как обычно.
+
+Ответ, зависящий от часов (дашборд: "сканов за последний час"), передаёт
+bucket_seconds: в ETag добавляется номер окна времени (-t.<now // bucket>),
+а Last-Modified не раньше начала окна — без новых данных 304 отдаётся только
+в пределах окна, дальше ответ пересчитывается.
+
+Cache-Control по умолчанию "private, max-age=0, must-revalidate": браузер хранит
+ответ, но каждый раз переспрашивает (дёшево — 304), общие прокси не кешируют
+ответы авторизованных запросов. HTTP_CACHE_PUBLIC=true разрешает прокси хранить
+их (данные склада одинаковы для всех пользователей), HTTP_CACHE_MAX_AGE_SECONDS —
+сколько отдавать без перепроверки.
+"""
+from __future__ import annotations
+
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Sequence, Tuple
+
+import structlog
+from fastapi import Request, Response, status
+
+from app.core.metrics import HTTP_CONDITIONAL
+from app.core.settings import settings
+
+logger = structlog.get_logger(__name__)
+
+
+def cache_control() -> str:
+    scope = "public" if settings.HTTP_CACHE_PUBLIC else "private"
+    return f"{scope}, max-age={settings.HTTP_CACHE_MAX_AGE_SECONDS}, must-revalidate"
+
+
+def make_etag(
+    versions: Dict[str, Tuple[int, Optional[float]]],
+    scopes: Sequence[str],
+    bucket: Optional[int] = None,
+) -> str:
+    parts = []
+    for scope in scopes:
+        version, changed_at = versions[scope]
+        parts.append(f"{scope}.{version}.{int((changed_at or 0) * 1000)}")
+    if bucket is not None:
+        parts.append(f"t.{bucket}")
+    return 'W/"' + "-".join(parts) + '"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # слабое сравнение (RFC 9110 13.1.2): W/ не учитывается
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def _not_modified_since(if_modified_since: str, last_modified: int) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return last_modified <= since
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    scopes: Sequence[str],
+    endpoint: str,
+    bucket_seconds: int = 0,
+) -> Optional[Response]:
+    """
+    Проставляет ETag / Last-Modified / Cache-Control в response и возвращает
+    готовый 304, если у клиента актуальная версия; None — считать ответ как обычно.
+
+    ETag запоминается в request.state.etag: эндпойнт, чьё чтение склеивается
+    single-flight (и кешируется на READ_COALESCE_TTL_SECONDS), передаёт его в ключ —
+    иначе тело, посчитанное до bump версии, уйдёт клиенту под новым ETag и тот
+    будет получать 304 на устаревшие данные до следующего изменения.
+
+    bucket_seconds > 0 — ответ зависит ещё и от текущего времени: валидаторы
+    меняются каждые bucket_seconds даже без новых версий.
+    """
+    response.headers["Cache-Control"] = cache_control()
+
+    try:
+        versions = await request.app.container.cache_service().get_versions()
+    except Exception as e:
+        logger.warning("http_cache.versions_failed", error=str(e))
+        versions = None
+    if versions is None:
+        HTTP_CONDITIONAL.labels(endpoint, "no_version").inc()
+        return None
+
+    now = time.time()
+    bucket = int(now // bucket_seconds) if bucket_seconds > 0 else None
+    headers = {
+        "ETag": make_etag(versions, scopes, bucket),
+        "Cache-Control": response.headers["Cache-Control"],
+    }
+    request.state.etag = headers["ETag"]
+    changed = [versions[s][1] for s in scopes if versions[s][1] is not None]
+    if bucket is not None:
+        changed.append(bucket * bucket_seconds)
+    # Last-Modified с точностью до секунды; если изменение было в текущей секунде,
+    # следующее изменение в ту же секунду будет неотличимо — тогда только ETag
+    if changed and int(max(changed)) < int(now):
+        headers["Last-Modified"] = formatdate(int(max(changed)), usegmt=True)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = _etag_matches(if_none_match, headers["ETag"])
+    elif "Last-Modified" in headers and request.headers.get("if-modified-since"):
+        fresh = _not_modified_since(request.headers["if-modified-since"], int(max(changed)))
+    else:
+        fresh = False
+
+    HTTP_CONDITIONAL.labels(endpoint, "not_modified" if fresh else "modified").inc()
+    if fresh:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
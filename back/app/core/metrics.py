@@ -0,0 +1,241 @@
+# app/core/metrics.py
+"""
+Метрики Prometheus (отдаются на GET /metrics, см. app/api/health.py).
+
+Счётчики и гистограммы обновляются в местах событий (ingest, CacheService, AIService);
+состояние, которое и так лежит в памяти (пул БД, WS-соединения, очередь ingest),
+снимается RuntimeCollector-ом в момент опроса — без лишней работы на горячем пути.
+
+Для алертов по ёмкости:
+  rate(ingest_frames_total[1m])            — пакетов телеметрии в секунду
+  rate(ingest_rows_total[1m])              — строк inventory_history в секунду
+  histogram_quantile(0.99, ingest_latency_seconds_bucket)
+  rate(cache_requests_total{result="miss"}[5m]) / rate(cache_requests_total[5m])
+  db_pool_checked_out / db_pool_size
+"""
+from __future__ import annotations
+
+import functools
+import time
+from typing import Any, Callable, Iterable, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+__all__ = [
+    "CONTENT_TYPE_LATEST",
+    "render_latest",
+    "register_runtime_collector",
+    "observe_cache",
+]
+
+_FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+_AI_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+# ---------------------------
+# INGEST
+# ---------------------------
+
+INGEST_FRAMES = Counter(
+    "ingest_frames_total", "Принятые пакеты телеметрии роботов", ["transport"]
+)
+INGEST_ROWS = Counter(
+    "ingest_rows_total", "Строки, записанные в inventory_history"
+)
+INGEST_FAILURES = Counter(
+    "ingest_failures_total", "Пакеты, которые не удалось записать", ["transport"]
+)
+INGEST_LATENCY = Histogram(
+    "ingest_latency_seconds",
+    "От приёма пакета до commit (для ws — включая ожидание в очереди батчера)",
+    ["transport"],
+    buckets=_FAST_BUCKETS,
+)
+INGEST_BATCH_SECONDS = Histogram(
+    "ingest_batch_write_seconds", "Запись одной пачки кадров (одна транзакция)", buckets=_FAST_BUCKETS
+)
+INGEST_BATCH_FRAMES = Histogram(
+    "ingest_batch_frames", "Кадров в одной транзакции",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+INGEST_ROWS_SUPPRESSED = Counter(
+    "ingest_rows_suppressed_total",
+    "Сканы без изменений, не записанные в inventory_history (INGEST_STORE_ON_CHANGE)",
+)
+INGEST_DUPLICATES = Counter(
+    "ingest_duplicate_frames_total", "Повторно присланные кадры (тот же Idempotency-Key), запись пропущена"
+)
+INGEST_ADMISSION = Counter(
+    "ingest_admission_total",
+    "Admission control приёма (app/core/admission.py); result: admitted, queued, "
+    "rejected (очередь полна), timed_out, rate_limited (лимит робота)",
+    ["result"],
+)
+
+# ---------------------------
+# REDIS (CacheService)
+# ---------------------------
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Вызовы CacheService; result: hit/miss для чтений, ok для записей, error, unavailable",
+    ["method", "result"],
+)
+CACHE_LATENCY = Histogram(
+    "cache_latency_seconds", "Длительность вызова CacheService", ["method"], buckets=_FAST_BUCKETS
+)
+
+# ---------------------------
+# WEBSOCKET
+# ---------------------------
+
+WS_MESSAGES_SENT = Counter(
+    "ws_messages_sent_total", "Сообщения, отправленные клиентам /ws/notifications", ["result"]
+)
+
+# ---------------------------
+# AI (OpenRouter)
+# ---------------------------
+
+AI_REQUESTS = Counter(
+    "ai_requests_total",
+    "HTTP-вызовы OpenRouter; model=pool — запрос с серверным фолбэком по списку моделей",
+    ["model", "result"],
+)
+AI_LATENCY = Histogram(
+    "ai_request_latency_seconds", "Длительность HTTP-вызова OpenRouter", ["model"], buckets=_AI_BUCKETS
+)
+
+# ---------------------------
+# SINGLE-FLIGHT ЧТЕНИЯ (app/core/single_flight.py)
+# ---------------------------
+
+READ_COALESCE = Counter(
+    "read_coalesce_total",
+    "Вызовы сервисных чтений; result: computed — посчитан, shared — дождался чужого, cached — из TTL-кеша",
+    ["name", "result"],
+)
+
+HTTP_CONDITIONAL = Counter(
+    "http_conditional_requests_total",
+    "Условные GET (app/core/http_cache.py); result: not_modified (304), modified, no_version (без Redis)",
+    ["endpoint", "result"],
+)
+
+
+def render_latest() -> bytes:
+    return generate_latest(REGISTRY)
+
+
+# ---------------------------
+# ДЕКОРАТОР ДЛЯ CacheService
+# ---------------------------
+
+def observe_cache(lookup: bool = False) -> Callable:
+    """
+    Оборачивает async-метод CacheService: латентность и исход вызова.
+    lookup=True — метод-чтение: пустой результат (None, [], set()) считается промахом.
+    Без подключения к Redis методы сразу выходят — это учитывается как unavailable.
+    """
+    def decorator(fn: Callable) -> Callable:
+        method = fn.__name__
+        latency = CACHE_LATENCY.labels(method)
+        outcomes = {
+            r: CACHE_REQUESTS.labels(method, r) for r in ("hit", "miss", "ok", "error", "unavailable")
+        }
+
+        @functools.wraps(fn)
+        async def wrapper(self, *args: Any, **kwargs: Any) -> Any:
+            if self.redis_client is None:
+                outcomes["unavailable"].inc()
+                return await fn(self, *args, **kwargs)
+            started = time.perf_counter()
+            try:
+                result = await fn(self, *args, **kwargs)
+            except Exception:
+                outcomes["error"].inc()
+                raise
+            finally:
+                latency.observe(time.perf_counter() - started)
+            if lookup:
+                outcomes["hit" if result not in (None, [], set(), {}) else "miss"].inc()
+            else:
+                outcomes["ok"].inc()
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+# ---------------------------
+# СОСТОЯНИЕ НА МОМЕНТ ОПРОСА
+# ---------------------------
+
+class RuntimeCollector(Collector):
+    """Пул соединений БД, WS-соединения и очередь ingest — читаются при каждом scrape."""
+
+    def __init__(self, container: Any):
+        self.container = container
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        yield from self._db_pool()
+        yield from self._ws()
+        yield from self._ingest_queue()
+
+    def _db_pool(self) -> Iterable[GaugeMetricFamily]:
+        pool = self.container.engine().pool
+        for name, doc, getter in (
+            ("db_pool_size", "Размер пула соединений", "size"),
+            ("db_pool_checked_out", "Соединения, выданные сессиям", "checkedout"),
+            ("db_pool_checked_in", "Свободные соединения в пуле", "checkedin"),
+            ("db_pool_overflow", "Соединения сверх pool_size (отрицательное — ещё не открыты)", "overflow"),
+        ):
+            fn = getattr(pool, getter, None)
+            if fn is not None:
+                yield GaugeMetricFamily(name, doc, value=fn())
+
+    @staticmethod
+    def _ws() -> Iterable[GaugeMetricFamily]:
+        # импорт здесь: app.ws тянет FastAPI-зависимости, а метрики импортируются рано
+        from app.ws.connection_manager import connection_manager
+
+        stats = connection_manager.stats()
+        yield GaugeMetricFamily("ws_users", "Пользователи с открытым /ws/notifications", value=stats["users"])
+        conns = GaugeMetricFamily("ws_connections", "Открытые WebSocket-соединения", labels=["endpoint"])
+        conns.add_metric(["notifications"], stats["connections"])
+        conns.add_metric(["robots"], stats["robot_connections"])
+        yield conns
+        depth = GaugeMetricFamily(
+            "ws_send_queue_depth", "Сообщения, ожидающие отправки в сокет", labels=["endpoint"]
+        )
+        depth.add_metric(["notifications"], stats["pending_sends"])
+        depth.add_metric(["robots"], stats["robot_pending_acks"])
+        yield depth
+
+    def _ingest_queue(self) -> Iterable[GaugeMetricFamily]:
+        batcher = self.container.robot_ingest_batcher()
+        yield GaugeMetricFamily(
+            "ingest_queue_depth", "Кадры /ws/robots, ждущие записи в БД", value=batcher.queue_depth()
+        )
+        admission = self.container.ingest_admission().stats()
+        yield GaugeMetricFamily(
+            "ingest_admission_active", "Запросы /api/robots/data, пишущие в БД", value=admission["active"]
+        )
+        yield GaugeMetricFamily(
+            "ingest_admission_waiting", "Запросы /api/robots/data в очереди admission", value=admission["waiting"]
+        )
+
+
+_runtime_collector: Optional[RuntimeCollector] = None
+
+
+def register_runtime_collector(container: Any) -> None:
+    """Повторный вызов (новый контейнер при старте) только подменяет контейнер."""
+    global _runtime_collector
+    if _runtime_collector is None:
+        _runtime_collector = RuntimeCollector(container)
+        REGISTRY.register(_runtime_collector)
+    else:
+        _runtime_collector.container = container
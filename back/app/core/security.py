@@ -1,16 +1,23 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Any, Optional
 
 import structlog
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 
 from app.core.settings import settings
 
 logger = structlog.get_logger(__name__)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+@lru_cache(maxsize=1)
+def _pwd_context():
+    # passlib (+ bcrypt) нужен только логину/регистрации — не грузим его на старте воркера
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 class SecurityManager:
@@ -119,11 +126,11 @@ class SecurityManager:
 
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+        return _pwd_context().verify(plain_password, hashed_password)
 
     @staticmethod
     def get_password_hash(password: str) -> str:
-        return pwd_context.hash(password)
+        return _pwd_context().hash(password)
 
     @staticmethod
     def validate_password_strength(password: str) -> tuple[bool, str]:
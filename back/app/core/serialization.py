@@ -0,0 +1,99 @@
+# app/core/serialization.py
+"""
+Быстрая сериализация ответов и WS-сообщений.
+
+Путь FastAPI по умолчанию для эндпойнта с response_model: модель -> повторная
+валидация в response_model -> dict (jsonable) -> json.dumps. Здесь:
+
+- FastJSONResponse — default_response_class приложения: dict/list кодирует orjson
+  (в разы быстрее json.dumps), Pydantic-модель — её собственным сериализатором
+  pydantic-core сразу в байты, без промежуточного dict;
+- эндпойнты с большими ответами (история, дашборд) возвращают FastJSONResponse(модель)
+  напрямую — FastAPI тогда не валидирует ответ второй раз (response_model остаётся
+  для OpenAPI);
+- encode_ws() кодирует WS-сообщение один раз на рассылку, а не на каждый сокет;
+- rows_to_models() собирает модели ответа из строк Core одним вызовом TypeAdapter —
+  без ORM-объектов и без per-row model_validate из Python.
+
+Формат вывода совпадает с прежним: для моделей — тот же сериализатор, что у FastAPI
+(by_alias, datetime в ISO 8601). Без orjson — фолбэк на json.dumps.
+"""
+from __future__ import annotations
+
+import functools
+import json
+from decimal import Decimal
+from typing import Any, Iterable, List, Optional, Type, TypeVar
+
+from pydantic import BaseModel, TypeAdapter
+from starlette.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson есть в requirements.txt
+    orjson = None
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json", by_alias=True)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    if isinstance(obj, BaseModel):
+        return type(obj).__pydantic_serializer__.to_json(obj, by_alias=True)
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        obj, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def encode_ws(message: Any) -> str:
+    """WS-сообщение -> текст фрейма (кодируется один раз на рассылку)."""
+    return dumps(message).decode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def model_response(model: BaseModel, response: Optional[Response] = None) -> FastJSONResponse:
+    """
+    Готовая модель ответа -> FastJSONResponse без повторной валидации FastAPI.
+
+    Заголовки, выставленные на инжектированный `response` (ETag, Cache-Control),
+    FastAPI к возвращённому Response не добавляет — переносим их явно.
+    """
+    headers = response.headers if response is not None else None
+    return FastJSONResponse(model, headers=headers)
+
+
+@functools.lru_cache(maxsize=None)
+def _list_adapter(model: Type[M]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def rows_to_models(model: Type[M], rows: Iterable[Any]) -> List[M]:
+    """
+    Строки -> список моделей одним вызовом pydantic-core (TypeAdapter на модель
+    строится один раз), а не model_validate на каждую строку из Python.
+    Строка — Row Core, mapping (архив) или объект с атрибутами (ORM, from_attributes).
+    """
+    return _list_adapter(model).validate_python(
+        # Row Core -> его RowMapping (без копии в dict); mapping и ORM — как есть
+        [getattr(r, "_mapping", r) for r in rows],
+        from_attributes=True,
+    )
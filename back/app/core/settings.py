@@ -16,6 +16,76 @@ class Settings(BaseSettings):
     AUDIENCE: str | None = None
     REDIS_URL: str | None = None
 
+    # кеш известных SKU для ingest (см. app/services/product_cache.py)
+    PRODUCT_CACHE_MAX_SIZE: int = 10_000
+    PRODUCT_CACHE_TTL_SECONDS: int = 600
+
+    # фоновые задачи прогноза (см. app/workers/prediction_jobs.py)
+    AI_RESULT_CACHE_TTL_SECONDS: int = 300
+    AI_JOB_TTL_SECONDS: int = 3600
+    AI_MAX_CONCURRENT_JOBS: int = 2
+
+    # стриминговый приём телеметрии /ws/robots (см. app/workers/robot_ingest.py)
+    ROBOT_WS_BATCH_SIZE: int = 200
+    ROBOT_WS_BATCH_DELAY_MS: int = 20
+    ROBOT_WS_MAX_INFLIGHT: int = 64
+
+    # admission control приёма телеметрии (см. app/core/admission.py);
+    # INGEST_MAX_CONCURRENT держать ниже размера пула БД, ROBOT_RATE_LIMIT_PER_SECOND=0 — без лимита
+    INGEST_MAX_CONCURRENT: int = 24
+    INGEST_MAX_WAITING: int = 100
+    INGEST_QUEUE_TIMEOUT_MS: int = 500
+    INGEST_RETRY_AFTER_SECONDS: int = 1
+    ROBOT_RATE_LIMIT_PER_SECOND: float = 50.0
+    ROBOT_RATE_LIMIT_BURST: int = 100
+
+    # идемпотентность приёма: окно, в течение которого повтор кадра с тем же
+    # Idempotency-Key не пишется второй раз (таблица ingest_keys, см. app/services/robot.py)
+    INGEST_IDEMPOTENCY_WINDOW_SECONDS: int = 3600
+    INGEST_IDEMPOTENCY_PRUNE_SECONDS: float = 60.0
+
+    # store-on-change: строка истории только при изменении quantity/status полки или раз
+    # в INGEST_HEARTBEAT_SECONDS (последние сканы — в Redis, см. app/services/scan_filter.py)
+    INGEST_STORE_ON_CHANGE: bool = False
+    INGEST_HEARTBEAT_SECONDS: int = 900
+
+    # учёт SQL на запрос и медленные запросы (см. app/core/db_stats.py)
+    SQL_SLOW_QUERY_MS: int = 200
+    SQL_SLOW_QUERY_EXPLAIN: bool = False
+    SQL_STATS_HEADER: bool = False
+
+    # переподключение к Redis и readiness-проба /ready (см. app/api/health.py)
+    REDIS_RECONNECT_MIN_SECONDS: float = 0.5
+    REDIS_RECONNECT_MAX_SECONDS: float = 30.0
+    READY_DB_MAX_RTT_MS: float = 250.0
+    READY_REDIS_MAX_RTT_MS: float = 50.0
+    READY_CHECK_TIMEOUT_SECONDS: float = 2.0
+    READY_REQUIRE_REDIS: bool = True
+
+    # схема БД: миграции alembic, на старте только проверка ревизии (см. app/db/migrations.py)
+    DB_SCHEMA_CHECK: str = "fail"
+    DB_AUTO_MIGRATE: bool = False
+
+    # холодный архив истории в Parquet (см. app/services/history_archive.py,
+    # app/workers/history_archiver.py); без HISTORY_ARCHIVE_DIR архив выключен
+    HISTORY_ARCHIVE_DIR: str | None = None
+    HISTORY_HOT_DAYS: int = 30
+    HISTORY_ARCHIVE_BATCH_SIZE: int = 50_000
+
+    # встроенная аналитика DuckDB для тяжёлых агрегатов (см. app/services/analytics.py)
+    ANALYTICS_ENGINE: str = "off"
+    ANALYTICS_DUCKDB_PATH: str = ":memory:"
+    ANALYTICS_SYNC_SECONDS: float = 5.0
+    ANALYTICS_RECONCILE_SECONDS: float = 300.0
+
+    # склейка одинаковых конкурентных чтений (см. app/core/single_flight.py); 0 — без кеша
+    READ_COALESCE_TTL_SECONDS: float = 0.0
+
+    # ETag/304 и Cache-Control на опрашиваемых GET (см. app/core/http_cache.py)
+    HTTP_CACHE_MAX_AGE_SECONDS: int = 0
+    HTTP_CACHE_PUBLIC: bool = False
+    # окно по времени в ETag дашборда: "сканов за час" меняется и без новых данных
+    DASHBOARD_ETAG_BUCKET_SECONDS: int = 60
 
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
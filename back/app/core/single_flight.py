@@ -0,0 +1,98 @@
+# app/core/single_flight.py
+"""
+Single-flight для сервисных чтений: одинаковые конкурентные вызовы ждут одно вычисление.
+
+В начале смены десятки операторов одновременно открывают дашборд, и каждый запрос
+гонит тот же набор SQL. С декоратором @single_flight первый вызов (лидер) считает
+результат в отдельной задаче, остальные с теми же аргументами ждут её же future.
+Опционально результат живёт ещё ttl секунд (READ_COALESCE_TTL_SECONDS, по умолчанию
+0 — только склейка одновременных вызовов, без кеша).
+
+- ключ — имя + аргументы вызова (self не входит: сервисы создаются на запрос,
+  результат общий для всего воркера)
+- отмена запроса-лидера (клиент ушёл) не отменяет вычисление для остальных
+- исключение получают все ждущие, в кеш оно не попадает
+- результат общий: вызывающие не должны его изменять
+
+Склейка — в пределах процесса; между воркерами uvicorn ничего не делится.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.core.metrics import READ_COALESCE
+from app.core.settings import settings
+
+_MAX_CACHED = 1024
+
+
+def _freeze(value: Any) -> Hashable:
+    # списки фильтров (zones=["A"]) -> кортежи, чтобы аргументы годились в ключ
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = tuple(_freeze(v) for v in value)
+        return tuple(sorted(items, key=repr)) if isinstance(value, (set, frozenset)) else items
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+class SingleFlight:
+    def __init__(self, ttl: float = 0.0):
+        self.ttl = ttl
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._cache: Dict[Hashable, Tuple[float, Any]] = {}
+
+    async def do(self, name: str, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        now = time.monotonic()
+        cached = self._cache.get(key)
+        if cached is not None:
+            if cached[0] > now:
+                READ_COALESCE.labels(name, "cached").inc()
+                return cached[1]
+            del self._cache[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            READ_COALESCE.labels(name, "shared").inc()
+        else:
+            READ_COALESCE.labels(name, "computed").inc()
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+        # shield: отмена одного ждущего не отменяет вычисление для остальных
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None or self.ttl <= 0:
+            return
+        if len(self._cache) >= _MAX_CACHED:
+            now = time.monotonic()
+            for k in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+                del self._cache[k]
+            if len(self._cache) >= _MAX_CACHED:
+                self._cache.pop(next(iter(self._cache)))
+        self._cache[key] = (time.monotonic() + self.ttl, task.result())
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+# общий на процесс: сервисы — Factory, живут один запрос
+reads = SingleFlight(ttl=settings.READ_COALESCE_TTL_SECONDS)
+
+
+def single_flight(name: str, group: Optional[SingleFlight] = None) -> Callable:
+    """Декоратор async-метода сервиса: склейка одинаковых конкурентных вызовов."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def wrapper(self, *args: Any, **kwargs: Any) -> Any:
+            key = (name, _freeze(args), _freeze(kwargs))
+            return await (group or reads).do(name, key, lambda: fn(self, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
@@ -133,3 +133,23 @@ class AiPrediction(Base):
             f"days_until_stockout={self.days_until_stockout}, "
             f"confidence={self.confidence_score})>"
         )
+
+
+class IngestKey(Base):
+    """
+    Ключи идемпотентности принятых кадров телеметрии: повтор кадра с тем же
+    (robot_id, key) не пишет историю второй раз (см. RobotService.process_robot_batch).
+    Старше INGEST_IDEMPOTENCY_WINDOW_SECONDS — удаляются.
+    """
+    __tablename__ = "ingest_keys"
+
+    robot_id: Mapped[str] = mapped_column(String(50), primary_key=True)
+    key: Mapped[str] = mapped_column(String(100), primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=False),
+        server_default=func.now(),
+        index=True,
+    )
+
+    def __repr__(self) -> str:
+        return f"<IngestKey(robot_id='{self.robot_id}', key='{self.key}')>"
@@ -0,0 +1,87 @@
+# app/db/migrations.py
+"""
+Проверка схемы БД на старте вместо create_all.
+
+Схемой управляют миграции alembic (back/migrations, `alembic upgrade head` —
+отдельный шаг деплоя). На старте воркер делает один SELECT из alembic_version и
+сравнивает с SCHEMA_REVISION; сам alembic импортируется только если нужно
+накатить миграции (DB_AUTO_MIGRATE=true, удобно для локальной разработки).
+
+DB_SCHEMA_CHECK:
+    fail — не стартовать на устаревшей схеме (по умолчанию)
+    warn — стартовать, но залогировать
+    off  — не проверять
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Optional
+
+import structlog
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.settings import settings
+
+logger = structlog.get_logger(__name__)
+
+# head-ревизия в back/migrations/versions; обновлять вместе с каждой новой миграцией
+SCHEMA_REVISION = "0002_ingest_keys"
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+class SchemaOutdatedError(RuntimeError):
+    """Схема БД не совпадает с ожидаемой ревизией."""
+
+
+async def current_revision(engine: AsyncEngine) -> Optional[str]:
+    """Ревизия из alembic_version или None, если миграции ещё не применялись."""
+    async with engine.connect() as conn:
+        try:
+            return (await conn.execute(text("SELECT version_num FROM alembic_version"))).scalar()
+        except DBAPIError:
+            return None
+
+
+def _upgrade_sync(connection) -> None:
+    from alembic import command
+    from alembic.config import Config
+
+    cfg = Config(str(ALEMBIC_INI))
+    cfg.attributes["connection"] = connection
+    command.upgrade(cfg, "head")
+
+
+async def upgrade_to_head(engine: AsyncEngine) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(_upgrade_sync)
+
+
+async def ensure_schema_current(
+    engine: AsyncEngine,
+    mode: Optional[str] = None,
+    auto_migrate: Optional[bool] = None,
+) -> None:
+    mode = (mode or settings.DB_SCHEMA_CHECK).lower()
+    auto_migrate = settings.DB_AUTO_MIGRATE if auto_migrate is None else auto_migrate
+    if mode == "off" and not auto_migrate:
+        return
+
+    current = await current_revision(engine)
+    if current == SCHEMA_REVISION:
+        return
+
+    if auto_migrate:
+        logger.info("db.migrate_start", current=current, target=SCHEMA_REVISION)
+        await upgrade_to_head(engine)
+        logger.info("db.migrate_done", target=SCHEMA_REVISION)
+        return
+
+    if mode == "warn":
+        logger.warning("db.schema_outdated", current=current, expected=SCHEMA_REVISION)
+        return
+    raise SchemaOutdatedError(
+        f"Database schema is at {current!r}, expected {SCHEMA_REVISION!r}: run `alembic upgrade head`"
+    )
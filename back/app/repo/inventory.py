@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Sequence, Tuple
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Sequence, Tuple
 
 from sqlalchemy import (
     and_,
@@ -13,13 +13,51 @@ from sqlalchemy import (
     or_,
     select,
     delete,
+    insert,
 )
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.base import InventoryHistory
 from app.schemas.inventory import InventoryRecordCreate
 
 
+# колонки массовой выгрузки (stream_rows / /api/export/history)
+EXPORT_COLUMNS: Tuple[str, ...] = (
+    "id",
+    "robot_id",
+    "product_id",
+    "quantity",
+    "zone",
+    "row_number",
+    "shelf_number",
+    "status",
+    "scanned_at",
+    "created_at",
+)
+# те же колонки как выражения Core: чтения страниц без построения ORM-объектов
+ROW_COLUMNS = tuple(getattr(InventoryHistory, c) for c in EXPORT_COLUMNS)
+
+# допустимые статусы строки истории (как InventoryRecordBase.status)
+SCAN_STATUSES = frozenset(("OK", "LOW_STOCK", "CRITICAL"))
+
+
+class ScanRow(NamedTuple):
+    """
+    Строка скана на пути ingest -> bulk insert (RobotService -> insert_rows).
+    Кортеж без валидации Pydantic и без ORM-состояния: на 10k сканов/с это
+    одна маленькая аллокация на строку вместо модели + ORM-объекта.
+    """
+    robot_id: Optional[str]
+    product_id: str
+    quantity: int
+    zone: str
+    row_number: Optional[int]
+    shelf_number: Optional[int]
+    status: Optional[str]
+    scanned_at: datetime
+
+
 SortField = str   # допустимые поля сортировки
 SortDir = str     # "asc" | "desc"
 
@@ -57,6 +95,29 @@ class InventoryHistoryRepository:
         product_id: Optional[str],
         q: Optional[str],
     ):
+        conds = self._filter_conditions(
+            dt_from=dt_from,
+            dt_to=dt_to,
+            zones=zones,
+            statuses=statuses,
+            product_id=product_id,
+            q=q,
+        )
+        stmt = select(InventoryHistory)
+        if conds:
+            stmt = stmt.where(and_(*conds))
+        return stmt
+
+    @staticmethod
+    def _filter_conditions(
+        *,
+        dt_from: Optional[datetime],
+        dt_to: Optional[datetime],
+        zones: Optional[Sequence[str]],
+        statuses: Optional[Sequence[str]],
+        product_id: Optional[str],
+        q: Optional[str],
+    ) -> list:
         conds = []
 
         if dt_from:
@@ -78,11 +139,7 @@ class InventoryHistoryRepository:
                     InventoryHistory.status.ilike(pattern),
                 )
             )
-
-        stmt = select(InventoryHistory)
-        if conds:
-            stmt = stmt.where(and_(*conds))
-        return stmt
+        return conds
 
     # ------------------------------------------------------------------
     # CREATE
@@ -136,6 +193,24 @@ class InventoryHistoryRepository:
         await self.session.flush()
         return objs
 
+    async def insert_rows(
+        self,
+        rows: Sequence[ScanRow],
+    ) -> int:
+        """
+        Массовая вставка строк ingest одним executemany (Core insert, в Postgres —
+        пачками insertmanyvalues): без ORM-объектов и identity map.
+        id/created_at не возвращаются. Возвращает число строк.
+        """
+        if not rows:
+            return 0
+        fields = ScanRow._fields
+        await self.session.execute(
+            insert(InventoryHistory.__table__),
+            [dict(zip(fields, row)) for row in rows],
+        )
+        return len(rows)
+
     # ------------------------------------------------------------------
     # READ
     # ------------------------------------------------------------------
@@ -144,17 +219,18 @@ class InventoryHistoryRepository:
         self,
         *,
         limit: int = 20,
-    ) -> List[InventoryHistory]:
+    ) -> List[Row]:
         """
         Последние N записей по времени scanned_at (для блока 'последние сканирования').
+        Строки Core (колонки — EXPORT_COLUMNS), без ORM-объектов.
         """
         stmt = (
-            select(InventoryHistory)
+            select(*ROW_COLUMNS)
             .order_by(InventoryHistory.scanned_at.desc())
             .limit(limit)
         )
         res = await self.session.execute(stmt)
-        return list(res.scalars())
+        return list(res)
 
     async def list(
         self,
@@ -169,11 +245,12 @@ class InventoryHistoryRepository:
         offset: int = 0,
         sort_by: SortField = "scanned_at",
         sort_dir: SortDir = "desc",
-    ) -> Tuple[List[InventoryHistory], int]:
+    ) -> Tuple[List[Row], int]:
         """
         Основной список для /api/inventory/history:
         фильтры, поиск, сортировка, пагинация.
-        Возвращает (items, total).
+        Возвращает (items, total); items — строки Core с колонками EXPORT_COLUMNS
+        (доступ по атрибутам как у ORM, но без identity map и загрузки объектов).
         """
         base_stmt = self._filtered_base_query(
             dt_from=dt_from,
@@ -196,16 +273,54 @@ class InventoryHistoryRepository:
         # страница
         page_stmt = (
             base_stmt
+            .with_only_columns(*ROW_COLUMNS)
             .order_by(order_clause)
             .limit(limit)
             .offset(offset)
         )
 
         page_res = await self.session.execute(page_stmt)
-        items = list(page_res.scalars())
+        items = list(page_res)
 
         return items, total
 
+    async def stream_rows(
+        self,
+        *,
+        dt_from: Optional[datetime] = None,
+        dt_to: Optional[datetime] = None,
+        zones: Optional[Sequence[str]] = None,
+        statuses: Optional[Sequence[str]] = None,
+        product_id: Optional[str] = None,
+        after_id: Optional[int] = None,
+        batch_size: int = 5000,
+    ) -> AsyncIterator[Sequence[tuple]]:
+        """
+        Выгрузка под фильтром пачками кортежей (колонки — EXPORT_COLUMNS) через
+        серверный курсор: в памяти не больше одной пачки, ORM-объекты не создаются.
+        Порядок — по id (стабилен, дешёвый для Postgres на PK-индексе).
+        after_id — только строки с id больше (инкрементальная синхронизация).
+        Курсор держит транзакцию открытой, пока итерация не закончится.
+        """
+        conds = self._filter_conditions(
+            dt_from=dt_from,
+            dt_to=dt_to,
+            zones=zones,
+            statuses=statuses,
+            product_id=product_id,
+            q=None,
+        )
+        if after_id is not None:
+            conds.append(InventoryHistory.id > after_id)
+        stmt = select(*ROW_COLUMNS)
+        if conds:
+            stmt = stmt.where(and_(*conds))
+        stmt = stmt.order_by(InventoryHistory.id).execution_options(yield_per=batch_size)
+
+        result = await self.session.stream(stmt)
+        async for partition in result.partitions(batch_size):
+            yield partition
+
     async def get_by_ids(
         self,
         ids: Sequence[int],
@@ -237,6 +352,41 @@ class InventoryHistoryRepository:
         res = await self.session.execute(stmt)
         return res.rowcount or 0
 
+    async def delete_scanned_range(
+        self,
+        *,
+        dt_from: datetime,
+        dt_to: datetime,
+    ) -> int:
+        """
+        Удалить строки с scanned_at в [dt_from, dt_to] (границы — как у фильтров).
+        Используется архиватором после записи дня в Parquet.
+        """
+        stmt = delete(InventoryHistory).where(
+            InventoryHistory.scanned_at >= dt_from,
+            InventoryHistory.scanned_at <= dt_to,
+        )
+        res = await self.session.execute(stmt)
+        return res.rowcount or 0
+
+    async def count_up_to(
+        self,
+        max_id: int,
+    ) -> int:
+        """Сколько строк с id <= max_id (сверка реплики аналитики, index-only scan по PK)."""
+        stmt = select(func.count()).select_from(InventoryHistory).where(InventoryHistory.id <= max_id)
+        return (await self.session.execute(stmt)).scalar_one()
+
+    async def oldest_scanned_before(
+        self,
+        before: datetime,
+    ) -> Optional[datetime]:
+        """Самый старый scanned_at раньше границы (None — таких строк нет)."""
+        stmt = select(func.min(InventoryHistory.scanned_at)).where(
+            InventoryHistory.scanned_at < before
+        )
+        return (await self.session.execute(stmt)).scalar_one()
+
     # ------------------------------------------------------------------
     # SUMMARY / KPI
     # ------------------------------------------------------------------
@@ -293,6 +443,33 @@ class InventoryHistoryRepository:
             "CRITICAL": by_status.get("CRITICAL", 0),
         }
 
+    async def distinct_products(
+        self,
+        *,
+        dt_from: Optional[datetime] = None,
+        dt_to: Optional[datetime] = None,
+        zones: Optional[Sequence[str]] = None,
+        statuses: Optional[Sequence[str]] = None,
+        product_id: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Артикулы под фильтром. Нужны, когда сводка собирается из горячей части
+        и архива: unique_products двух частей не складываются, множества — да.
+        """
+        conds = self._filter_conditions(
+            dt_from=dt_from,
+            dt_to=dt_to,
+            zones=zones,
+            statuses=statuses,
+            product_id=product_id,
+            q=None,
+        )
+        stmt = select(InventoryHistory.product_id).distinct()
+        if conds:
+            stmt = stmt.where(and_(*conds))
+        res = await self.session.execute(stmt)
+        return list(res.scalars())
+
     # ------------------------------------------------------------------
     # ACTIVITY (для графика за последний час)
     # ------------------------------------------------------------------
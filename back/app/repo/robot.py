@@ -1,10 +1,12 @@
 # app/repo/robot.py
-from typing import Optional, Tuple, List, Dict, Any
-from sqlalchemy import select
+from datetime import timedelta
+from typing import Optional, Tuple, List, Dict, Any, Iterable, Set
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 import structlog
 
-from app.db.base import Robots
+from app.db.base import IngestKey, Robots
 from app.schemas.robot import RobotBase
 
 logger = structlog.get_logger(__name__)
@@ -104,3 +106,33 @@ class RobotRepository:
             }
             for row in rows
         ]
+
+    async def claim_ingest_keys(self, keys: Iterable[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        """
+        Застолбить ключи идемпотентности (robot_id, key) в рамках текущей транзакции.
+        Возвращает те, что вставлены сейчас; остальные уже были — это повторы кадров.
+        Гонку двух воркеров за один ключ решает PK + ON CONFLICT DO NOTHING.
+        """
+        rows = [{"robot_id": robot_id, "key": key} for robot_id, key in dict.fromkeys(keys)]
+        if not rows:
+            return set()
+        stmt = (
+            insert(IngestKey)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[IngestKey.robot_id, IngestKey.key])
+            .returning(IngestKey.robot_id, IngestKey.key)
+        )
+        res = await self.session.execute(stmt)
+        return {(robot_id, key) for robot_id, key in res.all()}
+
+    async def prune_ingest_keys(self, window: timedelta) -> int:
+        """
+        Удалить ключи идемпотентности старше window (без коммита). Возвращает число строк.
+        Граница считается в SQL от now(): created_at пишется server_default now() в часовом
+        поясе сессии Postgres, и сравнение с now() - interval от этого пояса не зависит
+        (наивная UTC-граница из Python на базе западнее UTC удаляла бы ключи раньше окна).
+        """
+        res = await self.session.execute(
+            delete(IngestKey).where(IngestKey.created_at < func.now() - window)
+        )
+        return res.rowcount or 0
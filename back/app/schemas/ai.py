@@ -1,5 +1,6 @@
 from __future__ import annotations
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -21,3 +22,14 @@ class ProductPrediction(BaseModel):
 class AIPredictionResponse(BaseModel):
     predictions: List[ProductPrediction]
     confidence: float = Field(..., ge=0.0, le=1.0)
+
+
+class AIPredictionJob(BaseModel):
+    """Состояние фоновой задачи прогноза (POST /api/ai/predict/jobs)."""
+    job_id: str
+    status: Literal["pending", "running", "done", "failed"]
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    cached: bool = Field(False, description="Результат взят из кеша без вызова LLM")
+    result: Optional[AIPredictionResponse] = None
+    error: Optional[str] = None
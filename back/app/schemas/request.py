@@ -45,6 +45,7 @@ class RobotIngestResult(BaseModel):
     robot: Dict[str, Any]
     ingested_records: int
     created_new_robot: bool
+    duplicate: bool = False
 
 
 class RobotIngestResponse(BaseModel):
@@ -23,6 +23,10 @@ class RobotBase(BaseModel):
     battery_level: float
     next_checkpoint: str
     status: str|None = None
+    # ключ идемпотентности кадра: повтор с тем же ключом не пишется второй раз
+    # (HTTP — заголовок Idempotency-Key, /ws/robots — поле JSON-кадра или позиция
+    # компактного кадра)
+    idempotency_key: Optional[str] = Field(default=None, max_length=100)
 
 
     class Config:
@@ -0,0 +1,252 @@
+# app/schemas/robot_compact.py
+"""
+Компактный бинарный формат телеметрии робота (msgpack + фиксированная схема).
+
+Вместо JSON-объекта с повторяющимися ключами кадр — msgpack-массив по позициям:
+
+    [robot_id, timestamp, zone, row, shelf, battery_level, next_checkpoint, status, scans,
+     seq, idempotency_key]
+
+    robot_id   — str; в /ws/robots можно nil (берётся из токена)
+    timestamp  — msgpack Timestamp (ext -1) или unix-время в секундах (int/float)
+    status     — str или nil
+    scans      — [[product_id, quantity, status, product_name?], ...]
+                 quantity: int >= 0; status: 0=OK, 1=LOW_STOCK, 2=CRITICAL, nil или
+                 та же строка; product_name: str или nil — шлётся, пока сервер не
+                 подтвердил кадр с ним (ack / 200)
+    seq        — необязательный номер кадра (для ack в /ws/robots)
+    idempotency_key — необязательный ключ идемпотентности (str, до 100 символов; без seq —
+                 seq = nil): повтор кадра с тем же ключом, например после переподключения
+                 /ws/robots, не пишется второй раз
+
+Типы позиций декодер проверяет строго (type(x) is ...), без приведений: 3.9 не
+становится рядом 3, True — полкой 1, None — зоной "None". Проверенные значения
+собираются в RobotBase через model_validate — те же ограничения полей, что у JSON.
+Всё, что декодер пропустил, дойдёт до БД в общей пачке кадров.
+"""
+from __future__ import annotations
+
+import math
+from datetime import datetime, timezone
+from typing import AbstractSet, Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+import msgpack
+from pydantic import ValidationError
+
+from app.schemas.robot import RobotBase
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+MSGPACK_MEDIA_TYPES = frozenset({MSGPACK_MEDIA_TYPE, "application/msgpack", "application/vnd.msgpack"})
+
+# те же статусы, что app.repo.inventory.SCAN_STATUSES (строковый статус проверяется по ним)
+STATUS_CODES: Tuple[str, ...] = ("OK", "LOW_STOCK", "CRITICAL")
+_STATUS_TO_CODE = {s: i for i, s in enumerate(STATUS_CODES)}
+
+_FRAME_MIN_LEN = 9
+
+
+class CompactFrameError(ValueError):
+    """Кадр не соответствует компактной схеме."""
+
+
+def is_msgpack(content_type: Optional[str]) -> bool:
+    if not content_type:
+        return False
+    return content_type.split(";", 1)[0].strip().lower() in MSGPACK_MEDIA_TYPES
+
+
+# ---------------------------
+# ENCODE (роботы, эмулятор, бенчмарки)
+# ---------------------------
+
+def encode_frame(
+    robot: Union[RobotBase, dict],
+    *,
+    known_products: Optional[AbstractSet[str]] = None,
+    seq: Optional[int] = None,
+    include_robot_id: bool = True,
+) -> bytes:
+    """
+    RobotBase или dict в формате тела /api/robots/data -> компактный msgpack-кадр.
+    known_products — SKU, чьё имя сервер уже получил: для них product_name не шлётся.
+    Множество не меняется: пополнять его named_products(robot) только после ack / 200,
+    иначе имя из кадра, получившего 429/5xx, не уйдёт никогда.
+    """
+    return msgpack.packb(
+        frame_to_array(robot, known_products=known_products, seq=seq, include_robot_id=include_robot_id),
+        datetime=True,
+    )
+
+
+def frame_to_array(
+    robot: Union[RobotBase, dict],
+    *,
+    known_products: Optional[AbstractSet[str]] = None,
+    seq: Optional[int] = None,
+    include_robot_id: bool = True,
+) -> list:
+    if isinstance(robot, RobotBase):
+        robot = robot.model_dump(by_alias=True)
+
+    ts = robot.get("timestamp") or robot.get("last_update")
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    if isinstance(ts, datetime) and ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+
+    scans = []
+    for scan in robot.get("scan_results") or []:
+        pid = scan["product_id"]
+        status = scan.get("status")
+        item = [pid, scan["quantity"], _STATUS_TO_CODE.get(status, status)]
+        name = scan.get("product_name")
+        if name and (known_products is None or pid not in known_products):
+            item.append(name)
+        scans.append(item)
+
+    loc = robot["location"]
+    frame = [
+        robot.get("robot_id") if include_robot_id else None,
+        ts,
+        loc["zone"],
+        loc["row"],
+        loc["shelf"],
+        robot["battery_level"],
+        robot["next_checkpoint"],
+        robot.get("status"),
+        scans,
+    ]
+    key = robot.get("idempotency_key")
+    if seq is not None or key:
+        frame.append(seq)
+    if key:
+        frame.append(key)
+    return frame
+
+
+def named_products(robot: Union[RobotBase, dict]) -> Set[str]:
+    """SKU с product_name в кадре — добавить в known_products после подтверждения кадра."""
+    if isinstance(robot, RobotBase):
+        return {s.product_id for s in robot.scan_results if s.product_name}
+    return {s["product_id"] for s in robot.get("scan_results") or [] if s.get("product_name")}
+
+
+# ---------------------------
+# DECODE (сервер)
+# ---------------------------
+
+def unpack(data: bytes) -> Any:
+    """msgpack -> массивы/скаляры; Timestamp сразу в tz-aware datetime."""
+    try:
+        return msgpack.unpackb(data, raw=False, timestamp=3, strict_map_key=False)
+    except (msgpack.UnpackException, ValueError) as e:
+        raise CompactFrameError(f"Invalid msgpack payload: {e}") from e
+
+
+def frame_seq(frame: Any) -> Any:
+    if isinstance(frame, list) and len(frame) > _FRAME_MIN_LEN:
+        return frame[_FRAME_MIN_LEN]
+    return None
+
+
+def iter_frames(message: Any) -> Iterable[Any]:
+    """Сообщение — один кадр или массив кадров (первый элемент кадра — строка/nil)."""
+    if isinstance(message, list) and message and isinstance(message[0], list):
+        return message
+    return [message]
+
+
+def decode_frame(frame: Any, default_robot_id: Optional[str] = None) -> RobotBase:
+    if not isinstance(frame, list) or len(frame) < _FRAME_MIN_LEN:
+        raise CompactFrameError(f"Frame must be an array of at least {_FRAME_MIN_LEN} items")
+
+    robot_id, ts, zone, row, shelf, battery, checkpoint, status, raw_scans = frame[:_FRAME_MIN_LEN]
+    key = frame[_FRAME_MIN_LEN + 1] if len(frame) > _FRAME_MIN_LEN + 1 else None
+
+    robot_id = robot_id if robot_id is not None else default_robot_id
+    if type(robot_id) is not str:
+        raise CompactFrameError("robot_id must be a string")
+    if type(zone) is not str:
+        raise CompactFrameError("zone must be a string")
+    if type(row) is not int or type(shelf) is not int:
+        raise CompactFrameError("row and shelf must be integers")
+    if type(battery) not in (int, float) or not math.isfinite(battery):
+        raise CompactFrameError("battery_level must be a finite number")
+    if type(checkpoint) is not str:
+        raise CompactFrameError("next_checkpoint must be a string")
+    if status is not None and type(status) is not str:
+        raise CompactFrameError("status must be a string or nil")
+    if key is not None and type(key) is not str:
+        raise CompactFrameError("idempotency_key must be a string or nil")
+
+    try:
+        return RobotBase.model_validate({
+            "robot_id": robot_id,
+            "last_update": _to_datetime(ts),
+            "location": {"zone": zone, "row": row, "shelf": shelf},
+            "scan_results": _decode_scans(raw_scans),
+            "battery_level": battery,
+            "next_checkpoint": checkpoint,
+            "status": status,
+            "idempotency_key": key or None,
+        })
+    except ValidationError as e:
+        raise CompactFrameError(f"Invalid frame: {e.errors(include_url=False)}") from e
+    except (TypeError, ValueError, OverflowError) as e:
+        if isinstance(e, CompactFrameError):
+            raise
+        raise CompactFrameError(f"Invalid frame: {e}") from e
+
+
+def decode_message(data: bytes, default_robot_id: Optional[str] = None) -> List[RobotBase]:
+    """Тело запроса / WS-сообщение целиком -> список RobotBase."""
+    return [decode_frame(f, default_robot_id) for f in iter_frames(unpack(data))]
+
+
+def _to_datetime(ts: Any) -> datetime:
+    if isinstance(ts, datetime):
+        return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+    if isinstance(ts, (int, float)) and not isinstance(ts, bool):
+        return datetime.fromtimestamp(ts, tz=timezone.utc)
+    if isinstance(ts, str):
+        return datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    raise CompactFrameError("timestamp must be a msgpack Timestamp, number or ISO string")
+
+
+def _decode_scans(raw_scans: Any) -> List[Dict[str, Any]]:
+    if not isinstance(raw_scans, list):
+        raise CompactFrameError("scans must be an array")
+    out: List[Dict[str, Any]] = []
+    for item in raw_scans:
+        if type(item) is not list or len(item) < 3:
+            raise CompactFrameError("scan must be [product_id, quantity, status, product_name?]")
+        pid, qty, status = item[0], item[1], item[2]
+        name = item[3] if len(item) > 3 else None
+        if type(pid) is not str:
+            raise CompactFrameError("product_id must be a string")
+        if type(qty) is not int or qty < 0:
+            raise CompactFrameError(f"quantity of {pid!r} must be a non-negative integer")
+        if type(status) is int:
+            if not 0 <= status < len(STATUS_CODES):
+                raise CompactFrameError(f"Unknown status code {status}")
+            status = STATUS_CODES[status]
+        elif status is not None and (type(status) is not str or status.upper() not in _STATUS_TO_CODE):
+            raise CompactFrameError(f"Unknown status {status!r}")
+        if name is not None and type(name) is not str:
+            raise CompactFrameError(f"product_name of {pid!r} must be a string")
+        out.append({"product_id": pid, "product_name": name, "quantity": qty, "status": status})
+    return out
+
+
+def decode_frames_with_seq(
+    data: bytes, default_robot_id: Optional[str] = None
+) -> Sequence[Tuple[Any, Union[RobotBase, CompactFrameError]]]:
+    """Для /ws/robots: (seq, RobotBase | ошибка) на каждый кадр сообщения."""
+    out = []
+    for frame in iter_frames(unpack(data)):
+        seq = frame_seq(frame)
+        try:
+            out.append((seq, decode_frame(frame, default_robot_id)))
+        except CompactFrameError as e:
+            out.append((seq, e))
+    return out
@@ -4,11 +4,14 @@ import asyncio
 import json
 import os
 import re
+import time
 from datetime import datetime, timedelta, date
-from typing import Dict, List, Optional, Sequence
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
 
-import httpx
+import structlog
+from sqlalchemy import and_, func, select
 
+from app.core.metrics import AI_LATENCY, AI_REQUESTS
 from app.repo.product import ProductRepository
 from app.repo.inventory import InventoryHistoryRepository
 from app.schemas.ai import (
@@ -16,8 +19,14 @@ from app.schemas.ai import (
     AIPredictionResponse,
     ProductPrediction,
 )
-from app.db.base import AiPrediction
+from app.db.base import AiPrediction, InventoryHistory
+from app.services.analytics import AnalyticsEngine
+from app.services.forecast import LocalForecast, StatisticalForecaster
 
+if TYPE_CHECKING:
+    import httpx
+
+logger = structlog.get_logger(__name__)
 
 # БАЗОВЫЕ НАСТРОЙКИ OPENROUTER
 OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
@@ -37,6 +46,68 @@ OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY")
 # Итоговый путь к Chat Completions
 OPENROUTER_CHAT_COMPLETIONS_URL = f"{OPENROUTER_BASE_URL.rstrip('/')}/chat/completions"
 
+# Hedged-режим: если первичная модель не ответила за N секунд, параллельно
+# запускаем резервную и берём первый валидный JSON. Пусто — режим выключен.
+_HEDGE_ENV = os.getenv("OPENROUTER_HEDGE_AFTER_SECONDS", "").strip()
+OPENROUTER_HEDGE_AFTER_SECONDS: Optional[float] = float(_HEDGE_ENV) if _HEDGE_ENV else None
+
+# Пул соединений общего клиента (см. create_openrouter_client)
+OPENROUTER_TIMEOUT_SECONDS = float(os.getenv("OPENROUTER_TIMEOUT_SECONDS", "60"))
+OPENROUTER_MAX_CONNECTIONS = int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "20"))
+OPENROUTER_HTTP2 = os.getenv("OPENROUTER_HTTP2", "1").lower() not in ("0", "false", "no")
+
+# Разбиение каталога на чанки: бюджет входных токенов на один промпт,
+# максимум товаров в чанке (чтобы ответ влез в max_tokens), параллелизм и ретраи чанка.
+AI_CHUNK_TOKEN_BUDGET = int(os.getenv("AI_CHUNK_TOKEN_BUDGET", "6000"))
+AI_CHUNK_MAX_PRODUCTS = int(os.getenv("AI_CHUNK_MAX_PRODUCTS", "40"))
+AI_CHUNK_CONCURRENCY = int(os.getenv("AI_CHUNK_CONCURRENCY", "4"))
+AI_CHUNK_RETRIES = int(os.getenv("AI_CHUNK_RETRIES", "1"))
+# Режим прогноза:
+#   llm    — всё через LLM (по умолчанию), локальный прогноз только как фолбэк
+#   hybrid — локальный прогноз для "обычных" SKU, в LLM уходят только anomalous
+#   local  — только локальный статистический прогноз, OpenRouter не нужен
+AI_FORECAST_MODE = os.getenv("AI_FORECAST_MODE", "llm").strip().lower()
+# при сбое LLM по чанку подставлять локальный прогноз вместо ошибки
+AI_FORECAST_FALLBACK = os.getenv("AI_FORECAST_FALLBACK", "1").lower() not in ("0", "false", "no")
+# история для прогноза: 1 — одна точка (последний скан) на товар за день вместо сырых сканов
+AI_HISTORY_DAILY_BUCKETS = os.getenv("AI_HISTORY_DAILY_BUCKETS", "0").lower() in ("1", "true", "yes")
+_HISTORY_STREAM_BATCH = 1000
+# грубая оценка токенов ответа на один товар в predictions
+_OUTPUT_TOKENS_PER_PRODUCT = 40
+_OUTPUT_TOKENS_MIN = 700
+
+
+def create_openrouter_client(shutdown_hooks: Optional[list] = None) -> httpx.AsyncClient:
+    """
+    Долгоживущий клиент с пулом keep-alive соединений (HTTP/2, если есть пакет h2).
+    Создаётся один раз в контейнере, чтобы не платить TCP+TLS на каждый прогноз.
+    httpx импортируется здесь, а не на уровне модуля: клиент нужен только прогнозу.
+    Закрытие клиента регистрируется в shutdown_hooks — lifespan закрывает его,
+    только если клиент создавался.
+    """
+    import httpx
+
+    http2 = OPENROUTER_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("openrouter.http2_unavailable", hint="pip install h2")
+            http2 = False
+
+    client = httpx.AsyncClient(
+        timeout=OPENROUTER_TIMEOUT_SECONDS,
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=OPENROUTER_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENROUTER_MAX_CONNECTIONS,
+            keepalive_expiry=120.0,
+        ),
+    )
+    if shutdown_hooks is not None:
+        shutdown_hooks.append(client.aclose)
+    return client
+
 SYSTEM_PROMPT = (
     "Ты аналитик склада. На основе списка товаров с текущим остатком, "
     "оптимальным запасом и короткой историей сканов сделай прогноз на заданный период. "
@@ -78,6 +149,91 @@ def _build_user_prompt(period_days: int, products_payload: dict) -> str:
         "OUTPUT=JSON_ONLY"
     )
 
+def _estimate_tokens(obj: Any) -> int:
+    # ~4 символа компактного JSON на токен — достаточно для бюджета, без токенайзера
+    return len(json.dumps(obj, ensure_ascii=False, separators=(",", ":"))) // 4 + 1
+
+
+def _chunk_products(
+    products: List[dict],
+    *,
+    token_budget: int,
+    max_products: int,
+) -> List[List[dict]]:
+    """
+    Режет каталог на чанки под бюджет токенов. Товары сначала группируются
+    по категории, чтобы модель видела в одном промпте однородные SKU.
+    Товар, который сам по себе больше бюджета, идёт отдельным чанком.
+    """
+    ordered = sorted(products, key=lambda p: (p.get("category") is None, p.get("category") or ""))
+    chunks: List[List[dict]] = []
+    current: List[dict] = []
+    used = 0
+    for p in ordered:
+        cost = _estimate_tokens(p)
+        if current and (used + cost > token_budget or len(current) >= max_products):
+            chunks.append(current)
+            current, used = [], 0
+        current.append(p)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _history_tail_stmt(
+    product_ids: Sequence[str],
+    *,
+    dt_from: datetime,
+    limit_per_product: int,
+    daily: bool = False,
+):
+    """
+    SELECT product_id, scanned_at, quantity, status последних limit_per_product
+    сканов по каждому товару (новые первыми). При daily=True сначала оставляем
+    последний скан каждого дня, и уже из этих точек берём top-N.
+    """
+    ih = InventoryHistory
+    src = (
+        select(ih.product_id, ih.scanned_at, ih.quantity, ih.status)
+        .where(and_(ih.product_id.in_(product_ids), ih.scanned_at >= dt_from))
+    )
+    if daily:
+        day_ranked = src.add_columns(
+            func.row_number().over(
+                partition_by=(ih.product_id, func.date_trunc("day", ih.scanned_at)),
+                order_by=ih.scanned_at.desc(),
+            ).label("day_rn")
+        ).subquery()
+        src = (
+            select(
+                day_ranked.c.product_id,
+                day_ranked.c.scanned_at,
+                day_ranked.c.quantity,
+                day_ranked.c.status,
+            )
+            .where(day_ranked.c.day_rn == 1)
+        )
+
+    src = src.subquery()
+    ranked = select(
+        src.c.product_id,
+        src.c.scanned_at,
+        src.c.quantity,
+        src.c.status,
+        func.row_number().over(
+            partition_by=src.c.product_id,
+            order_by=src.c.scanned_at.desc(),
+        ).label("rn"),
+    ).subquery()
+
+    return (
+        select(ranked.c.product_id, ranked.c.scanned_at, ranked.c.quantity, ranked.c.status)
+        .where(ranked.c.rn <= limit_per_product)
+        .order_by(ranked.c.product_id, ranked.c.rn)
+    )
+
+
 _JSON_RE = re.compile(r"\{.*\}", flags=re.S)
 def _extract_json_block(text: str) -> str:
     m = _JSON_RE.search(text or "")
@@ -96,14 +252,24 @@ class AIService:
         self,
         product_repo: ProductRepository,
         inventory_repo: InventoryHistoryRepository,
+        http_client: Optional[httpx.AsyncClient] = None,
+        forecaster: Optional[StatisticalForecaster] = None,
+        analytics: Optional[AnalyticsEngine] = None,
     ) -> None:
         self.product_repo = product_repo
         self.inventory_repo = inventory_repo
+        # общий клиент из контейнера; None — одноразовый клиент на вызов
+        self.http_client = http_client
+        self.forecaster = forecaster or StatisticalForecaster()
+        # DuckDB-реплика истории: выборки для промпта не нагружают Postgres
+        self.analytics = analytics
 
-        if not OPENROUTER_API_KEY:
+    async def predict(self, req: AIPredictionRequest) -> AIPredictionResponse:
+        # ключ проверяем при вызове, а не в __init__: без OpenRouter воркер должен
+        # подниматься и обслуживать всё остальное, а DI может собрать сервис заранее
+        if not OPENROUTER_API_KEY and AI_FORECAST_MODE != "local":
             raise RuntimeError("OPENROUTER_API_KEY is not set")
 
-    async def predict(self, req: AIPredictionRequest) -> AIPredictionResponse:
         period_days = max(1, min(30, req.period_days or 7))
 
         # 1) Товары и фильтр по категориям
@@ -130,23 +296,68 @@ class AIService:
                 "history": history_pack.get(p.id, []),
             })
 
-        # 3) Вызов LLM
-        messages = [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": _build_user_prompt(period_days, payload)},
-        ]
-        json_text = await self._call_llm(messages)
+        # 3) Локальный статистический прогноз по всем SKU сразу (дёшево, без сети)
+        local = {
+            f.product_id: f
+            for f in self.forecaster.forecast(payload["products"], period_days)
+        }
+        if AI_FORECAST_MODE == "local":
+            llm_products: List[dict] = []
+        elif AI_FORECAST_MODE == "hybrid":
+            llm_products = [p for p in payload["products"] if local[p["product_id"]].anomalous]
+        else:
+            llm_products = payload["products"]
+        llm_ids = {p["product_id"] for p in llm_products}
+
+        # 4) Вызов LLM: чанки под бюджет токенов, параллельно, с ретраями по чанку
+        chunks = _chunk_products(
+            llm_products,
+            token_budget=AI_CHUNK_TOKEN_BUDGET,
+            max_products=AI_CHUNK_MAX_PRODUCTS,
+        )
+        sem = asyncio.Semaphore(AI_CHUNK_CONCURRENCY)
 
-        # 4) Мини-валидация и сбор ответа
-        obj = json.loads(json_text)
-        preds_in = obj.get("predictions") or []
-        overall_conf = obj.get("confidence", 0.8)
+        async def run_chunk(chunk: List[dict]) -> Tuple[List[dict], float]:
+            async with sem:
+                try:
+                    return await self._predict_chunk(period_days, chunk)
+                except Exception:
+                    if not AI_FORECAST_FALLBACK:
+                        raise
+                    logger.warning("ai.chunk_local_fallback", products=len(chunk))
+                    return self._local_chunk(chunk, local)
+
+        chunk_results = list(await asyncio.gather(*(run_chunk(c) for c in chunks)))
+
+        # SKU, которые не отправлялись в LLM, — сразу из локального прогноза
+        rest = [p for p in payload["products"] if p["product_id"] not in llm_ids]
+        if rest:
+            chunks.append(rest)
+            chunk_results.append(self._local_chunk(rest, local))
+
+        # 5) Мини-валидация и сбор ответа: порядок как во входном каталоге,
+        #    общий confidence — среднее по чанкам с весом по числу товаров
+        order = {p.id: i for i, p in enumerate(products)}
+        preds_in: List[Tuple[dict, float]] = []
+        weighted_conf, weight = 0.0, 0
+        for (items, chunk_conf), chunk in zip(chunk_results, chunks):
+            preds_in.extend((item, chunk_conf) for item in items)
+            weighted_conf += chunk_conf * len(chunk)
+            weight += len(chunk)
+        preds_in.sort(key=lambda x: order.get(str(x[0].get("product_id")), len(order)))
+        overall_conf = weighted_conf / weight if weight else 0.8
+
+        logger.info(
+            "ai.predict_chunks",
+            mode=AI_FORECAST_MODE, products=len(products),
+            llm_products=len(llm_products), chunks=len(chunks),
+        )
 
         today = date.today()
         session = self.inventory_repo.session
 
         predictions: List[ProductPrediction] = []
-        for item in preds_in:
+        for item, item_conf in preds_in:
             product_id = str(item.get("product_id"))
             category = item.get("category")
             expected_demand = int(max(0, int(item.get("expected_demand", 0))))
@@ -172,24 +383,72 @@ class AIService:
                     prediction_date=today,
                     days_until_stockout=int(dus) if dus is not None else None,
                     recommended_order=recommended_order,
-                    confidence_score=float(overall_conf) if overall_conf is not None else None,
+                    confidence_score=round(item_conf, 2),
                 )
             )
 
         await session.flush()
 
-        try:
-            conf = float(overall_conf)
-        except Exception:
-            conf = 0.8
-        return AIPredictionResponse(predictions=predictions, confidence=round(conf, 2))
+        return AIPredictionResponse(predictions=predictions, confidence=round(overall_conf, 2))
+
+    @staticmethod
+    def _local_chunk(chunk: List[dict], local: Dict[str, LocalForecast]) -> Tuple[List[dict], float]:
+        """Чанк в формате ответа LLM, но из локального прогноза."""
+        forecasts = [local[p["product_id"]] for p in chunk]
+        conf = sum(f.confidence for f in forecasts) / len(forecasts) if forecasts else 0.0
+        return [f.as_prediction() for f in forecasts], conf
 
-    async def _call_llm(self, messages: List[Dict]) -> str:
+    async def _predict_chunk(self, period_days: int, chunk: List[dict]) -> Tuple[List[dict], float]:
         """
-        1) Пробуем серверный фолбэк OpenRouter через поле `models` (один запрос).
+        Прогноз по одному чанку каталога. При сбое повторяем только этот чанк
+        (AI_CHUNK_RETRIES раз), остальные чанки не пересчитываются.
+        Возвращает (predictions, confidence).
+        """
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": _build_user_prompt(period_days, {"products": chunk})},
+        ]
+        max_tokens = max(_OUTPUT_TOKENS_MIN, _OUTPUT_TOKENS_PER_PRODUCT * len(chunk))
+
+        last_err: Optional[Exception] = None
+        for attempt in range(AI_CHUNK_RETRIES + 1):
+            try:
+                obj = json.loads(await self._call_llm(messages, max_tokens=max_tokens))
+                try:
+                    conf = min(1.0, max(0.0, float(obj.get("confidence", 0.8))))
+                except Exception:
+                    conf = 0.8
+                return list(obj.get("predictions") or []), conf
+            except Exception as e:
+                last_err = e
+                logger.warning(
+                    "ai.chunk_failed", attempt=attempt + 1, products=len(chunk), error=str(e)
+                )
+        raise RuntimeError(f"Chunk of {len(chunk)} products failed: {last_err}")
+
+    async def _call_llm(self, messages: List[Dict], max_tokens: int = 700) -> str:
+        """
+        1) Hedged-режим (если задан OPENROUTER_HEDGE_AFTER_SECONDS): первичная модель,
+           а при задержке — параллельно резервная; берём первый валидный JSON.
+           Иначе пробуем серверный фолбэк OpenRouter через поле `models` (один запрос).
         2) Если получили 404/400 по модели, делаем клиентский перебор по одной.
         3) На 429/5xx используем экспоненциальные задержки.
         """
+        if self.http_client is not None:
+            return await self._call_llm_with(self.http_client, messages, max_tokens)
+        import httpx
+
+        async with httpx.AsyncClient(timeout=OPENROUTER_TIMEOUT_SECONDS) as client:
+            return await self._call_llm_with(client, messages, max_tokens)
+
+    async def _call_llm_with(
+        self,
+        client: httpx.AsyncClient,
+        messages: List[Dict],
+        max_tokens: int = 700,
+    ) -> str:
+        import httpx
+
         headers = {
             "Authorization": f"Bearer {OPENROUTER_API_KEY}",
             "Accept": "application/json",
@@ -202,13 +461,19 @@ class AIService:
         common = {
             "messages": messages,
             "temperature": 0.2,
-            "max_tokens": 700,
+            "max_tokens": max_tokens,
         }
 
         delays = [0, 2, 5]  # на случай 429/5xx
         transient = {429, 502, 503, 504}
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        if OPENROUTER_HEDGE_AFTER_SECONDS is not None and len(OPENROUTER_MODELS) > 1:
+            try:
+                return await self._hedged_call(client, headers, common)
+            except Exception as e:
+                # обе модели не ответили — идём на клиентский перебор
+                logger.warning("ai.hedged_call_failed", error=str(e))
+        else:
             # Попытка 1: единый запрос с серверным фолбэком
             body = dict(common)
             body["models"] = OPENROUTER_MODELS
@@ -216,7 +481,7 @@ class AIService:
                 if d:
                     await asyncio.sleep(d)
                 try:
-                    r = await client.post(OPENROUTER_CHAT_COMPLETIONS_URL, json=body, headers=headers)
+                    r = await self._post(client, body, headers)
                     if r.status_code in transient:
                         continue
                     if r.status_code in (400, 404):
@@ -234,33 +499,109 @@ class AIService:
                     # ответ пришёл, но невалидный формат
                     raise RuntimeError(f"LLM returned invalid format: {e}") from e
 
-            # Попытка 2: клиентский перебор по одной модели
-            last_err: Optional[Exception] = None
-            for model in OPENROUTER_MODELS:
-                body_single = dict(common)
-                body_single["model"] = model
-                for d in delays:
-                    if d:
-                        await asyncio.sleep(d)
-                    try:
-                        r = await client.post(OPENROUTER_CHAT_COMPLETIONS_URL, json=body_single, headers=headers)
-                        if r.status_code in transient:
-                            last_err = RuntimeError(f"Transient {r.status_code}: {r.text}")
-                            continue
-                        r.raise_for_status()
-                        return self._extract_and_validate_json(r.json())
-                    except httpx.HTTPStatusError as e:
-                        # 404 по модели или иной статус - пробуем следующую
-                        last_err = RuntimeError(f"OpenRouter {e.response.status_code}: {e.response.text}")
-                        break
-                    except httpx.HTTPError as e:
-                        last_err = e
+        # Попытка 2: клиентский перебор по одной модели
+        last_err: Optional[Exception] = None
+        for model in OPENROUTER_MODELS:
+            body_single = dict(common)
+            body_single["model"] = model
+            for d in delays:
+                if d:
+                    await asyncio.sleep(d)
+                try:
+                    r = await self._post(client, body_single, headers)
+                    if r.status_code in transient:
+                        last_err = RuntimeError(f"Transient {r.status_code}: {r.text}")
                         continue
-                    except (ValueError, json.JSONDecodeError) as e:
-                        last_err = e
-                        break
+                    r.raise_for_status()
+                    return self._extract_and_validate_json(r.json())
+                except httpx.HTTPStatusError as e:
+                    # 404 по модели или иной статус - пробуем следующую
+                    last_err = RuntimeError(f"OpenRouter {e.response.status_code}: {e.response.text}")
+                    break
+                except httpx.HTTPError as e:
+                    last_err = e
+                    continue
+                except (ValueError, json.JSONDecodeError) as e:
+                    last_err = e
+                    break
 
-            raise RuntimeError(f"LLM call failed: {last_err}")
+        raise RuntimeError(f"LLM call failed: {last_err}")
+
+    @staticmethod
+    async def _post(client: httpx.AsyncClient, body: Dict, headers: Dict[str, str]) -> httpx.Response:
+        """POST в OpenRouter с метриками по модели (model=pool — серверный фолбэк по списку)."""
+        import httpx
+
+        model = body.get("model") or "pool"
+        started = time.perf_counter()
+        try:
+            r = await client.post(OPENROUTER_CHAT_COMPLETIONS_URL, json=body, headers=headers)
+        except asyncio.CancelledError:
+            # проигравший hedged-запрос — не сбой модели
+            AI_REQUESTS.labels(model, "cancelled").inc()
+            raise
+        except httpx.HTTPError:
+            AI_REQUESTS.labels(model, "network_error").inc()
+            raise
+        finally:
+            AI_LATENCY.labels(model).observe(time.perf_counter() - started)
+        AI_REQUESTS.labels(model, "ok" if r.is_success else f"http_{r.status_code}").inc()
+        return r
+
+    async def _post_single_model(
+        self,
+        client: httpx.AsyncClient,
+        headers: Dict[str, str],
+        common: Dict,
+        model: str,
+    ) -> str:
+        body = dict(common)
+        body["model"] = model
+        r = await self._post(client, body, headers)
+        r.raise_for_status()
+        return self._extract_and_validate_json(r.json())
+
+    async def _hedged_call(
+        self,
+        client: httpx.AsyncClient,
+        headers: Dict[str, str],
+        common: Dict,
+    ) -> str:
+        """
+        Запрос к первичной модели; если за OPENROUTER_HEDGE_AFTER_SECONDS ответа нет
+        (или она уже упала) — параллельно запрос к резервной. Побеждает первый валидный JSON,
+        проигравший запрос отменяется.
+        """
+        primary, backup = OPENROUTER_MODELS[0], OPENROUTER_MODELS[1]
+        pending = {
+            asyncio.create_task(self._post_single_model(client, headers, common, primary))
+        }
+        backup_started = False
+        last_err: Optional[BaseException] = None
+
+        try:
+            while pending:
+                timeout = None if backup_started else OPENROUTER_HEDGE_AFTER_SECONDS
+                done, pending = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    last_err = task.exception()
+
+                if not backup_started:
+                    # первичная тормозит или уже упала — подключаем резервную
+                    backup_started = True
+                    logger.info("ai.hedge_backup_started", primary=primary, backup=backup)
+                    pending.add(asyncio.create_task(
+                        self._post_single_model(client, headers, common, backup)
+                    ))
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise RuntimeError(f"Hedged LLM call failed: {last_err}")
 
     @staticmethod
     def _extract_and_validate_json(data: Dict) -> str:
@@ -273,8 +614,9 @@ class AIService:
         return json_text
 
     async def _latest_quantity_by_product(self, product_ids: Sequence[str]) -> Dict[str, int]:
-        from sqlalchemy import select, func, and_
-        from app.db.base import InventoryHistory
+        if self.analytics is not None and self.analytics.ready:
+            return await self.analytics.latest_quantity(product_ids)
+
         s = self.inventory_repo.session
         sub = (
             select(
@@ -295,28 +637,47 @@ class AIService:
         rows = (await s.execute(stmt)).all()
         return {pid: int(qty or 0) for pid, qty in rows}
 
-    async def _history_compact(self, product_ids: Sequence[str], *, days: int, limit_per_product: int) -> Dict[str, List[Dict]]:
-        from sqlalchemy import select, and_, desc
-        from app.db.base import InventoryHistory
-        s = self.inventory_repo.session
+    async def _history_compact(
+        self,
+        product_ids: Sequence[str],
+        *,
+        days: int,
+        limit_per_product: int,
+        daily: Optional[bool] = None,
+    ) -> Dict[str, List[Dict]]:
+        """
+        Последние limit_per_product сканов каждого товара за days дней.
+        Top-N на товар считает Postgres (ROW_NUMBER() OVER PARTITION BY product_id),
+        поэтому по сети едет ровно то, что попадёт в промпт, а не вся история.
+        Результат читается потоком (server-side cursor) порциями.
+        С включённой аналитикой тот же запрос выполняет DuckDB.
+        """
         dt_from = datetime.utcnow() - timedelta(days=days)
-        stmt = (
-            select(
-                InventoryHistory.product_id,
-                InventoryHistory.scanned_at,
-                InventoryHistory.quantity,
-                InventoryHistory.status,
-            )
-            .where(and_(
-                InventoryHistory.product_id.in_(product_ids),
-                InventoryHistory.scanned_at >= dt_from,
+        daily = AI_HISTORY_DAILY_BUCKETS if daily is None else daily
+
+        acc: Dict[str, List[Dict]] = {}
+
+        def add(rows) -> None:
+            for pid, ts, qty, status in rows:
+                acc.setdefault(pid, []).append(
+                    {"ts": ts.isoformat(), "qty": int(qty or 0), "status": status}
+                )
+
+        if self.analytics is not None and self.analytics.ready:
+            add(await self.analytics.history_tail(
+                product_ids, dt_from=dt_from, limit_per_product=limit_per_product, daily=daily,
             ))
-            .order_by(InventoryHistory.product_id, desc(InventoryHistory.scanned_at))
+            return acc
+
+        s = self.inventory_repo.session
+        stmt = _history_tail_stmt(
+            product_ids,
+            dt_from=dt_from,
+            limit_per_product=limit_per_product,
+            daily=daily,
         )
-        rows = (await s.execute(stmt)).all()
-        acc: Dict[str, List[Dict]] = {}
-        for pid, ts, qty, status in rows:
-            bucket = acc.setdefault(pid, [])
-            if len(bucket) < limit_per_product:
-                bucket.append({"ts": ts.isoformat(), "qty": int(qty or 0), "status": status})
+
+        result = await s.stream(stmt)
+        async for rows in result.partitions(_HISTORY_STREAM_BATCH):
+            add(rows)
         return acc
@@ -0,0 +1,355 @@
+# app/services/analytics.py
+"""
+Встроенный аналитический движок (DuckDB) для тяжёлых агрегатов.
+
+Сводка по истории, активность за час и история для AI-прогноза — это OLAP-запросы
+(сканы больших диапазонов, GROUP BY, оконные функции). На Postgres они конкурируют
+с ingest роботов за соединения пула и buffer cache. При ANALYTICS_ENGINE=duckdb
+каждый воркер держит локальную колоночную реплику inventory_history и считает
+эти агрегаты у себя:
+
+- реплика догоняется инкрементально по id (фоновая задача раз в ANALYTICS_SYNC_SECONDS):
+  одна выборка WHERE id > последний_id по PK-индексу, без агрегатов на стороне Postgres;
+  хвост в _SYNC_OVERLAP_IDS id перечитывается, чтобы не потерять транзакции,
+  закоммиченные не в порядке выдачи id
+- Parquet-архив (app/services/history_archive.py), если он включён, подключается
+  как view поверх read_parquet — реплике хранить архивные строки не нужно
+- удаления (архиватор, DELETE через API) ловит сверка: раз в ANALYTICS_RECONCILE_SECONDS
+  и при сдвиге watermark архива сравниваем count(*) с Postgres; расхождение —
+  реплика пересобирается (на это время запросы снова идут в Postgres)
+
+Пока реплика не догнана (ready=False), сервисы читают из Postgres, как раньше.
+DuckDB-файл может открыть только один процесс, поэтому при нескольких воркерах
+uvicorn ANALYTICS_DUCKDB_PATH должен остаться ":memory:".
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import structlog
+
+from app.core.settings import settings
+from app.repo.inventory import EXPORT_COLUMNS, InventoryHistoryRepository
+from app.services.history_archive import HistoryArchive, naive_utc
+
+logger = structlog.get_logger(__name__)
+
+# сколько последних id перечитывать при каждой синхронизации
+_SYNC_OVERLAP_IDS = 2000
+_SYNC_BATCH_SIZE = 20_000
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS inventory_history (
+    id BIGINT PRIMARY KEY,
+    robot_id VARCHAR,
+    product_id VARCHAR,
+    quantity INTEGER,
+    zone VARCHAR,
+    row_number INTEGER,
+    shelf_number INTEGER,
+    status VARCHAR,
+    scanned_at TIMESTAMP,
+    created_at TIMESTAMP
+)
+"""
+
+_COLUMNS_SQL = ", ".join(EXPORT_COLUMNS)
+
+
+class AnalyticsEngine:
+    def __init__(
+        self,
+        repo_factory: Callable[[], InventoryHistoryRepository],
+        archive: Optional[HistoryArchive] = None,
+        path: str = ":memory:",
+        sync_seconds: float = 5.0,
+        reconcile_seconds: float = 300.0,
+    ):
+        self.repo_factory = repo_factory
+        self.archive = archive
+        self.path = path
+        self.sync_seconds = sync_seconds
+        self.reconcile_seconds = reconcile_seconds
+
+        self.ready = False
+        self._con = None
+        self._last_id = 0
+        self._archive_watermark: Optional[datetime] = None
+        self._next_reconcile = 0.0
+        self._sync_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # ---------------------------
+    # ЖИЗНЕННЫЙ ЦИКЛ
+    # ---------------------------
+
+    def open(self) -> None:
+        import duckdb
+
+        self._con = duckdb.connect(self.path)
+        self._con.execute(_CREATE_TABLE)
+        self._last_id = self._con.execute("SELECT coalesce(max(id), 0) FROM inventory_history").fetchone()[0]
+        self._refresh_view()
+
+    async def start(self) -> None:
+        if self._con is None:
+            await asyncio.to_thread(self.open)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+        self.ready = False
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("analytics.sync_failed", error=str(e))
+            await asyncio.sleep(self.sync_seconds)
+
+    # ---------------------------
+    # СИНХРОНИЗАЦИЯ
+    # ---------------------------
+
+    async def sync(self) -> int:
+        """Догнать реплику; возвращает число прочитанных строк."""
+        async with self._sync_lock:
+            if await asyncio.to_thread(self._check_archive):
+                self._next_reconcile = 0.0
+
+            pulled = await self._pull(max(0, self._last_id - _SYNC_OVERLAP_IDS))
+
+            if time.monotonic() >= self._next_reconcile:
+                await self._reconcile()
+                self._next_reconcile = time.monotonic() + self.reconcile_seconds
+
+            self.ready = True
+            return pulled
+
+    async def _pull(self, after_id: int) -> int:
+        repo = self.repo_factory()
+        pulled = 0
+        try:
+            async for batch in repo.stream_rows(after_id=after_id, batch_size=_SYNC_BATCH_SIZE):
+                await asyncio.to_thread(self._insert, batch)
+                pulled += len(batch)
+        finally:
+            await repo.session.close()
+        if pulled:
+            self._last_id = await asyncio.to_thread(
+                lambda: self._cursor().execute("SELECT coalesce(max(id), 0) FROM inventory_history").fetchone()[0]
+            )
+        return pulled
+
+    def _insert(self, rows: Sequence[tuple]) -> None:
+        import pyarrow as pa
+
+        columns = list(zip(*rows))
+        batch = pa.table(dict(zip(EXPORT_COLUMNS, columns)))
+        cur = self._cursor()
+        cur.register("_batch", batch)
+        try:
+            cur.execute(f"INSERT OR IGNORE INTO inventory_history SELECT {_COLUMNS_SQL} FROM _batch")
+        finally:
+            cur.unregister("_batch")
+
+    async def _reconcile(self) -> None:
+        repo = self.repo_factory()
+        try:
+            expected = await repo.count_up_to(self._last_id)
+        finally:
+            await repo.session.close()
+
+        actual = await asyncio.to_thread(
+            lambda: self._cursor().execute(
+                "SELECT count(*) FROM inventory_history WHERE id <= ?", [self._last_id]
+            ).fetchone()[0]
+        )
+        if actual == expected:
+            return
+
+        logger.info("analytics.rebuild", expected=expected, actual=actual)
+        self.ready = False
+        await asyncio.to_thread(lambda: self._cursor().execute("DELETE FROM inventory_history"))
+        self._last_id = 0
+        await self._pull(0)
+
+    def _check_archive(self) -> bool:
+        """Watermark архива сдвинулся: перенесённые строки убрать из реплики, view пересоздать."""
+        if self.archive is None:
+            return False
+        watermark = self.archive.watermark()
+        if watermark == self._archive_watermark:
+            return False
+        if watermark is not None:
+            self._cursor().execute("DELETE FROM inventory_history WHERE scanned_at < ?", [watermark])
+        self._archive_watermark = watermark
+        self._refresh_view()
+        return True
+
+    def _refresh_view(self) -> None:
+        source = f"SELECT {_COLUMNS_SQL} FROM inventory_history"
+        if self.archive is not None and any(self.archive.root.glob("day=*/zone=*/*.parquet")):
+            pattern = str(self.archive.root / "day=*" / "zone=*" / "*.parquet").replace("'", "''")
+            source += (
+                f" UNION ALL SELECT {_COLUMNS_SQL} FROM read_parquet('{pattern}',"
+                " hive_partitioning = true, hive_types = {'day': VARCHAR, 'zone': VARCHAR})"
+            )
+        self._cursor().execute(f"CREATE OR REPLACE VIEW history_all AS {source}")
+
+    def _cursor(self):
+        # у каждого потока свой курсор: соединение DuckDB не делится между потоками
+        return self._con.cursor()
+
+    # ---------------------------
+    # ЗАПРОСЫ
+    # ---------------------------
+
+    def _fetch(self, sql: str, params: List[Any]) -> List[tuple]:
+        return self._cursor().execute(sql, params).fetchall()
+
+    @staticmethod
+    def _where(
+        *,
+        dt_from: Optional[datetime],
+        dt_to: Optional[datetime],
+        zones: Optional[Sequence[str]],
+        statuses: Optional[Sequence[str]],
+        product_id: Optional[str],
+    ) -> Tuple[str, List[Any]]:
+        conds: List[str] = []
+        params: List[Any] = []
+        if dt_from:
+            conds.append("scanned_at >= ?")
+            params.append(naive_utc(dt_from))
+        if dt_to:
+            conds.append("scanned_at <= ?")
+            params.append(naive_utc(dt_to))
+        if zones:
+            conds.append("list_contains(?, zone)")
+            params.append(list(zones))
+        if statuses:
+            conds.append("list_contains(?, status)")
+            params.append(list(statuses))
+        if product_id:
+            conds.append("product_id = ?")
+            params.append(product_id)
+        return (" WHERE " + " AND ".join(conds)) if conds else "", params
+
+    async def summary(
+        self,
+        *,
+        dt_from: Optional[datetime] = None,
+        dt_to: Optional[datetime] = None,
+        zones: Optional[Sequence[str]] = None,
+        statuses: Optional[Sequence[str]] = None,
+        product_id: Optional[str] = None,
+    ) -> Dict[str, int]:
+        """То же, что InventoryHistoryRepository.summary, одним проходом (вместе с архивом)."""
+        where, params = self._where(
+            dt_from=dt_from, dt_to=dt_to, zones=zones, statuses=statuses, product_id=product_id,
+        )
+        sql = (
+            "SELECT count(*), count(DISTINCT product_id),"
+            " count(*) FILTER (WHERE status = 'OK'),"
+            " count(*) FILTER (WHERE status = 'LOW_STOCK'),"
+            " count(*) FILTER (WHERE status = 'CRITICAL')"
+            f" FROM history_all{where}"
+        )
+        total, unique_products, ok, low, critical = (await asyncio.to_thread(self._fetch, sql, params))[0]
+        return {
+            "total": total,
+            "unique_products": unique_products,
+            "OK": ok,
+            "LOW_STOCK": low,
+            "CRITICAL": critical,
+        }
+
+    async def activity_last_hour(
+        self,
+        *,
+        now: Optional[datetime] = None,
+    ) -> List[Tuple[datetime, int]]:
+        since = (now or datetime.utcnow()) - timedelta(hours=1)
+        sql = (
+            "SELECT date_trunc('minute', scanned_at) AS bucket, count(*)"
+            " FROM inventory_history WHERE scanned_at >= ?"
+            " GROUP BY bucket ORDER BY bucket"
+        )
+        return [(ts, cnt) for ts, cnt in await asyncio.to_thread(self._fetch, sql, [since])]
+
+    async def history_tail(
+        self,
+        product_ids: Sequence[str],
+        *,
+        dt_from: datetime,
+        limit_per_product: int,
+        daily: bool = False,
+    ) -> List[Tuple[str, datetime, int, Optional[str]]]:
+        """
+        Последние limit_per_product сканов каждого товара (новые первыми) — аналог
+        _history_tail_stmt из app/services/ai.py. daily=True: сначала последний скан дня.
+        """
+        source = (
+            "SELECT product_id, scanned_at, quantity, status FROM history_all"
+            " WHERE list_contains(?, product_id) AND scanned_at >= ?"
+        )
+        if daily:
+            source += (
+                " QUALIFY row_number() OVER ("
+                "PARTITION BY product_id, date_trunc('day', scanned_at) ORDER BY scanned_at DESC) = 1"
+            )
+        sql = (
+            f"SELECT * FROM ({source})"
+            " QUALIFY row_number() OVER (PARTITION BY product_id ORDER BY scanned_at DESC) <= ?"
+            " ORDER BY product_id, scanned_at DESC"
+        )
+        return await asyncio.to_thread(
+            self._fetch, sql, [list(product_ids), naive_utc(dt_from), limit_per_product]
+        )
+
+    async def latest_quantity(self, product_ids: Sequence[str]) -> Dict[str, int]:
+        """Количество из самого свежего скана каждого товара."""
+        sql = (
+            "SELECT product_id, arg_max(quantity, scanned_at) FROM history_all"
+            " WHERE list_contains(?, product_id) GROUP BY product_id"
+        )
+        rows = await asyncio.to_thread(self._fetch, sql, [list(product_ids)])
+        return {pid: int(qty or 0) for pid, qty in rows}
+
+
+def create_analytics_engine(
+    repo_factory: Callable[[], InventoryHistoryRepository],
+    archive: Optional[HistoryArchive] = None,
+) -> Optional[AnalyticsEngine]:
+    """Движок из настроек; None — аналитика идёт в Postgres (ANALYTICS_ENGINE=off)."""
+    if settings.ANALYTICS_ENGINE.lower() != "duckdb":
+        return None
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        logger.warning("analytics.unavailable", reason="duckdb is not installed")
+        return None
+    return AnalyticsEngine(
+        repo_factory=repo_factory,
+        archive=archive,
+        path=settings.ANALYTICS_DUCKDB_PATH,
+        sync_seconds=settings.ANALYTICS_SYNC_SECONDS,
+        reconcile_seconds=settings.ANALYTICS_RECONCILE_SECONDS,
+    )
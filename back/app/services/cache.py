@@ -1,10 +1,13 @@
+import asyncio
 import json
-from typing import Optional, Dict, Any, List
+import time
+from typing import Optional, Dict, Any, List, Sequence, Set, Tuple
 
 import redis.asyncio as redis
 import structlog
 
 from app.core.settings import settings
+from app.core.metrics import observe_cache
 
 logger = structlog.get_logger(__name__)
 
@@ -24,29 +27,76 @@ class CacheService:
 
     def __init__(self):
         self.redis_client: Optional[redis.Redis] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
 
     async def connect(self):
         """
         Устанавливает соединение с Redis и пингует его.
         Должна вызываться один раз при старте приложения.
+
+        Если Redis недоступен, сервис работает без кеша (redis_client=None),
+        а в фоне переподключается с экспоненциальной задержкой
+        (REDIS_RECONNECT_MIN_SECONDS .. REDIS_RECONNECT_MAX_SECONDS).
         """
+        if not settings.REDIS_URL:
+            logger.info("Redis is not configured, caching disabled")
+            return
+        if not await self._try_connect():
+            self._start_reconnect()
+
+    async def _try_connect(self) -> bool:
+        client: Optional[redis.Redis] = None
         try:
-            self.redis_client = redis.from_url(
+            client = redis.from_url(
                 settings.REDIS_URL,
                 encoding="utf-8",
                 decode_responses=True,  # строки, а не bytes
             )
-            await self.redis_client.ping()
-            logger.info("Connected to Redis")
+            await client.ping()
         except Exception as e:
             logger.error("Failed to connect to Redis", error=str(e))
-            self.redis_client = None
+            if client is not None:
+                try:
+                    await client.close()
+                except Exception:
+                    pass
+            return False
+        self.redis_client = client
+        logger.info("Connected to Redis")
+        return True
+
+    def _start_reconnect(self) -> None:
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self) -> None:
+        delay = settings.REDIS_RECONNECT_MIN_SECONDS
+        attempt = 0
+        while self.redis_client is None:
+            await asyncio.sleep(delay)
+            attempt += 1
+            if await self._try_connect():
+                logger.info("cache.redis_reconnected", attempts=attempt)
+                return
+            delay = min(delay * 2, settings.REDIS_RECONNECT_MAX_SECONDS)
+
+    async def ping(self) -> Optional[float]:
+        """RTT до Redis в миллисекундах или None, если соединения нет (для /ready)."""
+        if not self.redis_client:
+            return None
+        started = time.perf_counter()
+        await self.redis_client.ping()
+        return (time.perf_counter() - started) * 1000
 
     async def disconnect(self):
         """
         Закрывает соединение с Redis.
         Должна вызываться на shutdown приложения.
         """
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            await asyncio.gather(self._reconnect_task, return_exceptions=True)
+            self._reconnect_task = None
         if self.redis_client:
             await self.redis_client.close()
 
@@ -75,10 +125,46 @@ class CacheService:
         # Предрассчитанные агрегаты (сколько роботов в ошибке и т.д.)
         return "dashboard:stats"
 
+    @staticmethod
+    def _key_known_products() -> str:
+        # Общее для всех воркеров множество SKU, которые точно есть в таблице products
+        return "products:known"
+
+    @staticmethod
+    def _key_shelf_scans() -> str:
+        # Последний записанный скан по (product_id, zone, row, shelf) — для store-on-change ingest
+        return "inventory:shelf_scans"
+
+    @staticmethod
+    def _key_data_version() -> str:
+        # Монотонный счётчик версии складских данных (растёт на каждый commit ingest/импорта)
+        return "inventory:data_version"
+
+    @staticmethod
+    def _key_robots_version() -> str:
+        # То же для состояния роботов (растёт на каждый commit телеметрии/регистрации)
+        return "robots:data_version"
+
+    @staticmethod
+    def _key_changed_at(version_key: str) -> str:
+        # Unix-время последнего изменения версии (для Last-Modified)
+        return f"{version_key}:changed_at"
+
+    @staticmethod
+    def _key_ai_job(job_id: str) -> str:
+        # Состояние фоновой задачи прогноза
+        return f"ai:job:{job_id}"
+
+    @staticmethod
+    def _key_ai_result(cache_key: str) -> str:
+        # Готовый результат прогноза по (period_days, categories, data_version)
+        return f"ai:result:{cache_key}"
+
     # =========================
     # РОБОТЫ: ОПЕРАТИВНОЕ СОСТОЯНИЕ
     # =========================
 
+    @observe_cache()
     async def set_robot_state(
         self,
         robot_id: str,
@@ -114,6 +200,7 @@ class CacheService:
         else:
             await self.redis_client.set(key, data)
 
+    @observe_cache(lookup=True)
     async def get_robot_state(self, robot_id: str) -> Optional[Dict[str, Any]]:
         """
         Возвращает последнее состояние конкретного робота из Redis.
@@ -133,6 +220,7 @@ class CacheService:
             logger.warning("Invalid JSON in robot state cache", key=key)
             return None
 
+    @observe_cache(lookup=True)
     async def get_all_robot_states(self) -> List[Dict[str, Any]]:
         """
         Возвращает список состояний всех роботов, которые сейчас есть в Redis.
@@ -167,6 +255,7 @@ class CacheService:
     # АНТИСПАМ / ДЕДУПЛИКАЦИЯ АВАРИЙ
     # =========================
 
+    @observe_cache()
     async def should_suppress_alert(
         self,
         robot_id: str,
@@ -211,6 +300,7 @@ class CacheService:
     # КЕШ ПРОФИЛЯ ПОЛЬЗОВАТЕЛЯ (РОЛИ / ДОСТУПЫ)
     # =========================
 
+    @observe_cache()
     async def set_user_profile(
         self,
         user_id: str,
@@ -239,6 +329,7 @@ class CacheService:
 
         await self.redis_client.set(key, data, ex=ttl_seconds)
 
+    @observe_cache(lookup=True)
     async def get_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
         """
         Возвращает профиль пользователя из кеша, либо None если его нет.
@@ -260,6 +351,7 @@ class CacheService:
             logger.warning("Invalid JSON in user profile cache", key=key)
             return None
 
+    @observe_cache()
     async def invalidate_user_profile(self, user_id: str) -> None:
         """
         Сбрасывает кеш профиля пользователя.
@@ -274,6 +366,7 @@ class CacheService:
     # ДАШБОРДНЫЕ МЕТРИКИ (АГРЕГАТЫ)
     # =========================
 
+    @observe_cache()
     async def set_dashboard_stats(
         self,
         stats: Dict[str, Any],
@@ -303,6 +396,7 @@ class CacheService:
         data = json.dumps(stats)
         await self.redis_client.set(key, data, ex=ttl_seconds)
 
+    @observe_cache(lookup=True)
     async def get_dashboard_stats(self) -> Optional[Dict[str, Any]]:
         """
         Возвращает предрассчитанные метрики дашборда.
@@ -325,3 +419,197 @@ class CacheService:
         except json.JSONDecodeError:
             logger.warning("Invalid JSON in dashboard stats cache", key=key)
             return None
+
+
+    # =========================
+    # ИЗВЕСТНЫЕ ТОВАРЫ (SKU)
+    # =========================
+
+    @observe_cache(lookup=True)
+    async def get_known_products(self, product_ids: Sequence[str]) -> Set[str]:
+        """
+        Возвращает подмножество product_ids, которые другие воркеры
+        уже отметили как существующие в таблице products.
+
+        Один SMISMEMBER на всю пачку, без похода в Postgres.
+        """
+        if not self.redis_client or not product_ids:
+            return set()
+
+        ids = list(product_ids)
+        flags = await self.redis_client.smismember(self._key_known_products(), ids)
+        return {pid for pid, flag in zip(ids, flags) if flag}
+
+    @observe_cache()
+    async def add_known_products(
+        self,
+        product_ids: Sequence[str],
+        ttl_seconds: int = 600,
+    ) -> None:
+        """
+        Отмечает SKU как существующие (вызывать только после commit).
+        TTL продлевается на всё множество, чтобы удалённые вручную товары
+        рано или поздно "выветрились" из кеша.
+        """
+        if not self.redis_client or not product_ids:
+            return
+
+        key = self._key_known_products()
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.sadd(key, *product_ids)
+            pipe.expire(key, ttl_seconds)
+            await pipe.execute()
+
+    # =========================
+    # ПОСЛЕДНИЕ СКАНЫ ПОЛОК (STORE-ON-CHANGE)
+    # =========================
+
+    @observe_cache(lookup=True)
+    async def get_shelf_scans(self, slots: Sequence[str]) -> Optional[List[Optional[str]]]:
+        """
+        Закодированные последние сканы для slots (поля хеша, см. ScanChangeFilter)
+        одним HMGET, в порядке slots; None вместо записи — скана ещё не было.
+        None целиком — Redis недоступен: сравнивать не с чем.
+        """
+        if not self.redis_client:
+            return None
+        if not slots:
+            return []
+        return await self.redis_client.hmget(self._key_shelf_scans(), list(slots))
+
+    @observe_cache()
+    async def set_shelf_scans(self, scans: Dict[str, str], ttl_seconds: int) -> None:
+        """
+        Сохраняет последние сканы (вызывать только после commit).
+        TTL на весь хеш: без телеметрии он выветривается, и следующий скан каждой полки
+        снова пишется в историю.
+        """
+        if not self.redis_client or not scans:
+            return
+
+        key = self._key_shelf_scans()
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.hset(key, mapping=scans)
+            pipe.expire(key, ttl_seconds)
+            await pipe.execute()
+
+    # =========================
+    # ВЕРСИЯ ДАННЫХ
+    # =========================
+
+    @observe_cache()
+    async def bump_data_version(self) -> Optional[int]:
+        """
+        Увеличивает версию складских данных. Вызывать после успешного commit
+        записи в inventory_history. Любой кеш, ключ которого включает версию,
+        после этого автоматически становится неактуальным.
+        """
+        return await self._bump_version(self._key_data_version())
+
+    @observe_cache()
+    async def bump_robots_version(self) -> Optional[int]:
+        """Увеличивает версию состояния роботов (после commit телеметрии/регистрации)."""
+        return await self._bump_version(self._key_robots_version())
+
+    async def _bump_version(self, key: str) -> Optional[int]:
+        if not self.redis_client:
+            return None
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.incr(key)
+            pipe.set(self._key_changed_at(key), repr(time.time()))
+            version, _ = await pipe.execute()
+        return int(version)
+
+    @observe_cache()
+    async def get_data_version(self) -> Optional[int]:
+        """
+        Текущая версия складских данных или None, если Redis недоступен
+        (тогда кешировать производные данные нельзя — нечем их инвалидировать).
+        """
+        if not self.redis_client:
+            return None
+        raw = await self.redis_client.get(self._key_data_version())
+        return int(raw) if raw is not None else 0
+
+    @observe_cache()
+    async def get_versions(self) -> Optional[Dict[str, Tuple[int, Optional[float]]]]:
+        """
+        Версии складских данных и состояния роботов с временем последнего
+        изменения одним MGET: {"inventory": (версия, unix-время), "robots": (...)}.
+        None — Redis недоступен.
+        """
+        if not self.redis_client:
+            return None
+        keys = {"inventory": self._key_data_version(), "robots": self._key_robots_version()}
+        raw = await self.redis_client.mget(
+            [k for key in keys.values() for k in (key, self._key_changed_at(key))]
+        )
+        return {
+            scope: (
+                int(raw[2 * i]) if raw[2 * i] is not None else 0,
+                float(raw[2 * i + 1]) if raw[2 * i + 1] is not None else None,
+            )
+            for i, scope in enumerate(keys)
+        }
+
+    # =========================
+    # ПРОГНОЗЫ ИИ: ЗАДАЧИ И РЕЗУЛЬТАТЫ
+    # =========================
+
+    @observe_cache()
+    async def set_ai_job(
+        self,
+        job_id: str,
+        job: Dict[str, Any],
+        ttl_seconds: int = 3600,
+    ) -> None:
+        """Сохраняет состояние задачи прогноза (видно всем воркерам)."""
+        if not self.redis_client:
+            return
+        await self.redis_client.set(self._key_ai_job(job_id), json.dumps(job), ex=ttl_seconds)
+
+    @observe_cache(lookup=True)
+    async def get_ai_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if not self.redis_client:
+            return None
+
+        key = self._key_ai_job(job_id)
+        raw = await self.redis_client.get(key)
+        if raw is None:
+            return None
+
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            logger.warning("Invalid JSON in ai job cache", key=key)
+            return None
+
+    @observe_cache()
+    async def set_ai_result(
+        self,
+        cache_key: str,
+        result: Dict[str, Any],
+        ttl_seconds: int = 300,
+    ) -> None:
+        """Кладёт готовый прогноз; ttl_seconds — окно свежести."""
+        if not self.redis_client:
+            return
+        await self.redis_client.set(
+            self._key_ai_result(cache_key), json.dumps(result), ex=ttl_seconds
+        )
+
+    @observe_cache(lookup=True)
+    async def get_ai_result(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        if not self.redis_client:
+            return None
+
+        key = self._key_ai_result(cache_key)
+        raw = await self.redis_client.get(key)
+        if raw is None:
+            return None
+
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            logger.warning("Invalid JSON in ai result cache", key=key)
+            return None
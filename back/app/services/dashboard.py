@@ -1,10 +1,12 @@
 # app/services/dashboard.py
 from __future__ import annotations
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timedelta
 
 from sqlalchemy import select, func, desc
 
+from app.core.serialization import rows_to_models
+from app.core.single_flight import single_flight
 from app.db.base import Robots, InventoryHistory
 from app.repo.robot import RobotRepository
 from app.repo.inventory import InventoryHistoryRepository
@@ -25,12 +27,17 @@ class DashboardService:
         self.robot_repo = robot_repo
         self.history_repo = history_repo
 
-    async def get_dashboard_data(self) -> DashboardResponse:
+    @single_flight("dashboard")
+    async def get_dashboard_data(self, version: Optional[str] = None) -> DashboardResponse:
         """
         Собирает:
         - текущее состояние роботов
         - последние сканы
         - статистику по складу
+
+        version — версия данных (ETag из conditional_get), прочитанная ДО запросов:
+        в расчёте не участвует, только разделяет ключи single-flight, чтобы вызов
+        после bump версии не получил результат, начатый или закешированный до него.
         """
 
         # 1. Список роботов
@@ -42,7 +49,8 @@ class DashboardService:
         # 3. Статистика
         stats = await self._get_statistics()
 
-        return DashboardResponse(
+        # части уже собраны из строк БД — без повторной валидации списков
+        return DashboardResponse.model_construct(
             robots=robots,
             recent_scans=recent_scans,
             statistics=stats,
@@ -50,25 +58,14 @@ class DashboardService:
 
     async def _get_all_robots(self) -> List[RobotInfo]:
         """
-        Берём всех роботов.
+        Берём всех роботов: только нужные колонки (Core, без ORM-объектов),
+        модели — одним вызовом TypeAdapter на весь список.
         """
         session = self.robot_repo.session  # AsyncSession
-        query = select(Robots)
+        query = select(*(getattr(Robots, f) for f in RobotInfo.model_fields))
         result = await session.execute(query)
-        rows = result.scalars().all()
-
-        return [
-            RobotInfo(
-                robot_id=row.robot_id,
-                status=row.status,
-                battery_level=row.battery_level,
-                last_update=row.last_update,
-                zone=row.zone,
-                row=row.row,
-                shelf=row.shelf,
-            )
-            for row in rows
-        ]
+
+        return rows_to_models(RobotInfo, result.all())
 
     async def _get_recent_scans(self, limit: int = 20) -> List[RecentScanItem]:
         """
@@ -76,27 +73,13 @@ class DashboardService:
         """
         session = self.history_repo.session  # AsyncSession
         query = (
-            select(InventoryHistory)
+            select(*(getattr(InventoryHistory, f) for f in RecentScanItem.model_fields))
             .order_by(desc(InventoryHistory.scanned_at))
             .limit(limit)
         )
         result = await session.execute(query)
-        rows = result.scalars().all()
-
-        return [
-            RecentScanItem(
-                id=row.id,
-                robot_id=row.robot_id,
-                product_id=row.product_id,
-                quantity=row.quantity,
-                status=row.status,
-                zone=row.zone,
-                row_number=row.row_number,
-                shelf_number=row.shelf_number,
-                scanned_at=row.scanned_at,
-            )
-            for row in rows
-        ]
+
+        return rows_to_models(RecentScanItem, result.all())
 
     async def _get_statistics(self) -> DashboardStatistics:
         """
@@ -137,7 +120,7 @@ class DashboardService:
         )
         scans_last_hour = (await session_h.execute(q_last_hour)).scalar_one() or 0
 
-        return DashboardStatistics(
+        return DashboardStatistics.model_construct(
             total_robots=total_robots,
             offline_robots=offline_robots,
             critical_items=critical_items,
@@ -1,11 +1,129 @@
 from __future__ import annotations
 
-from typing import List
+import csv
+import io
+import json
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
 from io import BytesIO
 from datetime import datetime
-from openpyxl import Workbook
 
-from app.repo.inventory import InventoryHistoryRepository
+from app.repo.inventory import EXPORT_COLUMNS, InventoryHistoryRepository
+
+
+# формат -> (media type, расширение файла)
+EXPORT_FORMATS: Dict[str, Tuple[str, str]] = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+_DATETIME_COLUMNS = tuple(i for i, c in enumerate(EXPORT_COLUMNS) if c in ("scanned_at", "created_at"))
+
+
+class ExportFormatUnavailable(RuntimeError):
+    """Формат не поддерживается или для него не установлена зависимость."""
+
+
+def _iso_rows(rows: Sequence[tuple]) -> List[list]:
+    out = []
+    for row in rows:
+        row = list(row)
+        for i in _DATETIME_COLUMNS:
+            if row[i] is not None:
+                row[i] = row[i].isoformat()
+        out.append(row)
+    return out
+
+
+class _NdjsonEncoder:
+    def __init__(self) -> None:
+        self._dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+    def header(self) -> bytes:
+        return b""
+
+    def batch(self, rows: Sequence[tuple]) -> bytes:
+        dumps = self._dumps
+        lines = [dumps(dict(zip(EXPORT_COLUMNS, row))) for row in _iso_rows(rows)]
+        lines.append("")
+        return "\n".join(lines).encode()
+
+    def footer(self) -> bytes:
+        return b""
+
+
+class _CsvEncoder:
+    def __init__(self) -> None:
+        self._buf = io.StringIO()
+        self._writer = csv.writer(self._buf, lineterminator="\n")
+
+    def _drain(self) -> bytes:
+        data = self._buf.getvalue().encode()
+        self._buf.seek(0)
+        self._buf.truncate()
+        return data
+
+    def header(self) -> bytes:
+        self._writer.writerow(EXPORT_COLUMNS)
+        return self._drain()
+
+    def batch(self, rows: Sequence[tuple]) -> bytes:
+        self._writer.writerows(_iso_rows(rows))
+        return self._drain()
+
+    def footer(self) -> bytes:
+        return b""
+
+
+class _ArrowEncoder:
+    """Arrow IPC stream: schema, затем record batch на каждую пачку курсора."""
+
+    def __init__(self) -> None:
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise ExportFormatUnavailable("Arrow export requires pyarrow") from e
+        self._pa = pa
+        self._schema = pa.schema([
+            ("id", pa.int64()),
+            ("robot_id", pa.string()),
+            ("product_id", pa.string()),
+            ("quantity", pa.int32()),
+            ("zone", pa.string()),
+            ("row_number", pa.int32()),
+            ("shelf_number", pa.int32()),
+            ("status", pa.string()),
+            ("scanned_at", pa.timestamp("us")),
+            ("created_at", pa.timestamp("us")),
+        ])
+        self._sink = io.BytesIO()
+        self._writer = None
+
+    def _drain(self) -> bytes:
+        data = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return data
+
+    def header(self) -> bytes:
+        self._writer = self._pa.ipc.new_stream(self._sink, self._schema)
+        return self._drain()
+
+    def batch(self, rows: Sequence[tuple]) -> bytes:
+        columns = list(zip(*rows))
+        batch = self._pa.RecordBatch.from_arrays(
+            [self._pa.array(col, type=field.type) for col, field in zip(columns, self._schema)],
+            schema=self._schema,
+        )
+        self._writer.write_batch(batch)
+        return self._drain()
+
+    def footer(self) -> bytes:
+        self._writer.close()
+        return self._drain()
+
+
+_ENCODERS = {"ndjson": _NdjsonEncoder, "csv": _CsvEncoder, "arrow": _ArrowEncoder}
 
 
 class ExportService:
@@ -16,6 +134,9 @@ class ExportService:
         """
         Возвращает Excel-файл (в памяти) как bytes.
         """
+        # openpyxl грузится ~0.2 с — только при первом экспорте, а не на старте воркера
+        from openpyxl import Workbook
+
         records = await self.history_repo.get_by_ids(ids)
 
         wb = Workbook()
@@ -54,3 +175,54 @@ class ExportService:
         stream.seek(0)
 
         return stream.read()
+
+    def stream_inventory_history(
+        self,
+        fmt: str,
+        *,
+        dt_from: Optional[datetime] = None,
+        dt_to: Optional[datetime] = None,
+        zones: Optional[Sequence[str]] = None,
+        statuses: Optional[Sequence[str]] = None,
+        product_id: Optional[str] = None,
+        batch_size: int = 5000,
+    ) -> AsyncIterator[bytes]:
+        """
+        Массовая выгрузка inventory_history под фильтром в NDJSON / CSV / Arrow IPC.
+
+        Формат проверяется сразу (ExportFormatUnavailable — до начала ответа), строки
+        читаются серверным курсором пачками по batch_size. Следующая пачка не читается,
+        пока предыдущая не ушла в сокет (StreamingResponse ждёт send), — в памяти
+        воркера не больше одной пачки, скорость задаёт клиент.
+        """
+        encoder_cls = _ENCODERS.get(fmt)
+        if encoder_cls is None:
+            raise ExportFormatUnavailable(f"Unknown export format: {fmt}")
+        encoder = encoder_cls()
+
+        return self._iter_encoded(
+            encoder,
+            dict(
+                dt_from=dt_from,
+                dt_to=dt_to,
+                zones=zones,
+                statuses=statuses,
+                product_id=product_id,
+                batch_size=batch_size,
+            ),
+        )
+
+    async def _iter_encoded(self, encoder, filters: dict) -> AsyncIterator[bytes]:
+        try:
+            head = encoder.header()
+            if head:
+                yield head
+            async for rows in self.history_repo.stream_rows(**filters):
+                yield encoder.batch(rows)
+            tail = encoder.footer()
+            if tail:
+                yield tail
+        finally:
+            # сессия создана фабрикой контейнера только под эту выгрузку; закрываем курсор
+            # и возвращаем соединение в пул, даже если клиент оборвал загрузку
+            await self.history_repo.session.close()
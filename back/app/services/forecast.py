@@ -0,0 +1,158 @@
+# app/services/forecast.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+
+@dataclass(slots=True)
+class LocalForecast:
+    """Прогноз по одному SKU, посчитанный без LLM."""
+    product_id: str
+    category: Optional[str]
+    avg_daily_demand: float
+    expected_demand: int
+    days_until_stockout: Optional[float]
+    recommended_order_quantity: int
+    confidence: float
+    anomalous: bool
+
+    def as_prediction(self) -> Dict[str, Any]:
+        # тот же формат, что LLM возвращает в "predictions"
+        return {
+            "product_id": self.product_id,
+            "category": self.category,
+            "expected_demand": self.expected_demand,
+            "days_until_stockout": self.days_until_stockout,
+            "recommended_order_quantity": self.recommended_order_quantity,
+        }
+
+
+def _to_epoch(ts: Any) -> float:
+    if isinstance(ts, datetime):
+        return ts.timestamp()
+    if isinstance(ts, (int, float)):
+        return float(ts)
+    return datetime.fromisoformat(str(ts)).timestamp()
+
+
+class StatisticalForecaster:
+    """
+    Векторизованный (NumPy) прогноз спроса по всем SKU сразу — тот же рецепт,
+    что описан в промпте LLM:
+
+      avg_daily_demand           — экспоненциально сглаженная скорость расхода
+                                   (падения остатка между соседними сканами / дни)
+      days_until_stockout        = current_qty / avg_daily_demand
+      recommended_order_quantity = max(0, target - current_qty),
+                                   target = max(optimal_stock, expected_demand)
+
+    Дополнительно по каждому SKU считается линейный тренд остатка и разброс
+    скоростей расхода: SKU с малым числом наблюдений, большим разбросом или
+    расхождением EWMA и тренда помечаются anomalous — их есть смысл отдать LLM.
+
+    Вход — элементы payload["products"] из AIService.predict:
+    {"product_id", "category", "optimal_stock", "current_qty",
+     "history": [{"ts", "qty", ...}, ...]}  (history от новых к старым)
+    """
+
+    # интервал между сканами меньше часа считаем часом, чтобы не получать "взрывные" скорости
+    _MIN_INTERVAL_DAYS = 1.0 / 24.0
+
+    def __init__(
+        self,
+        alpha: float = 0.3,
+        cv_threshold: float = 1.0,
+        trend_tolerance: float = 0.5,
+        min_intervals: int = 2,
+    ):
+        self.alpha = alpha
+        self.cv_threshold = cv_threshold
+        self.trend_tolerance = trend_tolerance
+        self.min_intervals = min_intervals
+
+    def forecast(self, products: Sequence[Dict[str, Any]], period_days: int) -> List[LocalForecast]:
+        n = len(products)
+        if n == 0:
+            return []
+
+        # numpy нужен только прогнозу — не тянем его в импорт приложения
+        import numpy as np
+
+        # 1) Рваные истории -> плотные матрицы (n x L), хронологический порядок, выравнивание влево
+        width = max(2, max(len(p.get("history") or []) for p in products))
+        qty = np.zeros((n, width), dtype=np.float64)
+        ts = np.zeros((n, width), dtype=np.float64)
+        mask = np.zeros((n, width), dtype=bool)
+        for i, p in enumerate(products):
+            hist = p.get("history") or []
+            k = len(hist)
+            if not k:
+                continue
+            chrono = hist[::-1]
+            qty[i, :k] = [h.get("qty") or 0 for h in chrono]
+            ts[i, :k] = [_to_epoch(h["ts"]) for h in chrono]
+            mask[i, :k] = True
+
+        current = np.array([float(p.get("current_qty") or 0) for p in products])
+        optimal = np.array([float(p.get("optimal_stock") or 0) for p in products])
+
+        # 2) Скорости расхода между соседними сканами (пополнения не считаем расходом)
+        dq = qty[:, 1:] - qty[:, :-1]
+        dt_days = np.maximum((ts[:, 1:] - ts[:, :-1]) / 86400.0, self._MIN_INTERVAL_DAYS)
+        pair = mask[:, 1:] & mask[:, :-1]
+        restock = pair & (dq > 0)
+        valid = pair & ~restock
+        rates = np.where(valid, -dq / dt_days, 0.0)
+        n_valid = valid.sum(axis=1)
+
+        # 3) EWMA скоростей: самый свежий интервал с весом alpha, далее (1-alpha)^k
+        rank_from_end = np.cumsum(valid[:, ::-1], axis=1)[:, ::-1] - 1
+        weights = np.where(valid, self.alpha * (1.0 - self.alpha) ** rank_from_end, 0.0)
+        wsum = weights.sum(axis=1)
+        ewma = np.divide((weights * rates).sum(axis=1), wsum, out=np.zeros(n), where=wsum > 0)
+
+        # 4) Разброс скоростей (коэффициент вариации)
+        mean = np.divide(rates.sum(axis=1), n_valid, out=np.zeros(n), where=n_valid > 0)
+        sq = np.where(valid, (rates - mean[:, None]) ** 2, 0.0).sum(axis=1)
+        std = np.sqrt(np.divide(sq, n_valid, out=np.zeros(n), where=n_valid > 0))
+        cv = np.divide(std, mean, out=np.zeros(n), where=mean > 0)
+
+        # 5) Линейный тренд остатка (МНК по каждой строке)
+        m = mask.sum(axis=1).astype(np.float64)
+        t = np.where(mask, (ts - ts[:, :1]) / 86400.0, 0.0)
+        q = np.where(mask, qty, 0.0)
+        s_t, s_q, s_tt, s_tq = t.sum(1), q.sum(1), (t * t).sum(1), (t * q).sum(1)
+        denom = m * s_tt - s_t * s_t
+        slope = np.divide(m * s_tq - s_t * s_q, denom, out=np.zeros(n), where=np.abs(denom) > 1e-12)
+        trend = np.maximum(-slope, 0.0)
+
+        # 6) Метрики по рецепту
+        demand = np.maximum(ewma, 0.0)
+        expected = np.rint(demand * period_days)
+        has_demand = demand > 1e-9
+        stockout = np.divide(current, demand, out=np.zeros(n), where=has_demand)
+        target = np.where(optimal > 0, np.maximum(optimal, expected), expected)
+        recommended = np.maximum(0.0, target - current)
+
+        # 7) Аномалии и уверенность
+        scale = np.maximum(np.maximum(ewma, trend), 1e-9)
+        disagree = (np.abs(ewma - trend) / scale > self.trend_tolerance) & ~restock.any(axis=1)
+        anomalous = (n_valid < self.min_intervals) | (cv > self.cv_threshold) | disagree
+        confidence = np.clip(1.0 - 0.5 * cv, 0.2, 0.9) * np.minimum(1.0, n_valid / 8.0)
+        confidence = np.maximum(confidence, 0.1)
+
+        return [
+            LocalForecast(
+                product_id=str(p.get("product_id")),
+                category=p.get("category"),
+                avg_daily_demand=float(demand[i]),
+                expected_demand=int(expected[i]),
+                days_until_stockout=round(float(stockout[i]), 1) if has_demand[i] else None,
+                recommended_order_quantity=int(recommended[i]),
+                confidence=round(float(confidence[i]), 2),
+                anomalous=bool(anomalous[i]),
+            )
+            for i, p in enumerate(products)
+        ]
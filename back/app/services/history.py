@@ -7,7 +7,11 @@ from typing import List, Optional, Sequence, Tuple
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.serialization import rows_to_models
+from app.core.single_flight import single_flight
 from app.repo.inventory import InventoryHistoryRepository
+from app.services.analytics import AnalyticsEngine
+from app.services.history_archive import HistoryArchive
 from app.schemas.inventory import (
     InventoryRecordCreate,
     InventoryRecordOut,
@@ -18,6 +22,11 @@ from app.schemas.inventory import (
 )
 
 
+def _nulls_last(value):
+    # ключ сортировки с NULL "больше любого значения", как в Postgres
+    return (True, 0) if value is None else (False, value)
+
+
 class HistoryService:
     """
     Сервисный слой над InventoryHistoryRepository.
@@ -26,11 +35,29 @@ class HistoryService:
     - валидация входных данных (уже делает Pydantic)
     - вызов репозитория
     - commit/refresh при изменениях
-    - преобразование ORM -> Pydantic для ответа наружу
+    - преобразование строк БД -> Pydantic для ответа наружу (чтения — строки Core
+      и один вызов TypeAdapter на страницу, см. rows_to_models)
+    - если задан archive: история и сводка за диапазон, заходящий за горизонт
+      горячих данных, дочитываются из Parquet-архива
+    - если задан analytics (DuckDB) и его реплика догнана: сводка и активность
+      считаются в нём, а не в Postgres
     """
 
-    def __init__(self, repo: InventoryHistoryRepository):
+    def __init__(
+        self,
+        repo: InventoryHistoryRepository,
+        archive: Optional[HistoryArchive] = None,
+        analytics: Optional[AnalyticsEngine] = None,
+    ):
         self.repo = repo
+        self.archive = archive
+        self.analytics = analytics
+
+    def _analytics_ready(self) -> bool:
+        return self.analytics is not None and self.analytics.ready
+
+    def _reaches_archive(self, dt_from: Optional[datetime]) -> bool:
+        return self.archive is not None and self.archive.covers(dt_from)
 
     # ---------------------------
     # CREATE
@@ -93,7 +120,21 @@ class HistoryService:
         Исторические данные с фильтрами, пагинацией и сортировкой.
         То, что нужно для экрана /history.
         """
-        items_orm, total = await self.repo.list(
+        if self._reaches_archive(dt_from):
+            return await self._get_history_with_archive(
+                dt_from=dt_from,
+                dt_to=dt_to,
+                zones=zones,
+                statuses=statuses,
+                product_id=product_id,
+                q=q,
+                limit=limit,
+                offset=offset,
+                sort_by=sort_by,
+                sort_dir=sort_dir,
+            )
+
+        rows, total = await self.repo.list(
             dt_from=dt_from,
             dt_to=dt_to,
             zones=zones,
@@ -106,15 +147,72 @@ class HistoryService:
             sort_dir=sort_dir,
         )
 
-        items = [InventoryRecordOut.model_validate(obj) for obj in items_orm]
+        # строки Core -> модели одним вызовом pydantic-core; обёртка — без повторной проверки списка
+        items = rows_to_models(InventoryRecordOut, rows)
 
-        return InventoryHistoryListOut(
+        return InventoryHistoryListOut.model_construct(
             items=items,
             total=total,
             limit=limit,
             offset=offset,
         )
 
+    async def _get_history_with_archive(
+        self,
+        *,
+        limit: int,
+        offset: int,
+        sort_by: str,
+        sort_dir: str,
+        **filters,
+    ) -> InventoryHistoryListOut:
+        """
+        Страница из двух частей: Postgres (горячая) + Parquet (холодная).
+
+        По scanned_at части не пересекаются по времени — архив целиком старше,
+        поэтому страница склеивается сдвигом offset: при desc сначала горячая
+        часть, потом архив, при asc — наоборот. Для остальных полей сортировки
+        берём первые offset+limit строк из каждой части и сливаем.
+        """
+        desc = sort_dir.lower() != "asc"
+        if sort_by not in InventoryHistoryRepository._SORT_FIELDS:
+            sort_by = "scanned_at"
+
+        if sort_by == "scanned_at":
+            first, second = (self.repo, self.archive) if desc else (self.archive, self.repo)
+            first_items, first_total = await first.list(
+                **filters, limit=limit, offset=offset, sort_by=sort_by, sort_dir=sort_dir,
+            )
+            second_items, second_total = await second.list(
+                **filters,
+                limit=limit - len(first_items),
+                offset=max(0, offset - first_total),
+                sort_by=sort_by,
+                sort_dir=sort_dir,
+            )
+            items = rows_to_models(InventoryRecordOut, (*first_items, *second_items))
+            total = first_total + second_total
+        else:
+            hot_items, hot_total = await self.repo.list(
+                **filters, limit=offset + limit, offset=0, sort_by=sort_by, sort_dir=sort_dir,
+            )
+            cold_items, cold_total = await self.archive.list(
+                **filters, limit=offset + limit, offset=0, sort_by=sort_by, sort_dir=sort_dir,
+            )
+            merged = rows_to_models(InventoryRecordOut, (*hot_items, *cold_items))
+            # NULL — как в Postgres: в конце при asc, в начале при desc
+            merged.sort(key=lambda r: _nulls_last(getattr(r, sort_by)), reverse=desc)
+            items = merged[offset:offset + limit]
+            total = hot_total + cold_total
+
+        return InventoryHistoryListOut.model_construct(
+            items=items,
+            total=total,
+            limit=limit,
+            offset=offset,
+        )
+
+    @single_flight("history.recent_scans")
     async def get_recent_scans(
         self,
         *,
@@ -123,8 +221,8 @@ class HistoryService:
         """
         Последние N сканов (для таблицы 'последние сканирования' на дашборде).
         """
-        objs = await self.repo.recent_scans(limit=limit)
-        return [InventoryRecordOut.model_validate(o) for o in objs]
+        rows = await self.repo.recent_scans(limit=limit)
+        return rows_to_models(InventoryRecordOut, rows)
 
     async def get_records_by_ids(
         self,
@@ -141,6 +239,7 @@ class HistoryService:
     # SUMMARY / KPI
     # ---------------------------
 
+    @single_flight("history.summary")
     async def get_summary(
         self,
         *,
@@ -155,13 +254,28 @@ class HistoryService:
         total, unique_products, OK/LOW_STOCK/CRITICAL.
         Это данные для KPI-блока на странице истории.
         """
-        raw = await self.repo.summary(
+        filters = dict(
             dt_from=dt_from,
             dt_to=dt_to,
             zones=zones,
             statuses=statuses,
             product_id=product_id,
         )
+        if self._analytics_ready():
+            # DuckDB видит и реплику, и архив — складывать части не нужно
+            return InventorySummaryOut.model_validate(await self.analytics.summary(**filters))
+
+        raw = await self.repo.summary(**filters)
+
+        if self._reaches_archive(dt_from):
+            cold = await self.archive.summary(**filters)
+            products = cold["products"]
+            if products:
+                products = products.union(await self.repo.distinct_products(**filters))
+                raw["unique_products"] = len(products)
+            for key in ("total", "OK", "LOW_STOCK", "CRITICAL"):
+                raw[key] += cold[key]
+
         # repo.summary возвращает dict[str, int], нам нужно InventorySummaryOut
         return InventorySummaryOut.model_validate(raw)
 
@@ -169,6 +283,7 @@ class HistoryService:
     # ACTIVITY / GRAPH
     # ---------------------------
 
+    @single_flight("history.activity")
     async def get_activity_last_hour(
         self,
     ) -> InventoryActivityOut:
@@ -176,7 +291,10 @@ class HistoryService:
         Активность за последний час (по минутам),
         для графика активности роботов.
         """
-        raw_points = await self.repo.activity_last_hour()
+        if self._analytics_ready():
+            raw_points = await self.analytics.activity_last_hour()
+        else:
+            raw_points = await self.repo.activity_last_hour()
         # raw_points — это List[Tuple[datetime, int]]
 
         points = [
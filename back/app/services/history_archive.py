@@ -0,0 +1,376 @@
+# app/services/history_archive.py
+"""
+Холодный архив истории сканов: Parquet (zstd) на локальном диске.
+
+Строки inventory_history старше горизонта (HISTORY_HOT_DAYS) переносит
+app/workers/history_archiver.py; здесь — хранилище и чтение.
+
+Раскладка (hive-партиционирование, читается pyarrow.dataset / duckdb / spark):
+
+    <HISTORY_ARCHIVE_DIR>/day=2025-10-01/zone=A/part-<первый id>.parquet
+    <HISTORY_ARCHIVE_DIR>/_watermark.json   {"archived_before": "2025-10-02T00:00:00"}
+
+watermark — граница: всё, что отсканировано раньше, лежит в архиве (кроме
+опоздавших сканов, которые заберёт следующий прогон архиватора). Запросы,
+не заходящие за watermark, архив не трогают вообще.
+
+pyarrow тяжёлый на импорт, поэтому грузится только при первом обращении к архиву.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+from app.core.settings import settings
+from app.repo.inventory import EXPORT_COLUMNS
+
+WATERMARK_FILE = "_watermark.json"
+
+# колонки внутри parquet-файла: zone — партиция, в самих файлах её нет
+_FILE_COLUMNS = tuple(c for c in EXPORT_COLUMNS if c != "zone")
+_ZONE_INDEX = EXPORT_COLUMNS.index("zone")
+
+
+def naive_utc(dt: Optional[datetime]) -> Optional[datetime]:
+    # scanned_at хранится как TIMESTAMP без зоны (UTC)
+    if dt is None or dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _arrow_schema(pa, columns: Sequence[str]):
+    types = {
+        "id": pa.int64(),
+        "robot_id": pa.string(),
+        "product_id": pa.string(),
+        "quantity": pa.int32(),
+        "zone": pa.string(),
+        "row_number": pa.int32(),
+        "shelf_number": pa.int32(),
+        "status": pa.string(),
+        "scanned_at": pa.timestamp("us"),
+        "created_at": pa.timestamp("us"),
+        "day": pa.string(),
+    }
+    return pa.schema([(c, types[c]) for c in columns])
+
+
+class ArchiveDayWriter:
+    """
+    Запись одного дня: по parquet-файлу на зону, пачками (в памяти — одна пачка).
+    Файлы пишутся во временные имена и переименовываются в commit(): читатели
+    не видят недописанных файлов. Имя файла детерминировано (первый id), так что
+    повторный прогон после сбоя до DELETE перезапишет тот же файл, а не задублирует.
+    """
+
+    def __init__(self, root: Path, day: date, compression: str = "zstd"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._pq = pq
+        self.root = root
+        self.day = day
+        self.compression = compression
+        self._schema = _arrow_schema(pa, _FILE_COLUMNS)
+        # zone -> (writer, tmp path, first id)
+        self._writers: Dict[str, Tuple[Any, Path, int]] = {}
+        self.rows = 0
+
+    def _zone_dir(self, zone: str) -> Path:
+        return self.root / f"day={self.day.isoformat()}" / f"zone={quote(zone, safe='')}"
+
+    def write(self, rows: Sequence[tuple]) -> None:
+        """rows — кортежи в порядке EXPORT_COLUMNS (как отдаёт repo.stream_rows)."""
+        by_zone: Dict[str, List[tuple]] = {}
+        for row in rows:
+            by_zone.setdefault(row[_ZONE_INDEX], []).append(row)
+
+        for zone, zone_rows in by_zone.items():
+            entry = self._writers.get(zone)
+            if entry is None:
+                directory = self._zone_dir(zone)
+                directory.mkdir(parents=True, exist_ok=True)
+                first_id = zone_rows[0][0]
+                tmp = directory / f".part-{first_id}.parquet.tmp"
+                writer = self._pq.ParquetWriter(tmp, self._schema, compression=self.compression)
+                entry = self._writers[zone] = (writer, tmp, first_id)
+
+            columns = list(zip(*zone_rows))
+            del columns[_ZONE_INDEX]
+            table = self._pa.Table.from_arrays(
+                [self._pa.array(col, type=field.type) for col, field in zip(columns, self._schema)],
+                schema=self._schema,
+            )
+            entry[0].write_table(table)
+            self.rows += len(zone_rows)
+
+    def commit(self) -> List[Path]:
+        """Публикует файлы дня; если переименование сорвалось — не оставляет ни одного."""
+        paths = []
+        try:
+            for zone, (writer, tmp, first_id) in list(self._writers.items()):
+                writer.close()
+                final = tmp.with_name(f"part-{first_id}.parquet")
+                os.replace(tmp, final)
+                del self._writers[zone]
+                paths.append(final)
+        except BaseException:
+            for path in paths:
+                path.unlink(missing_ok=True)
+            self.abort()
+            raise
+        return paths
+
+    def abort(self) -> None:
+        for writer, tmp, _ in self._writers.values():
+            try:
+                writer.close()
+            finally:
+                tmp.unlink(missing_ok=True)
+        self._writers.clear()
+
+
+class HistoryArchive:
+    """
+    Чтение архива с теми же фильтрами, что у InventoryHistoryRepository.
+
+    Фильтры превращаются в выражения pyarrow.dataset: диапазон дат и зоны
+    отсекают целые каталоги-партиции, статус/товар проталкиваются в parquet
+    (статистики row group). Все методы чтения синхронные внутри и вызываются
+    через asyncio.to_thread, чтобы не блокировать event loop.
+    """
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self._dataset = None
+        self._dataset_version: Optional[int] = None
+        self._watermark: Optional[datetime] = None
+        self._watermark_version: Optional[int] = None
+
+    # ---------------------------
+    # WATERMARK
+    # ---------------------------
+
+    def _watermark_mtime(self) -> Optional[int]:
+        try:
+            return (self.root / WATERMARK_FILE).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def watermark(self) -> Optional[datetime]:
+        """Граница архива или None, если архиватор ещё ни разу не отработал."""
+        version = self._watermark_mtime()
+        if version != self._watermark_version:
+            self._watermark = None
+            if version is not None:
+                raw = json.loads((self.root / WATERMARK_FILE).read_text())
+                self._watermark = datetime.fromisoformat(raw["archived_before"])
+            self._watermark_version = version
+        return self._watermark
+
+    def set_watermark(self, archived_before: datetime) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f".{WATERMARK_FILE}.tmp"
+        tmp.write_text(json.dumps({"archived_before": naive_utc(archived_before).isoformat()}))
+        os.replace(tmp, self.root / WATERMARK_FILE)
+
+    def covers(self, dt_from: Optional[datetime]) -> bool:
+        """Заходит ли диапазон [dt_from, ...) в архив."""
+        watermark = self.watermark()
+        if watermark is None:
+            return False
+        return dt_from is None or naive_utc(dt_from) < watermark
+
+    # ---------------------------
+    # ЗАПИСЬ
+    # ---------------------------
+
+    def day_writer(self, day: date) -> ArchiveDayWriter:
+        return ArchiveDayWriter(self.root, day)
+
+    # ---------------------------
+    # ЧТЕНИЕ
+    # ---------------------------
+
+    def _get_dataset(self):
+        # список файлов перечитываем, только когда архиватор сдвинул watermark
+        # (он переписывает его в конце каждого дня)
+        version = self._watermark_mtime()
+        if self._dataset is None or version != self._dataset_version:
+            import pyarrow as pa
+            import pyarrow.dataset as ds
+
+            schema = _arrow_schema(pa, _FILE_COLUMNS + ("day", "zone"))
+            partitioning = ds.partitioning(
+                pa.schema([schema.field("day"), schema.field("zone")]),
+                flavor="hive",
+            )
+            self._dataset = ds.dataset(
+                self.root,
+                schema=schema,
+                format="parquet",
+                partitioning=partitioning,
+                exclude_invalid_files=False,
+                ignore_prefixes=[".", "_"],
+            )
+            self._dataset_version = version
+        return self._dataset
+
+    @staticmethod
+    def _expression(
+        *,
+        dt_from: Optional[datetime],
+        dt_to: Optional[datetime],
+        zones: Optional[Sequence[str]],
+        statuses: Optional[Sequence[str]],
+        product_id: Optional[str],
+        q: Optional[str],
+    ):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        conds = []
+        dt_from, dt_to = naive_utc(dt_from), naive_utc(dt_to)
+        if dt_from:
+            conds.append(pc.field("day") >= dt_from.date().isoformat())
+            conds.append(pc.field("scanned_at") >= pa.scalar(dt_from, pa.timestamp("us")))
+        if dt_to:
+            conds.append(pc.field("day") <= dt_to.date().isoformat())
+            conds.append(pc.field("scanned_at") <= pa.scalar(dt_to, pa.timestamp("us")))
+        if zones:
+            conds.append(pc.field("zone").isin(list(zones)))
+        if statuses:
+            conds.append(pc.field("status").isin(list(statuses)))
+        if product_id:
+            conds.append(pc.field("product_id") == product_id)
+        if q:
+            pattern = q.strip()
+            conds.append(
+                pc.match_substring(pc.field("product_id"), pattern, ignore_case=True)
+                | pc.match_substring(pc.field("zone"), pattern, ignore_case=True)
+                | pc.match_substring(pc.field("status"), pattern, ignore_case=True)
+            )
+
+        expr = None
+        for cond in conds:
+            expr = cond if expr is None else expr & cond
+        return expr
+
+    def _page(
+        self, *, limit: int, offset: int, sort_by: str, sort_dir: str, **filters
+    ) -> Tuple[List[dict], int]:
+        """
+        Страница и total одним проходом. Архивный диапазон может быть на миллионы
+        строк, поэтому читаются только ключ сортировки и id, пачками, с бегущим
+        top-k (в памяти — не больше offset+limit ключей и одна пачка); полные строки
+        дочитываются потом только для id страницы.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        dataset = self._get_dataset()
+        expr = self._expression(**filters)
+        if sort_by not in EXPORT_COLUMNS:
+            sort_by = "scanned_at"
+        order = "ascending" if sort_dir.lower() == "asc" else "descending"
+        # id — второй ключ: стабильный порядок страниц при одинаковом sort_by
+        sort_keys = [(sort_by, order)] if sort_by == "id" else [(sort_by, order), ("id", order)]
+        k = offset + limit
+
+        top = None
+        total = 0
+        for batch in dataset.to_batches(columns=[key for key, _ in sort_keys], filter=expr):
+            total += batch.num_rows
+            if k <= 0 or batch.num_rows == 0:
+                continue
+            chunk = pa.Table.from_batches([batch])
+            top = chunk if top is None else pa.concat_tables([top, chunk])
+            if top.num_rows > k:
+                top = top.take(pc.select_k_unstable(top, k=k, sort_keys=sort_keys))
+        if top is None or offset >= top.num_rows:
+            return [], total
+
+        ids = top.sort_by(sort_keys).column("id").slice(offset, limit)
+        by_id = pc.field("id").isin(ids)
+        rows = dataset.to_table(
+            columns=list(EXPORT_COLUMNS),
+            filter=by_id if expr is None else expr & by_id,
+        ).to_pylist()
+        position = {id_: i for i, id_ in enumerate(ids.to_pylist())}
+        rows.sort(key=lambda r: position[r["id"]])
+        return rows, total
+
+    def _summary(self, **filters) -> Dict[str, Any]:
+        import pyarrow.compute as pc
+
+        table = self._get_dataset().to_table(
+            columns=["product_id", "status"],
+            filter=self._expression(**filters),
+        )
+        by_status = {
+            row["values"]: row["counts"]
+            for row in pc.value_counts(table.column("status")).to_pylist()
+        }
+        return {
+            "total": table.num_rows,
+            "products": set(pc.unique(table.column("product_id")).to_pylist()),
+            "OK": by_status.get("OK", 0),
+            "LOW_STOCK": by_status.get("LOW_STOCK", 0),
+            "CRITICAL": by_status.get("CRITICAL", 0),
+        }
+
+    async def list(
+        self,
+        *,
+        dt_from: Optional[datetime] = None,
+        dt_to: Optional[datetime] = None,
+        zones: Optional[Sequence[str]] = None,
+        statuses: Optional[Sequence[str]] = None,
+        product_id: Optional[str] = None,
+        q: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+        sort_by: str = "scanned_at",
+        sort_dir: str = "desc",
+    ) -> Tuple[List[dict], int]:
+        """Страница архива (dict с колонками EXPORT_COLUMNS) и total под фильтром."""
+        filters = dict(
+            dt_from=dt_from, dt_to=dt_to, zones=zones,
+            statuses=statuses, product_id=product_id, q=q,
+        )
+
+        return await asyncio.to_thread(
+            self._page, limit=limit, offset=offset, sort_by=sort_by, sort_dir=sort_dir, **filters,
+        )
+
+    async def summary(
+        self,
+        *,
+        dt_from: Optional[datetime] = None,
+        dt_to: Optional[datetime] = None,
+        zones: Optional[Sequence[str]] = None,
+        statuses: Optional[Sequence[str]] = None,
+        product_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        То же, что repo.summary, но вместо unique_products — само множество
+        товаров: уникальные по горячей и холодной части не складываются.
+        """
+        return await asyncio.to_thread(
+            self._summary,
+            dt_from=dt_from, dt_to=dt_to, zones=zones,
+            statuses=statuses, product_id=product_id, q=None,
+        )
+
+
+def create_history_archive() -> Optional[HistoryArchive]:
+    """Архив из настроек; None — архив выключен (HISTORY_ARCHIVE_DIR не задан)."""
+    if not settings.HISTORY_ARCHIVE_DIR:
+        return None
+    return HistoryArchive(settings.HISTORY_ARCHIVE_DIR)
@@ -3,17 +3,27 @@ from __future__ import annotations
 
 import csv
 from io import StringIO
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from datetime import datetime
 
+import structlog
+
 from app.schemas.import_inventory import InventoryImportRow, InventoryImportResult
 from app.schemas.inventory import InventoryRecordCreate
 from app.repo.inventory import InventoryHistoryRepository
+from app.services.cache import CacheService
+
+logger = structlog.get_logger(__name__)
 
 
 class InventoryImportService:
-    def __init__(self, history_repo: InventoryHistoryRepository):
+    def __init__(
+        self,
+        history_repo: InventoryHistoryRepository,
+        cache_service: Optional[CacheService] = None,
+    ):
         self.history_repo = history_repo
+        self.cache_service = cache_service
 
     async def import_csv(self, csv_text: str) -> InventoryImportResult:
         """
@@ -62,6 +72,12 @@ class InventoryImportService:
                 await self.history_repo.session.rollback()
                 errors.append(f"DB commit failed: {e}")
 
+        if success_count and self.cache_service is not None:
+            try:
+                await self.cache_service.bump_data_version()
+            except Exception as e:
+                logger.warning("cache.data_version_bump_failed", error=str(e))
+
         failed_count = len(errors)
 
         return InventoryImportResult(
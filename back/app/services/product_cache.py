@@ -0,0 +1,110 @@
+# app/services/product_cache.py
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Set
+
+import structlog
+
+from app.services.cache import CacheService
+
+logger = structlog.get_logger(__name__)
+
+
+class KnownProductsCache:
+    """
+    Внутрипроцессный кеш SKU, которые уже точно есть в таблице products.
+
+    Каталог маленький и почти не меняется, а ensure_products_exist
+    (INSERT ... ON CONFLICT DO NOTHING + flush) вызывается на каждый пакет телеметрии.
+    Поэтому перед вставкой спрашиваем кеш и отправляем в БД только реально новые SKU.
+
+    Уровни:
+    - локальный LRU с TTL (ограничен max_size)
+    - опционально общее множество в Redis через CacheService,
+      чтобы SKU, вставленный одним воркером, не вставлялся повторно остальными
+
+    Ошибки Redis не роняют ingest: SKU просто считается неизвестным,
+    и вставка идёт как раньше (ON CONFLICT делает её безопасной).
+    """
+
+    def __init__(
+        self,
+        cache_service: Optional[CacheService] = None,
+        max_size: int = 10_000,
+        ttl_seconds: float = 600.0,
+    ):
+        self.cache_service = cache_service
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # product_id -> момент (monotonic), после которого запись протухает
+        self._known: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._known)
+
+    def _remember(self, product_ids: Iterable[str], now: float) -> None:
+        expires_at = now + self.ttl_seconds
+        for pid in product_ids:
+            self._known[pid] = expires_at
+            self._known.move_to_end(pid)
+        while len(self._known) > self.max_size:
+            self._known.popitem(last=False)
+
+    def _is_known_locally(self, product_id: str, now: float) -> bool:
+        expires_at = self._known.get(product_id)
+        if expires_at is None:
+            return False
+        if expires_at <= now:
+            self._known.pop(product_id, None)
+            return False
+        self._known.move_to_end(product_id)
+        return True
+
+    async def filter_unknown(self, product_ids: Iterable[str]) -> Set[str]:
+        """
+        Возвращает те product_ids, которые нужно вставить в products.
+        Всё, что найдено в Redis, сразу запоминаем локально.
+        """
+        now = time.monotonic()
+        unknown = {pid for pid in product_ids if not self._is_known_locally(pid, now)}
+        if not unknown or self.cache_service is None:
+            return unknown
+
+        try:
+            shared = await self.cache_service.get_known_products(sorted(unknown))
+        except Exception as e:
+            logger.warning("product_cache.redis_lookup_failed", error=str(e))
+            return unknown
+
+        if shared:
+            self._remember(shared, now)
+        return unknown - shared
+
+    async def mark_known(self, product_ids: Iterable[str]) -> None:
+        """
+        Отмечает SKU как существующие. Вызывать только ПОСЛЕ успешного commit,
+        иначе откат транзакции оставит в кеше товар, которого нет в БД.
+        """
+        ids = list(product_ids)
+        if not ids:
+            return
+
+        self._remember(ids, time.monotonic())
+
+        if self.cache_service is None:
+            return
+        try:
+            await self.cache_service.add_known_products(
+                ids, ttl_seconds=int(self.ttl_seconds)
+            )
+        except Exception as e:
+            logger.warning("product_cache.redis_store_failed", error=str(e))
+
+    def invalidate(self, product_id: Optional[str] = None) -> None:
+        """Сбросить один SKU или весь локальный кеш (например, после ручного удаления товаров)."""
+        if product_id is None:
+            self._known.clear()
+        else:
+            self._known.pop(product_id, None)
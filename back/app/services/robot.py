@@ -1,8 +1,9 @@
 # app/services/robot.py
 from __future__ import annotations
 
-from datetime import datetime, timezone
-from typing import Any, Dict, List
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Set
 
 import structlog
 from sqlalchemy.exc import SQLAlchemyError
@@ -11,162 +12,318 @@ from app.repo.robot import RobotRepository
 # ВАЖНО: путь импорта должен совпадать с реальным местом файла!
 # Если файл лежит в app/repositories/inventory_history.py, то импорт такой:
 # from app.repositories.inventory_history import InventoryHistoryRepository
-from app.repo.inventory import InventoryHistoryRepository
+from app.repo.inventory import SCAN_STATUSES, InventoryHistoryRepository, ScanRow
 from app.repo.product import ProductRepository
 from app.core.security import SecurityManager
+from app.core.metrics import (
+    INGEST_BATCH_FRAMES, INGEST_BATCH_SECONDS, INGEST_DUPLICATES, INGEST_ROWS, INGEST_ROWS_SUPPRESSED,
+)
 from app.schemas.robot import (
     RobotBase, RobotRegisterRequest, RobotRegisterResponse, Location,
     RobotsListResponse, RobotForListOut
 )
-from app.schemas.inventory import InventoryRecordCreate
+from app.services.cache import CacheService
+from app.services.product_cache import KnownProductsCache
+from app.services.scan_filter import ScanChangeFilter
 from app.ws.notifier import notify_robot_update, notify_inventory_alert
 
 logger = structlog.get_logger(__name__)
 
 
+def validate_scans(frame: RobotBase) -> None:
+    """
+    Те же ограничения на сканы, что проверял InventoryRecordCreate: quantity >= 0,
+    status — один из SCAN_STATUSES (без учёта регистра). Нарушение — ValueError.
+
+    Приём проверяет кадр ДО постановки в пачку: иначе один плохой кадр откатывает
+    общую транзакцию вместе с кадрами других роботов.
+    """
+    for item in frame.scan_results or []:
+        status_norm = item.status.upper() if item.status else None
+        if item.quantity < 0 or (status_norm is not None and status_norm not in SCAN_STATUSES):
+            raise ValueError(
+                f"Invalid scan {item.product_id!r}: quantity={item.quantity}, status={item.status!r}"
+            )
+
+
 class RobotService:
+    # момент (monotonic) следующей чистки ingest_keys — общий на процесс,
+    # сервис создаётся на каждый запрос
+    _next_keys_prune = 0.0
+
     def __init__(
         self,
         robot_repo: RobotRepository,
         product_repo: ProductRepository,
         history_repo: InventoryHistoryRepository,
+        product_cache: Optional[KnownProductsCache] = None,
+        cache_service: Optional[CacheService] = None,
+        idempotency_window: float = 3600.0,
+        keys_prune_interval: float = 60.0,
+        scan_filter: Optional[ScanChangeFilter] = None,
     ):
         self.robot_repo = robot_repo
         self.product_repo = product_repo
         self.history_repo = history_repo
+        self.product_cache = product_cache
+        self.cache_service = cache_service
+        self.idempotency_window = idempotency_window
+        self.keys_prune_interval = keys_prune_interval
+        self.scan_filter = scan_filter
 
     async def process_robot_data(self, robot: RobotBase) -> Dict[str, Any]:
         """
         Транзакционно:
           1) upsert робота
-          2) ensure products
+          2) ensure products (только для SKU, которых нет в KnownProductsCache)
           3) batch insert inventory_history
         Коммит/роллбек делает контекст session.begin().
         WS-ивенты отправляем после успешного коммита.
         """
-        scanned_at_ts: datetime = robot.last_update or datetime.now(timezone.utc)
-        zone = robot.location.zone
-        row_number = robot.location.row
-        shelf_number = robot.location.shelf
-        scan_results = robot.scan_results or []
+        [response] = await self.process_robot_batch([robot])
+        return response
+
+    async def process_robot_batch(self, frames: Sequence[RobotBase]) -> List[Dict[str, Any]]:
+        """
+        То же, что process_robot_data, но для пачки кадров телеметрии (в т.ч. от разных
+        роботов) в ОДНОЙ транзакции: один ensure_products_exist на объединение SKU,
+        один insert_rows на все сканы, по одному upsert на робота (последним кадром).
+        Используется стриминговым приёмом /ws/robots.
+
+        Кадры с idempotency_key, уже принятые раньше (или повторённые в этой же пачке),
+        ничего не пишут: ни истории, ни состояния робота — ответ с duplicate=True и
+        ingested_records=0. Ключ столбится в той же транзакции, что и запись истории.
+
+        В режиме store-on-change (scan_filter) скан без изменений на полке не пишется
+        в историю; ingested_records — число реально записанных строк.
+
+        Возвращает по ответу на каждый кадр, в порядке frames (формат как у process_robot_data).
+        """
+        if not frames:
+            return []
 
         logger.info(
             "robot.ingest_start",
-            robot_id=robot.robot_id,
-            zone=zone, row=row_number, shelf=shelf_number,
-            battery=robot.battery_level, scans=len(scan_results),
+            robots=len({f.robot_id for f in frames}),
+            frames=len(frames),
+            scans=sum(len(f.scan_results or []) for f in frames),
         )
 
-        inserted_records_count = 0
+        now = datetime.now(timezone.utc)
+        scanned_at = [f.last_update or now for f in frames]
+
+        products_map: Dict[str, str] = {}
+        for frame in frames:
+            for scan in frame.scan_results or []:
+                if scan.product_id:
+                    products_map[scan.product_id] = scan.product_name or scan.product_id
+
+        keys = [(f.robot_id, f.idempotency_key) for f in frames if f.idempotency_key]
+
+        # Спрашиваем кеш ДО открытия транзакции, чтобы не держать её на время похода в Redis
+        new_product_ids: Set[str] = set(products_map)
+        if products_map and self.product_cache is not None:
+            new_product_ids = await self.product_cache.filter_unknown(products_map)
+
+        # последние сканы полок — тоже до транзакции; None — пишем все сканы
+        snapshot = None
+        if self.scan_filter is not None:
+            snapshot = await self.scan_filter.snapshot(
+                (scan.product_id, frame.location.zone, frame.location.row, frame.location.shelf)
+                for frame in frames
+                for scan in frame.scan_results or []
+            )
+        suppressed = 0
 
         # ЕДИНАЯ сессия для всех репозиториев
         session = self.history_repo.session
         self.product_repo.session = session
         self.robot_repo.session = session
 
+        robots_db: Dict[str, Any] = {}
+        created: Dict[str, bool] = {}
+        ingested: List[int] = [0] * len(frames)
+        duplicate: List[bool] = [False] * len(frames)
+        latest: Dict[str, RobotBase] = {}
+
+        write_started = time.perf_counter()
         try:
             async with session.begin():
-                # 1) upsert робота
-                robot_db, created_flag = await self.robot_repo.upsert_robot(robot)
+                # 0) ключи идемпотентности: не застолбили — кадр уже принят, пропускаем
+                if keys:
+                    claimed = await self.robot_repo.claim_ingest_keys(keys)
+                    for i, frame in enumerate(frames):
+                        key = (frame.robot_id, frame.idempotency_key)
+                        if frame.idempotency_key:
+                            duplicate[i] = key not in claimed
+                            claimed.discard(key)  # повтор внутри пачки — тоже дубль
+
+                # последний кадр каждого робота определяет его состояние в robots
+                for i, frame in enumerate(frames):
+                    if not duplicate[i]:
+                        latest[frame.robot_id] = frame
+
+                # 1) upsert роботов
+                for robot_id, frame in latest.items():
+                    robots_db[robot_id], created[robot_id] = await self.robot_repo.upsert_robot(frame)
                 # важно: сделать запись робота видимой для FK
                 await session.flush()
 
-                # 2) ensure products
-                products_map: Dict[str, str] = {}
-                for scan in scan_results:
-                    if scan.product_id:
-                        products_map[scan.product_id] = scan.product_name or scan.product_id
-
-                if products_map:
-                    await self.product_repo.ensure_products_exist(products_map)
+                # 2) ensure products — только реально новые SKU
+                if new_product_ids:
+                    await self.product_repo.ensure_products_exist(
+                        {pid: products_map[pid] for pid in new_product_ids}
+                    )
                     await session.flush()
 
-                # 3) batch insert history
-                if scan_results:
-                    records_to_create: List[InventoryRecordCreate] = []
-                    for item in scan_results:
+                # 3) batch insert history: ScanRow-кортежи сразу в Core insert,
+                #    без промежуточных InventoryRecordCreate и ORM-объектов
+                rows: List[ScanRow] = []
+                for i, frame in enumerate(frames):
+                    if duplicate[i]:
+                        continue
+                    robot_id = robots_db[frame.robot_id].robot_id  # фактическое значение из БД
+                    loc = frame.location
+                    validate_scans(frame)
+                    for item in frame.scan_results or []:
                         status_norm = item.status.upper() if item.status else None
-                        records_to_create.append(
-                            InventoryRecordCreate(
-                                robot_id=robot_db.robot_id,  # используем фактическое значение из БД
-                                product_id=item.product_id,
-                                quantity=item.quantity,
-                                zone=zone,
-                                row_number=row_number,
-                                shelf_number=shelf_number,
-                                status=status_norm,
-                                scanned_at=scanned_at_ts,
-                            )
+                        row = ScanRow(
+                            robot_id, item.product_id, item.quantity,
+                            loc.zone, loc.row, loc.shelf, status_norm, scanned_at[i],
                         )
-                    await self.history_repo.create_many(records_to_create)
-                    inserted_records_count = len(records_to_create)
+                        # store-on-change: полка без изменений и heartbeat не вышел
+                        if snapshot is not None and not snapshot.keep(row):
+                            suppressed += 1
+                            continue
+                        rows.append(row)
+                        ingested[i] += 1
+                if rows:
+                    await self.history_repo.insert_rows(rows)
 
-            # === ВНЕ транзакции: WS-события ===
+        except SQLAlchemyError as e:
+            logger.exception("robot.ingest_failed", robots=sorted({f.robot_id for f in frames}), error=str(e))
+            raise RuntimeError("Failed to process robot data transactionally") from e
+        # НЕТ session.close(): управление жизненным циклом — у DI/Depends
+        INGEST_BATCH_SECONDS.observe(time.perf_counter() - write_started)
+        INGEST_BATCH_FRAMES.observe(len(frames))
+        INGEST_ROWS.inc(sum(ingested))
+        if suppressed:
+            INGEST_ROWS_SUPPRESSED.inc(suppressed)
+        if any(duplicate):
+            INGEST_DUPLICATES.inc(sum(duplicate))
+        if keys:
+            await self._maybe_prune_ingest_keys()
+
+        # коммит прошёл — теперь SKU точно есть в products, а сканы полок можно запомнить
+        if new_product_ids and self.product_cache is not None:
+            await self.product_cache.mark_known(new_product_ids)
+        if snapshot is not None:
+            await self.scan_filter.commit(snapshot)
+
+        # новая версия данных -> закешированные прогнозы/отчёты и ETag-и устарели;
+        # состояние роботов меняется на каждом кадре, история — только при сканах
+        if latest:
+            await self._bump_versions(history=any(ingested), robots=sorted(latest))
+
+        # === ВНЕ транзакции: WS-события ===
+        for robot_id, frame in latest.items():
+            robot_db = robots_db[robot_id]
             try:
                 await notify_robot_update({
                     "robot_id": robot_db.robot_id,
-                    "battery_level": robot.battery_level,
-                    "zone": zone,
-                    "row": row_number,
-                    "shelf": shelf_number,
+                    "battery_level": frame.battery_level,
+                    "zone": frame.location.zone,
+                    "row": frame.location.row,
+                    "shelf": frame.location.shelf,
                     "status": robot_db.status or "active",
-                    "last_update": (robot_db.last_update or scanned_at_ts).isoformat(),
-                    "next_checkpoint": robot.next_checkpoint,
+                    "last_update": (robot_db.last_update or now).isoformat(),
+                    "next_checkpoint": frame.next_checkpoint,
                 })
             except Exception as e:
-                logger.warning("ws.robot_update_failed", robot_id=robot.robot_id, error=str(e))
-
-            critical_ids = [
-                s.product_id for s in scan_results
-                if s.status and s.status.upper() in ("CRITICAL", "CRIT")
-            ]
-            low_ids = [
-                s.product_id for s in scan_results
-                if s.status and s.status.upper() in ("LOW_STOCK", "LOW")
-            ]
-            now = datetime.now(timezone.utc)
+                logger.warning("ws.robot_update_failed", robot_id=robot_id, error=str(e))
 
-            try:
-                if critical_ids:
-                    await notify_inventory_alert(
-                        zone=zone, product_ids=critical_ids, severity="CRITICAL", at=now
-                    )
-                if low_ids:
-                    await notify_inventory_alert(
-                        zone=zone, product_ids=low_ids, severity="LOW", at=now
-                    )
-            except Exception as e:
-                logger.warning(
-                    "ws.alert_failed",
-                    robot_id=robot.robot_id, critical_items=critical_ids, low_items=low_ids, error=str(e)
-                )
+        # алерты группируем по зоне, чтобы пачка давала по одному событию на (зону, severity)
+        critical_ids: Dict[str, List[str]] = {}
+        low_ids: Dict[str, List[str]] = {}
+        for i, frame in enumerate(frames):
+            if duplicate[i]:
+                continue
+            for s in frame.scan_results or []:
+                st = s.status.upper() if s.status else None
+                if st in ("CRITICAL", "CRIT"):
+                    critical_ids.setdefault(frame.location.zone, []).append(s.product_id)
+                elif st in ("LOW_STOCK", "LOW"):
+                    low_ids.setdefault(frame.location.zone, []).append(s.product_id)
+
+        try:
+            for zone, ids in critical_ids.items():
+                await notify_inventory_alert(zone=zone, product_ids=ids, severity="CRITICAL", at=now)
+            for zone, ids in low_ids.items():
+                await notify_inventory_alert(zone=zone, product_ids=ids, severity="LOW", at=now)
+        except Exception as e:
+            logger.warning(
+                "ws.alert_failed",
+                robots=sorted(latest), critical_items=critical_ids, low_items=low_ids, error=str(e)
+            )
 
-            response = {
+        responses: List[Dict[str, Any]] = []
+        for i, frame in enumerate(frames):
+            # дубль без свежего кадра того же робота в пачке — отвечаем данными самого кадра
+            robot_db = robots_db.get(frame.robot_id)
+            responses.append({
                 "robot": {
-                    "robot_id": robot_db.robot_id,
-                    "battery_level": robot.battery_level,
-                    "zone": zone,
-                    "row": row_number,
-                    "shelf": shelf_number,
-                    "status": robot_db.status,
-                    "last_update": (robot_db.last_update or scanned_at_ts).isoformat(),
+                    "robot_id": robot_db.robot_id if robot_db else frame.robot_id,
+                    "battery_level": frame.battery_level,
+                    "zone": frame.location.zone,
+                    "row": frame.location.row,
+                    "shelf": frame.location.shelf,
+                    "status": robot_db.status if robot_db else frame.status,
+                    "last_update": ((robot_db and robot_db.last_update) or scanned_at[i]).isoformat(),
                 },
-                "ingested_records": inserted_records_count,
-                "created_new_robot": created_flag,
-            }
+                "ingested_records": ingested[i],
+                "created_new_robot": created.get(frame.robot_id, False) and not duplicate[i],
+                "duplicate": duplicate[i],
+            })
 
-            logger.info(
-                "robot.ingest_done",
-                robot_id=robot_db.robot_id,
-                created_new_robot=created_flag,
-                ingested_records=inserted_records_count,
-            )
-            return response
+        logger.info(
+            "robot.ingest_done",
+            robots=len(latest),
+            frames=len(frames),
+            created_robots=sum(created.values()),
+            ingested_records=sum(ingested),
+            suppressed_records=suppressed,
+            duplicates=sum(duplicate),
+        )
+        return responses
 
+    async def _maybe_prune_ingest_keys(self) -> None:
+        """
+        Чистка ingest_keys старше окна идемпотентности — не чаще keys_prune_interval
+        на процесс, отдельной короткой транзакцией после основной записи.
+        """
+        started = time.monotonic()
+        if started < RobotService._next_keys_prune:
+            return
+        RobotService._next_keys_prune = started + self.keys_prune_interval
+        window = timedelta(seconds=self.idempotency_window)
+        session = self.history_repo.session
+        try:
+            async with session.begin():
+                pruned = await self.robot_repo.prune_ingest_keys(window)
+            if pruned:
+                logger.info("robot.ingest_keys_pruned", rows=pruned, window_seconds=self.idempotency_window)
         except SQLAlchemyError as e:
-            logger.exception("robot.ingest_failed", robot_id=robot.robot_id, error=str(e))
-            raise RuntimeError("Failed to process robot data transactionally") from e
-        # НЕТ session.close(): управление жизненным циклом — у DI/Depends
+            logger.warning("robot.ingest_keys_prune_failed", error=str(e))
+
+    async def _bump_versions(self, *, history: bool, robots: Sequence[str]) -> None:
+        if self.cache_service is None:
+            return
+        try:
+            await self.cache_service.bump_robots_version()
+            if history:
+                await self.cache_service.bump_data_version()
+        except Exception as e:
+            logger.warning("cache.data_version_bump_failed", robots=list(robots), error=str(e))
 
     async def register_robot(self, data: RobotRegisterRequest) -> RobotRegisterResponse:
         zone = data.zone or "A"
@@ -193,6 +350,7 @@ class RobotService:
             async with session.begin():
                 robot_db, created_flag = await self.robot_repo.upsert_robot(fake_robot_base)
                 await session.flush()
+            await self._bump_versions(history=False, robots=[robot_db.robot_id])
 
             robot_token = SecurityManager.create_access_token(
                 subject=robot_db.robot_id,
@@ -0,0 +1,128 @@
+# app/services/scan_filter.py
+from __future__ import annotations
+
+import time
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+import structlog
+
+from app.repo.inventory import ScanRow
+from app.services.cache import CacheService
+
+logger = structlog.get_logger(__name__)
+
+# (product_id, zone, row_number, shelf_number)
+Slot = Tuple[str, str, Optional[int], Optional[int]]
+
+
+class LastScan(NamedTuple):
+    quantity: int
+    status: Optional[str]
+    written_at: float   # unix-время последней строки в inventory_history
+    seen_at: float      # unix-время последнего скана (записанного или нет)
+
+
+def _field(slot: Slot) -> str:
+    product_id, zone, row, shelf = slot
+    return f"{product_id}|{zone}|{row}|{shelf}"
+
+
+def _encode(scan: LastScan) -> str:
+    return f"{scan.quantity}|{scan.status or ''}|{scan.written_at:.3f}|{scan.seen_at:.3f}"
+
+
+def _decode(raw: Optional[str]) -> Optional[LastScan]:
+    if not raw:
+        return None
+    try:
+        quantity, status, written_at, seen_at = raw.split("|")
+        return LastScan(int(quantity), status or None, float(written_at), float(seen_at))
+    except ValueError:
+        return None  # чужой/старый формат — считаем, что скана не было
+
+
+class ScanSnapshot:
+    """
+    Последние сканы полок одной пачки телеметрии. keep() решает по каждой ScanRow,
+    писать ли её в историю, и сразу учитывает её в снимке — повторы той же полки
+    внутри пачки сравниваются уже с ней.
+    """
+
+    def __init__(self, last: Dict[Slot, Optional[LastScan]], heartbeat_seconds: float, now: float):
+        self.last = last
+        self.heartbeat_seconds = heartbeat_seconds
+        self.now = now
+        # изменённые полки — их и сохраняем после commit
+        self.dirty: Dict[Slot, LastScan] = {}
+
+    def keep(self, row: ScanRow) -> bool:
+        slot = (row.product_id, row.zone, row.row_number, row.shelf_number)
+        last = self.last.get(slot)
+        write = (
+            last is None
+            or last.quantity != row.quantity
+            or last.status != row.status
+            or self.now - last.written_at >= self.heartbeat_seconds
+        )
+        scan = LastScan(row.quantity, row.status, self.now if write else last.written_at, self.now)
+        self.last[slot] = self.dirty[slot] = scan
+        return write
+
+
+class ScanChangeFilter:
+    """
+    Режим store-on-change приёма телеметрии (INGEST_STORE_ON_CHANGE).
+
+    Роботы на каждом обходе пересканируют одни и те же полки и почти всегда видят то же
+    количество. Строка в inventory_history пишется, только если для (product_id, zone,
+    row, shelf) изменились quantity/status или с последней записанной строки прошло
+    INGEST_HEARTBEAT_SECONDS; остальные сканы лишь обновляют seen_at полки в кеше.
+
+    Последние сканы — общий хеш в Redis (через CacheService), чтобы все воркеры
+    сравнивали с одним и тем же. Без Redis (или при его ошибке) фильтр пропускает
+    всё — запись идёт как без режима, изменения не теряются.
+    """
+
+    def __init__(
+        self,
+        cache_service: Optional[CacheService] = None,
+        enabled: bool = False,
+        heartbeat_seconds: float = 900.0,
+    ):
+        self.cache_service = cache_service
+        self.enabled = enabled
+        self.heartbeat_seconds = heartbeat_seconds
+
+    async def snapshot(self, slots: Iterable[Slot]) -> Optional[ScanSnapshot]:
+        """
+        Снимок последних сканов для slots одним походом в Redis.
+        None — фильтр выключен или сравнивать не с чем: писать все строки.
+        """
+        if not self.enabled or self.cache_service is None:
+            return None
+        ordered = list(dict.fromkeys(slots))
+        try:
+            raw = await self.cache_service.get_shelf_scans([_field(s) for s in ordered])
+        except Exception as e:
+            logger.warning("scan_filter.redis_lookup_failed", error=str(e))
+            return None
+        if raw is None:
+            return None
+        last = {slot: _decode(value) for slot, value in zip(ordered, raw)}
+        return ScanSnapshot(last, self.heartbeat_seconds, time.time())
+
+    async def commit(self, snapshot: Optional[ScanSnapshot]) -> None:
+        """
+        Сохраняет сканы пачки. Вызывать только ПОСЛЕ успешного commit, иначе откат
+        оставит в кеше количество, которого нет в истории, и изменение потеряется.
+        """
+        if snapshot is None or not snapshot.dirty or self.cache_service is None:
+            return
+        try:
+            await self.cache_service.set_shelf_scans(
+                {_field(slot): _encode(scan) for slot, scan in snapshot.dirty.items()},
+                # запас на пропуски обхода; выветрившаяся полка просто запишется ещё раз
+                ttl_seconds=int(self.heartbeat_seconds * 4),
+            )
+        except Exception as e:
+            logger.warning("scan_filter.redis_store_failed", error=str(e))
@@ -0,0 +1,166 @@
+# app/workers/history_archiver.py
+"""
+Перенос старой истории сканов из Postgres в Parquet-архив (app/services/history_archive.py).
+
+Запускается по расписанию (cron / k8s CronJob), не внутри API-воркеров:
+
+    cd back
+    python -m app.workers.history_archiver              # горизонт из HISTORY_HOT_DAYS
+    python -m app.workers.history_archiver --hot-days 7
+
+Один прогон переносит все полные дни старше горизонта, от самого старого.
+Каждый день — отдельная транзакция REPEATABLE READ: серверный курсор по строкам
+дня -> временные parquet-файлы по зонам -> DELETE тех же строк -> публикация файлов
+(rename) -> COMMIT -> сдвиг watermark. Снимок транзакции гарантирует, что удаляются
+ровно те строки, что попали в файлы; скан, вставленный параллельно, останется в
+Postgres до следующего прогона. Файлы публикуются последним шагом перед COMMIT, а если
+COMMIT не прошёл — удаляются: строки дня не оказываются одновременно в архиве и в БД.
+Одновременно работает только один архиватор (pg_try_advisory_xact_lock).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, Optional
+
+import structlog
+from sqlalchemy import text
+
+from app.core.settings import settings
+from app.repo.inventory import InventoryHistoryRepository
+from app.services.history_archive import HistoryArchive
+
+logger = structlog.get_logger(__name__)
+
+# ключ advisory-lock архиватора (произвольная константа)
+ARCHIVER_LOCK_KEY = 4_120_041
+
+
+class HistoryArchiver:
+    def __init__(
+        self,
+        repo_factory: Callable[[], InventoryHistoryRepository],
+        archive: HistoryArchive,
+        hot_days: int = 30,
+        batch_size: int = 50_000,
+    ):
+        self.repo_factory = repo_factory
+        self.archive = archive
+        self.hot_days = hot_days
+        self.batch_size = batch_size
+
+    def cutoff(self, now: Optional[datetime] = None) -> datetime:
+        """Граница горячей части — полночь (UTC) hot_days дней назад."""
+        now = now or datetime.utcnow()
+        return datetime.combine(now.date() - timedelta(days=self.hot_days), time.min)
+
+    async def run_once(self, now: Optional[datetime] = None) -> Dict[str, object]:
+        cutoff = self.cutoff(now)
+        days = 0
+        rows = 0
+        while True:
+            repo = self.repo_factory()
+            try:
+                oldest = await repo.oldest_scanned_before(cutoff)
+            finally:
+                await repo.session.close()
+            if oldest is None:
+                break
+
+            moved = await self._archive_day(oldest.date())
+            if moved is None:
+                logger.info("history_archive.locked")
+                break
+            days += 1
+            rows += moved
+
+        watermark = self.archive.watermark()
+        if watermark is None or watermark < cutoff:
+            self.archive.set_watermark(cutoff)
+        logger.info("history_archive.done", cutoff=cutoff.isoformat(), days=days, rows=rows)
+        return {"cutoff": cutoff.isoformat(), "days": days, "rows": rows}
+
+    async def _archive_day(self, day: date) -> Optional[int]:
+        """Переносит один день; None — другой архиватор держит блокировку."""
+        start = datetime.combine(day, time.min)
+        end = start + timedelta(days=1) - timedelta(microseconds=1)
+
+        repo = self.repo_factory()
+        session = repo.session
+        writer = None
+        files = []
+        try:
+            if session.bind.dialect.name == "postgresql":
+                await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+                locked = await session.execute(
+                    text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": ARCHIVER_LOCK_KEY}
+                )
+                if not locked.scalar():
+                    await session.rollback()
+                    return None
+
+            writer = self.archive.day_writer(day)
+            async for batch in repo.stream_rows(dt_from=start, dt_to=end, batch_size=self.batch_size):
+                await asyncio.to_thread(writer.write, batch)
+
+            # сначала DELETE (ошибка сериализации — здесь, до публикации файлов),
+            # переименование — непосредственно перед COMMIT
+            deleted = await repo.delete_scanned_range(dt_from=start, dt_to=end)
+            files = await asyncio.to_thread(writer.commit)
+            await session.commit()
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            # COMMIT не прошёл, строки остались в Postgres — архивная копия дня не нужна
+            for path in files:
+                path.unlink(missing_ok=True)
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
+        if deleted != writer.rows:
+            # в снимке REPEATABLE READ так быть не должно; строки всё равно в архиве
+            logger.warning("history_archive.count_mismatch", day=day.isoformat(), written=writer.rows, deleted=deleted)
+
+        watermark = self.archive.watermark()
+        next_day = start + timedelta(days=1)
+        if watermark is None or watermark < next_day:
+            self.archive.set_watermark(next_day)
+        logger.info("history_archive.day", day=day.isoformat(), rows=writer.rows, files=len(files))
+        return writer.rows
+
+
+async def _main(hot_days: int, batch_size: int) -> Dict[str, object]:
+    from app.core.container import Container
+    from app.services.history_archive import create_history_archive
+
+    archive = create_history_archive()
+    if archive is None:
+        raise SystemExit("HISTORY_ARCHIVE_DIR is not set")
+
+    container = Container()
+    archiver = HistoryArchiver(
+        repo_factory=container.inventory_repository,
+        archive=archive,
+        hot_days=hot_days,
+        batch_size=batch_size,
+    )
+    try:
+        return await archiver.run_once()
+    finally:
+        await container.engine().dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move old inventory history to the Parquet archive")
+    parser.add_argument("--hot-days", type=int, default=settings.HISTORY_HOT_DAYS)
+    parser.add_argument("--batch-size", type=int, default=settings.HISTORY_ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(_main(args.hot_days, args.batch_size))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+# app/workers/prediction_jobs.py
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Set
+
+import structlog
+
+from app.schemas.ai import AIPredictionJob, AIPredictionRequest, AIPredictionResponse
+from app.services.ai import AIService
+from app.services.cache import CacheService
+from app.ws.notifier import notify_prediction_ready
+
+logger = structlog.get_logger(__name__)
+
+
+class PredictionJobManager:
+    """
+    Фоновые задачи прогноза для /api/ai/predict/jobs.
+
+    - submit() сразу возвращает job_id, прогноз считается в asyncio-задаче
+      (не больше max_concurrency одновременно на воркер)
+    - состояние задачи лежит в Redis (через CacheService), чтобы опрашивать
+      можно было любой воркер; без Redis — в памяти процесса
+    - готовый результат кешируется по (period_days, categories, data_version):
+      одинаковый запрос в окне свежести отдаётся сразу, без LLM
+    - одинаковые запросы, пришедшие пока задача ещё считается, получают тот же job_id
+    - по завершении задачи по WS рассылается событие ai_prediction_ready
+    """
+
+    def __init__(
+        self,
+        ai_service_factory: Callable[[], AIService],
+        cache_service: Optional[CacheService] = None,
+        result_ttl_seconds: int = 300,
+        job_ttl_seconds: int = 3600,
+        max_concurrency: int = 2,
+    ):
+        self.ai_service_factory = ai_service_factory
+        self.cache_service = cache_service
+        self.result_ttl_seconds = result_ttl_seconds
+        self.job_ttl_seconds = job_ttl_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        self._tasks: Set[asyncio.Task] = set()
+        # cache_key -> job_id задачи, которая прямо сейчас считает этот запрос
+        self._inflight: Dict[str, str] = {}
+        # фолбэк-хранилище задач, если Redis недоступен
+        self._local_jobs: Dict[str, AIPredictionJob] = {}
+
+    # ---------------------------
+    # КЛЮЧ КЕША
+    # ---------------------------
+
+    async def cache_key(self, req: AIPredictionRequest) -> Optional[str]:
+        """
+        Ключ результата. None — если версия данных неизвестна (Redis недоступен):
+        тогда результат не кешируем, потому что его нечем инвалидировать.
+        """
+        if self.cache_service is None:
+            return None
+        try:
+            version = await self.cache_service.get_data_version()
+        except Exception as e:
+            logger.warning("ai_jobs.data_version_failed", error=str(e))
+            return None
+        if version is None:
+            return None
+
+        raw = json.dumps(
+            {
+                "period_days": req.period_days,
+                "categories": sorted({c.lower() for c in req.categories or []}),
+                "data_version": version,
+            },
+            separators=(",", ":"),
+        )
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    async def get_cached_result(self, cache_key: Optional[str]) -> Optional[AIPredictionResponse]:
+        if cache_key is None or self.cache_service is None:
+            return None
+        try:
+            raw = await self.cache_service.get_ai_result(cache_key)
+        except Exception as e:
+            logger.warning("ai_jobs.result_lookup_failed", error=str(e))
+            return None
+        return AIPredictionResponse.model_validate(raw) if raw else None
+
+    async def store_result(self, cache_key: Optional[str], result: AIPredictionResponse) -> None:
+        if cache_key is None or self.cache_service is None:
+            return
+        try:
+            await self.cache_service.set_ai_result(
+                cache_key, result.model_dump(mode="json"), ttl_seconds=self.result_ttl_seconds
+            )
+        except Exception as e:
+            logger.warning("ai_jobs.result_store_failed", error=str(e))
+
+    # ---------------------------
+    # ЗАДАЧИ
+    # ---------------------------
+
+    async def submit(self, req: AIPredictionRequest) -> AIPredictionJob:
+        key = await self.cache_key(req)
+
+        cached = await self.get_cached_result(key)
+        if cached is not None:
+            now = datetime.now(timezone.utc)
+            job = AIPredictionJob(
+                job_id=uuid.uuid4().hex,
+                status="done",
+                created_at=now,
+                finished_at=now,
+                cached=True,
+                result=cached,
+            )
+            await self._save_job(job)
+            logger.info("ai_jobs.cache_hit", job_id=job.job_id)
+            return job
+
+        if key is not None and key in self._inflight:
+            existing = await self.get_job(self._inflight[key])
+            if existing is not None:
+                return existing
+
+        job = AIPredictionJob(
+            job_id=uuid.uuid4().hex,
+            status="pending",
+            created_at=datetime.now(timezone.utc),
+        )
+        await self._save_job(job)
+        if key is not None:
+            self._inflight[key] = job.job_id
+
+        task = asyncio.create_task(self._run(job, req, key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+        logger.info("ai_jobs.submitted", job_id=job.job_id, period_days=req.period_days)
+        return job
+
+    async def get_job(self, job_id: str) -> Optional[AIPredictionJob]:
+        if self.cache_service is not None:
+            try:
+                raw = await self.cache_service.get_ai_job(job_id)
+            except Exception as e:
+                logger.warning("ai_jobs.job_lookup_failed", job_id=job_id, error=str(e))
+                raw = None
+            if raw:
+                return AIPredictionJob.model_validate(raw)
+        return self._local_jobs.get(job_id)
+
+    async def _save_job(self, job: AIPredictionJob) -> None:
+        self._local_jobs[job.job_id] = job
+        self._prune_local_jobs()
+        if self.cache_service is None:
+            return
+        try:
+            await self.cache_service.set_ai_job(
+                job.job_id, job.model_dump(mode="json"), ttl_seconds=self.job_ttl_seconds
+            )
+        except Exception as e:
+            logger.warning("ai_jobs.job_store_failed", job_id=job.job_id, error=str(e))
+
+    def _prune_local_jobs(self) -> None:
+        now = datetime.now(timezone.utc)
+        stale = [
+            jid for jid, j in self._local_jobs.items()
+            if j.finished_at is not None
+            and (now - j.finished_at).total_seconds() > self.job_ttl_seconds
+        ]
+        for jid in stale:
+            self._local_jobs.pop(jid, None)
+
+    async def _run(self, job: AIPredictionJob, req: AIPredictionRequest, key: Optional[str]) -> None:
+        try:
+            async with self._semaphore:
+                job = job.model_copy(update={"status": "running"})
+                await self._save_job(job)
+
+                result = await self._predict(req)
+
+            await self.store_result(key, result)
+            job = job.model_copy(update={
+                "status": "done",
+                "result": result,
+                "finished_at": datetime.now(timezone.utc),
+            })
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("ai_jobs.failed", job_id=job.job_id, error=str(e))
+            job = job.model_copy(update={
+                "status": "failed",
+                "error": str(e),
+                "finished_at": datetime.now(timezone.utc),
+            })
+        finally:
+            if key is not None:
+                self._inflight.pop(key, None)
+
+        await self._save_job(job)
+        logger.info("ai_jobs.finished", job_id=job.job_id, status=job.status)
+
+        try:
+            await notify_prediction_ready(job.job_id, job.status)
+        except Exception as e:
+            logger.warning("ws.prediction_ready_failed", job_id=job.job_id, error=str(e))
+
+    async def _predict(self, req: AIPredictionRequest) -> AIPredictionResponse:
+        """
+        Свой AIService (и свои сессии) на задачу: сессия HTTP-запроса
+        к этому моменту уже закрыта. Прогнозы AiPrediction коммитим здесь.
+        """
+        svc = self.ai_service_factory()
+        session = svc.inventory_repo.session
+        try:
+            result = await svc.predict(req)
+            await session.commit()
+            return result
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+            await svc.product_repo.session.close()
+
+    async def shutdown(self) -> None:
+        """Отменяет незавершённые задачи (вызывается из lifespan)."""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,170 @@
+# app/workers/robot_ingest.py
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import structlog
+
+from app.core.metrics import INGEST_FAILURES, INGEST_FRAMES, INGEST_LATENCY
+from app.schemas.robot import RobotBase
+from app.services.robot import RobotService
+
+logger = structlog.get_logger(__name__)
+
+
+class RobotIngestBatcher:
+    """
+    Серверный батчинг телеметрии для стримингового приёма /ws/robots.
+
+    - кадры со всех WS-соединений воркера складываются в одну очередь
+    - фоновая задача забирает их пачками (до max_batch кадров или max_delay секунд
+      ожидания после первого кадра) и пишет пачку одной транзакцией через
+      RobotService.process_robot_batch
+    - submit() возвращает future, который резолвится ответом по конкретному кадру
+      (или исключением, если пачка не записалась) — по нему соединение шлёт ack
+    """
+
+    def __init__(
+        self,
+        robot_service_factory: Callable[[], RobotService],
+        max_batch: int = 200,
+        max_delay: float = 0.02,
+        max_queue: int = 10_000,
+        max_concurrent_flushes: int = 4,
+    ):
+        self.robot_service_factory = robot_service_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        # сколько пачек пишется параллельно (каждая держит соединение из пула БД)
+        self._flush_semaphore = asyncio.Semaphore(max_concurrent_flushes)
+        self._queue: asyncio.Queue[Tuple[RobotBase, asyncio.Future]] = asyncio.Queue(maxsize=max_queue)
+        self._worker: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    # ---------------------------
+    # ПРИЁМ КАДРОВ
+    # ---------------------------
+
+    async def submit(self, frame: RobotBase) -> asyncio.Future:
+        """
+        Ставит кадр в очередь и возвращает future с результатом его записи.
+        Если очередь заполнена — ждёт (естественный backpressure для соединения).
+        """
+        self._ensure_worker()
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        INGEST_FRAMES.labels("ws").inc()
+        fut.add_done_callback(_observe_latency(time.perf_counter()))
+        await self._queue.put((frame, fut))
+        return fut
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    # ---------------------------
+    # ФОНОВАЯ ЗАПИСЬ
+    # ---------------------------
+
+    async def _collect(self) -> List[Tuple[RobotBase, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            await self._flush_semaphore.acquire()
+            # пока пачка пишется, следующая уже собирается
+            task = asyncio.create_task(self._flush(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, batch: List[Tuple[RobotBase, asyncio.Future]]) -> None:
+        frames = [frame for frame, _ in batch]
+        service: Optional[RobotService] = None
+        try:
+            # фабрика тоже может упасть (сессия/пул) — семафор и future всё равно освобождаем
+            service = self.robot_service_factory()
+            results = await service.process_robot_batch(frames)
+        except Exception as e:
+            logger.exception("robot_ws.batch_failed", frames=len(frames), error=str(e))
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            if service is not None:
+                await self._close_session(service)
+            self._flush_semaphore.release()
+
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+    @staticmethod
+    async def _close_session(service: RobotService) -> None:
+        # сессия создана фабрикой контейнера вне Depends — закрываем сами
+        try:
+            await service.history_repo.session.close()
+        except Exception as e:
+            logger.warning("robot_ws.session_close_failed", error=str(e))
+
+    async def shutdown(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        # кадры, которые так и не попали в пачку
+        while not self._queue.empty():
+            _, fut = self._queue.get_nowait()
+            if not fut.done():
+                fut.set_exception(RuntimeError("Robot ingest is shutting down"))
+
+
+def _observe_latency(started: float) -> Callable[[asyncio.Future], None]:
+    def done(fut: asyncio.Future) -> None:
+        if fut.cancelled() or fut.exception() is not None:
+            INGEST_FAILURES.labels("ws").inc()
+        else:
+            INGEST_LATENCY.labels("ws").observe(time.perf_counter() - started)
+    return done
+
+
+def ack_message(seq: Any, result: Dict[str, Any]) -> Dict[str, Any]:
+    message = {
+        "type": "ack",
+        "seq": seq,
+        "ingested_records": result.get("ingested_records", 0),
+        "created_new_robot": result.get("created_new_robot", False),
+    }
+    if result.get("duplicate"):
+        message["duplicate"] = True
+    return message
+
+
+def error_message(seq: Any, detail: str, retry_after: Optional[int] = None) -> Dict[str, Any]:
+    message = {"type": "error", "seq": seq, "detail": detail}
+    if retry_after is not None:
+        message["retry_after"] = retry_after
+    return message
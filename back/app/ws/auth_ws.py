@@ -46,3 +46,41 @@ async def authenticate_websocket(websocket: WebSocket) -> str:
 
     logger.info("ws_auth_ok", user_id=user_id)
     return user_id
+
+
+async def authenticate_robot_websocket(websocket: WebSocket) -> str:
+    """
+    То же для роботов (/ws/robots): токен type="robot" из Authorization: Bearer <token>.
+    Проверяется один раз на соединение. Возвращаем robot_id (payload["sub"]).
+    """
+
+    auth_header = websocket.headers.get("Authorization")
+    if not auth_header:
+        raise WebSocketException(
+            code=status.WS_1008_POLICY_VIOLATION,
+            reason="Authorization header missing (robot)"
+        )
+
+    parts = auth_header.split()
+    if len(parts) != 2 or parts[0].lower() != "bearer":
+        raise WebSocketException(
+            code=status.WS_1008_POLICY_VIOLATION,
+            reason="Invalid Authorization header format (robot)"
+        )
+
+    payload = SecurityManager.verify_token(parts[1], allowed_types={"robot"})
+    if payload is None:
+        raise WebSocketException(
+            code=status.WS_1008_POLICY_VIOLATION,
+            reason="Invalid or expired robot token"
+        )
+
+    robot_id = payload.get("sub")
+    if not robot_id:
+        raise WebSocketException(
+            code=status.WS_1008_POLICY_VIOLATION,
+            reason="Malformed robot token: no 'sub'"
+        )
+
+    logger.info("ws_robot_auth_ok", robot_id=robot_id)
+    return robot_id
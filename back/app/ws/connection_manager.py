@@ -3,12 +3,20 @@ from typing import Dict, Set, Any
 from fastapi import WebSocket
 import structlog
 
+from app.core.metrics import WS_MESSAGES_SENT
+from app.core.serialization import encode_ws
+
 logger = structlog.get_logger(__name__)
 
 class ConnectionManager:
     def __init__(self):
         # user_id -> множество активных сокетов
         self.active_connections: Dict[str, Set[WebSocket]] = {}
+        # сообщения, отправка которых началась, но ещё не завершилась (медленные клиенты)
+        self.pending_sends = 0
+        # стриминговый приём /ws/robots: соединения и кадры без ack (для /metrics)
+        self.robot_connections = 0
+        self.robot_pending_acks = 0
 
     async def connect(self, user_id: str, websocket: WebSocket):
         # Регистрируем нового клиента
@@ -34,21 +42,46 @@ class ConnectionManager:
         conns = self.active_connections.get(user_id)
         if not conns:
             return
+        text = encode_ws(message)
         for ws in list(conns):
             try:
-                await ws.send_json(message)
+                await self._send(ws, text)
             except Exception as e:
                 logger.warning("ws_send_failed", user_id=user_id, error=str(e))
 
     async def broadcast(self, message: Any):
-        # Разослать всем онлайн
+        # Разослать всем онлайн; сообщение кодируется один раз на всю рассылку
+        if not self.active_connections:
+            return
+        text = encode_ws(message)
         for user_id, conns in self.active_connections.items():
             for ws in list(conns):
                 try:
-                    await ws.send_json(message)
+                    await self._send(ws, text)
                 except Exception as e:
                     logger.warning("ws_broadcast_failed", user_id=user_id, error=str(e))
 
+    async def _send(self, ws: WebSocket, text: str):
+        self.pending_sends += 1
+        try:
+            await ws.send_text(text)
+        except Exception:
+            WS_MESSAGES_SENT.labels("error").inc()
+            raise
+        else:
+            WS_MESSAGES_SENT.labels("ok").inc()
+        finally:
+            self.pending_sends -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "users": len(self.active_connections),
+            "connections": sum(len(c) for c in self.active_connections.values()),
+            "pending_sends": self.pending_sends,
+            "robot_connections": self.robot_connections,
+            "robot_pending_acks": self.robot_pending_acks,
+        }
+
 
 # создаем один глобальный инстанс менеджера
 connection_manager = ConnectionManager()
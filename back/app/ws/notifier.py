@@ -100,3 +100,35 @@ async def notify_inventory_alert(
             await connection_manager.send_to_user(uid, msg)
     else:
         await connection_manager.broadcast(msg)
+
+
+def build_prediction_ready(job_id: str, status: str) -> Dict[str, Any]:
+    """
+    Событие о завершении фоновой задачи прогноза.
+    Сам результат не шлём — фронт забирает его через GET /api/ai/predict/jobs/{job_id}.
+    """
+    return {
+        "type": "ai_prediction_ready",
+        "payload": {
+            "job_id": job_id,
+            "status": status,
+        },
+    }
+
+
+async def notify_prediction_ready(
+    job_id: str,
+    status: str,
+    user_ids: Optional[Iterable[str]] = None,
+) -> None:
+    """
+    Шлёт событие 'ai_prediction_ready' (задача прогноза done/failed).
+    """
+
+    msg = build_prediction_ready(job_id, status)
+
+    if user_ids:
+        for uid in user_ids:
+            await connection_manager.send_to_user(uid, msg)
+    else:
+        await connection_manager.broadcast(msg)
@@ -0,0 +1 @@
+# Нагрузочные замеры и локальные заглушки внешних сервисов (не входят в приложение)
@@ -0,0 +1,120 @@
+# benchmarks/bench_ai_latency.py
+"""
+p50/p99 латентности AIService._call_llm против локальной заглушки OpenRouter.
+
+Сравнивает:
+  per-call — новый httpx.AsyncClient на каждый прогноз (TCP-setup каждый раз)
+  pooled   — общий клиент из create_openrouter_client() (keep-alive пул)
+  hedged   — pooled + OPENROUTER_HEDGE_AFTER_SECONDS при "тормозящей" первичной модели
+
+Пример:
+    cd back
+    python -m benchmarks.bench_ai_latency --requests 200 --concurrency 10
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import Dict, List
+
+PORT = int(os.getenv("STUB_PORT", "8089"))
+os.environ.setdefault("OPENROUTER_API_KEY", "stub-key")
+os.environ.setdefault("OPENROUTER_BASE_URL", f"http://127.0.0.1:{PORT}/api/v1")
+
+import uvicorn  # noqa: E402
+
+from app.services import ai as ai_module  # noqa: E402
+from app.services.ai import AIService, create_openrouter_client  # noqa: E402
+from benchmarks.openrouter_stub import make_stub_app  # noqa: E402
+
+
+MESSAGES = [
+    {"role": "system", "content": ai_module.SYSTEM_PROMPT},
+    {"role": "user", "content": ai_module._build_user_prompt(7, {"products": [
+        {"product_id": f"SKU-{i}", "category": None, "optimal_stock": 100,
+         "current_qty": 40, "history": []}
+        for i in range(20)
+    ]})},
+]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+async def _run_mode(svc: AIService, requests: int, concurrency: int) -> Dict[str, float]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one() -> None:
+        async with sem:
+            t0 = time.perf_counter()
+            await svc._call_llm(MESSAGES)
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies), 2),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка заглушки, сек")
+    parser.add_argument("--slow-primary", type=float, default=0.5,
+                        help="задержка первичной модели в hedged-сценарии, сек")
+    parser.add_argument("--hedge-after", type=float, default=0.1)
+    args = parser.parse_args()
+
+    primary = ai_module.OPENROUTER_MODELS[0]
+    stub = make_stub_app(default_latency=args.latency)
+    server = uvicorn.Server(uvicorn.Config(stub, port=PORT, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    results: Dict[str, Dict[str, float]] = {}
+    client = create_openrouter_client()
+    try:
+        ai_module.OPENROUTER_HEDGE_AFTER_SECONDS = None
+        results["per-call"] = await _run_mode(
+            AIService(None, None, http_client=None), args.requests, args.concurrency
+        )
+        results["pooled"] = await _run_mode(
+            AIService(None, None, http_client=client), args.requests, args.concurrency
+        )
+
+        # первичная модель "тормозит": без hedge ждём её, с hedge — отвечает резервная
+        stub.state.latency_by_model[primary] = args.slow_primary
+        results["pooled, slow primary"] = await _run_mode(
+            AIService(None, None, http_client=client), args.requests, args.concurrency
+        )
+        ai_module.OPENROUTER_HEDGE_AFTER_SECONDS = args.hedge_after
+        results["hedged, slow primary"] = await _run_mode(
+            AIService(None, None, http_client=client), args.requests, args.concurrency
+        )
+    finally:
+        await client.aclose()
+        server.should_exit = True
+        await server_task
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
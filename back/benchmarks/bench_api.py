@@ -0,0 +1,538 @@
+# benchmarks/bench_api.py
+"""
+End-to-end бенчмарк критичных API-путей.
+
+Поднимает приложение (main:app) в отдельном потоке через uvicorn — со своим event loop,
+чтобы генератор нагрузки не делил цикл с сервером, — засевает Postgres/Redis
+тестовыми данными заданного объёма и гоняет сценарии:
+
+  ingest     POST /api/robots/data
+  history    GET  /api/inventory/history (случайные фильтры/страницы)
+  dashboard  GET  /api/dashboard/current
+  export     GET  /api/export/excel?ids=...
+  import     POST /api/inventory/import (CSV)
+  ws         WS   /ws/notifications: N подписчиков, доставка robot_update после ingest
+
+По каждому сценарию: rps, p50/p95/p99/mean/max латентности, ошибки и число SQL-запросов
+на один запрос (считается через события SQLAlchemy на движке приложения).
+Результат — JSON (stdout и --output), сравнение с прошлым прогоном — --compare.
+
+Засеянные данные помечены префиксом BENCH- и удаляются --reset.
+Нужны те же переменные окружения, что и приложению (ASYNC_DATABASE_URL, REDIS_URL, SECRET_KEY...).
+
+Пример:
+    cd back
+    python -m benchmarks.bench_api --history-rows 200000 --requests 500 --concurrency 20 \\
+        --output bench.json
+    python -m benchmarks.bench_api --scenarios history,dashboard --compare bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import uvicorn
+import websockets
+from sqlalchemy import event, text
+
+from app.core.security import SecurityManager
+from app.db.migrations import upgrade_to_head
+from app.db.session import engine as admin_engine
+
+PREFIX = "BENCH-"
+SCENARIOS = ("ingest", "history", "dashboard", "export", "import", "ws")
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def _latency_stats(latencies_ms: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": round(_percentile(latencies_ms, 50), 2),
+        "p95_ms": round(_percentile(latencies_ms, 95), 2),
+        "p99_ms": round(_percentile(latencies_ms, 99), 2),
+        "mean_ms": round(statistics.fmean(latencies_ms), 2) if latencies_ms else 0.0,
+        "max_ms": round(max(latencies_ms), 2) if latencies_ms else 0.0,
+    }
+
+
+def _robot_id(i: int) -> str:
+    return f"{PREFIX}RB-{i:04d}"
+
+
+def _product_id(i: int) -> str:
+    return f"{PREFIX}SKU-{i:05d}"
+
+
+# ============ Счётчик SQL ============
+
+class QueryCounter:
+    """Считает выполненные SQL-запросы на движке (before_cursor_execute)."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def attach(self, sync_engine) -> None:
+        event.listen(sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs) -> None:
+        with self._lock:
+            self.count += 1
+
+
+# ============ Сервер в отдельном потоке ============
+
+class ServerThread:
+    def __init__(self, port: int):
+        from main import app  # импорт здесь: settings читаются из окружения при импорте
+
+        self.app = app
+        self.server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name="bench-server", daemon=True)
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.server.serve())
+
+    def call(self, coro):
+        """Выполнить корутину в цикле сервера (клиенты БД/Redis привязаны к нему)."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def start(self) -> None:
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("Server failed to start")
+            time.sleep(0.05)
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
+
+
+# ============ Засев данных ============
+
+async def reset_data() -> None:
+    async with admin_engine.begin() as conn:
+        await conn.execute(text("DELETE FROM inventory_history WHERE robot_id LIKE :p OR product_id LIKE :p"),
+                           {"p": f"{PREFIX}%"})
+        await conn.execute(text("DELETE FROM ai_predictions WHERE product_id LIKE :p"), {"p": f"{PREFIX}%"})
+        await conn.execute(text("DELETE FROM products WHERE id LIKE :p"), {"p": f"{PREFIX}%"})
+        await conn.execute(text("DELETE FROM robots WHERE robot_id LIKE :p"), {"p": f"{PREFIX}%"})
+
+
+async def seed_data(args: argparse.Namespace) -> Dict[str, Any]:
+    """Роботы, товары и история сканов (generate_series на стороне Postgres)."""
+    t0 = time.perf_counter()
+    zones = [chr(ord("A") + i) for i in range(args.zones)]
+    async with admin_engine.begin() as conn:
+        await conn.execute(
+            text(
+                "INSERT INTO robots (robot_id, status, battery_level, last_update, zone, row, shelf) "
+                "VALUES (:robot_id, 'online', 100, now(), :zone, 1, 1) ON CONFLICT (robot_id) DO NOTHING"
+            ),
+            [{"robot_id": _robot_id(i), "zone": zones[i % len(zones)]} for i in range(1, args.robots + 1)],
+        )
+        await conn.execute(
+            text(
+                "INSERT INTO products (id, name, category, min_stock, optimal_stock) "
+                "VALUES (:id, :name, :category, 10, 100) ON CONFLICT (id) DO NOTHING"
+            ),
+            [
+                {"id": _product_id(i), "name": f"Bench product {i}", "category": f"cat-{i % 10}"}
+                for i in range(1, args.products + 1)
+            ],
+        )
+        existing = (await conn.execute(
+            text("SELECT count(*) FROM inventory_history WHERE robot_id LIKE :p"), {"p": f"{PREFIX}%"}
+        )).scalar_one()
+        missing = max(0, args.history_rows - existing)
+        if missing:
+            await conn.execute(
+                text(
+                    """
+                    INSERT INTO inventory_history
+                        (robot_id, product_id, quantity, zone, row_number, shelf_number, status, scanned_at)
+                    SELECT
+                        :rb || lpad((1 + g % :robots)::text, 4, '0'),
+                        :sku || lpad((1 + (g * 7919) % :products)::text, 5, '0'),
+                        q,
+                        chr((65 + g % :zones)::int),
+                        1 + g % 20,
+                        1 + g % 10,
+                        CASE WHEN q > 20 THEN 'OK' WHEN q > 10 THEN 'LOW_STOCK' ELSE 'CRITICAL' END,
+                        (now() at time zone 'utc') - random() * (:days * interval '1 day')
+                    FROM (SELECT g, (random() * 100)::int AS q FROM generate_series(1, :rows) AS g) AS s
+                    """
+                ),
+                {
+                    "rb": f"{PREFIX}RB-", "sku": f"{PREFIX}SKU-", "robots": args.robots,
+                    "products": args.products, "zones": len(zones), "days": args.days, "rows": missing,
+                },
+            )
+        await conn.execute(text("ANALYZE inventory_history"))
+        ids = (await conn.execute(
+            text("SELECT id FROM inventory_history WHERE robot_id LIKE :p ORDER BY id DESC LIMIT :n"),
+            {"p": f"{PREFIX}%", "n": max(args.export_ids * 4, 1000)},
+        )).scalars().all()
+
+    return {"seed_seconds": round(time.perf_counter() - t0, 2), "inserted_history_rows": missing, "ids": list(ids)}
+
+
+async def warm_redis(app, args: argparse.Namespace) -> bool:
+    """Засевает Redis множеством известных SKU (горячий путь ingest). False — Redis недоступен."""
+    cache = app.container.cache_service()
+    if cache.redis_client is None:
+        return False
+    if not args.cold_cache:
+        await cache.add_known_products([_product_id(i) for i in range(1, args.products + 1)])
+    return True
+
+
+# ============ Сценарии ============
+
+RequestFn = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+async def run_http_scenario(
+    client: httpx.AsyncClient,
+    request: RequestFn,
+    *,
+    requests: int,
+    concurrency: int,
+    counter: Optional[QueryCounter],
+) -> Dict[str, Any]:
+    # прогрев + SQL-запросы на один запрос (последовательно, чтобы не смешивать с чужими)
+    await request(client, 0)
+    queries = None
+    if counter is not None:
+        before = counter.count
+        await request(client, 1)
+        queries = counter.count - before
+
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                resp = await request(client, i)
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                return
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            if resp.status_code >= 400:
+                key = f"http_{resp.status_code}"
+                errors[key] = errors.get(key, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(2, requests + 2)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "rps": round(requests / elapsed, 1),
+        **_latency_stats(latencies),
+        "errors": errors,
+        "db_queries_per_request": queries,
+    }
+
+
+def _telemetry(robot_id: str, ts: datetime, rnd: random.Random, products: int, scans: int) -> Dict[str, Any]:
+    results = []
+    for pid in rnd.sample(range(1, products + 1), k=min(scans, products)):
+        qty = rnd.randint(0, 100)
+        results.append({
+            "product_id": _product_id(pid),
+            "product_name": f"Bench product {pid}",
+            "quantity": qty,
+            "status": "OK" if qty > 20 else "LOW_STOCK" if qty > 10 else "CRITICAL",
+        })
+    return {
+        "robot_id": robot_id,
+        "timestamp": ts.isoformat(),
+        "location": {"zone": "A", "row": rnd.randint(1, 20), "shelf": rnd.randint(1, 10)},
+        "scan_results": results,
+        "battery_level": round(rnd.uniform(20, 100), 1),
+        "next_checkpoint": "A-1-1",
+    }
+
+
+def make_requests(args: argparse.Namespace, ids: List[int]) -> Dict[str, RequestFn]:
+    rnd = random.Random(args.seed)
+    tokens = {
+        _robot_id(i): SecurityManager.create_access_token(subject=_robot_id(i), token_type="robot", expires_delta=None)
+        for i in range(1, args.robots + 1)
+    }
+    base_ts = datetime.now(timezone.utc)
+    zones = [chr(ord("A") + i) for i in range(args.zones)]
+    statuses = [None, "ok", "low_stock", "critical"]
+
+    async def ingest(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        robot_id = _robot_id(1 + i % args.robots)
+        body = _telemetry(robot_id, base_ts + timedelta(microseconds=i), rnd, args.products, args.scans)
+        return await client.post(
+            "/api/robots/data", json=body, headers={"Authorization": f"Bearer {tokens[robot_id]}"}
+        )
+
+    async def history(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        params: Dict[str, Any] = {"limit": 50, "offset": rnd.choice([0, 0, 50, 500])}
+        if rnd.random() < 0.5:
+            params["zone"] = rnd.choice(zones)
+        status = rnd.choice(statuses)
+        if status:
+            params["status"] = status
+        if rnd.random() < 0.5:
+            params["from"] = (datetime.utcnow() - timedelta(days=rnd.randint(1, args.days))).isoformat()
+        return await client.get("/api/inventory/history", params=params)
+
+    async def dashboard(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await client.get("/api/dashboard/current")
+
+    async def export(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        picked = rnd.sample(ids, k=min(args.export_ids, len(ids))) if ids else [1]
+        return await client.get("/api/export/excel", params={"ids": ",".join(map(str, picked))})
+
+    async def import_csv(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(["robot_id", "product_id", "quantity", "zone", "row", "shelf", "status", "scanned_at"])
+        for _ in range(args.import_rows):
+            qty = rnd.randint(0, 100)
+            writer.writerow([
+                _robot_id(rnd.randint(1, args.robots)), _product_id(rnd.randint(1, args.products)), qty,
+                rnd.choice(zones), rnd.randint(1, 20), rnd.randint(1, 10),
+                "OK" if qty > 20 else "LOW_STOCK" if qty > 10 else "CRITICAL",
+                (datetime.utcnow() - timedelta(minutes=rnd.randint(0, 600))).isoformat(),
+            ])
+        files = {"file": ("bench.csv", buf.getvalue().encode(), "text/csv")}
+        return await client.post("/api/inventory/import", files=files)
+
+    return {
+        "ingest": ingest,
+        "history": history,
+        "dashboard": dashboard,
+        "export": export,
+        "import": import_csv,
+    }
+
+
+async def run_ws_scenario(
+    client: httpx.AsyncClient,
+    ws_base: str,
+    args: argparse.Namespace,
+) -> Dict[str, Any]:
+    """
+    ws_clients подписчиков /ws/notifications; ws_messages ingest-запросов подряд.
+    Латентность доставки — от отправки POST /api/robots/data до получения robot_update подписчиком.
+    """
+    user_token = SecurityManager.create_access_token(subject=f"{PREFIX}user")
+    robot_id = _robot_id(1)
+    robot_token = SecurityManager.create_access_token(subject=robot_id, token_type="robot", expires_delta=None)
+    rnd = random.Random(args.seed)
+    base_ts = datetime.now(timezone.utc)
+
+    sent_at: Dict[str, float] = {}
+    latencies: List[float] = []
+    expected = args.ws_messages * args.ws_clients
+    done = asyncio.Event()
+
+    async def subscriber(ws) -> None:
+        async for raw in ws:
+            msg = json.loads(raw)
+            if msg.get("type") != "robot_update" or msg.get("robot_id") != robot_id:
+                continue
+            t_sent = sent_at.get(msg.get("last_update"))
+            if t_sent is not None:
+                latencies.append((time.perf_counter() - t_sent) * 1000.0)
+                if len(latencies) >= expected:
+                    done.set()
+
+    sockets = [
+        await websockets.connect(
+            f"{ws_base}/ws/notifications", additional_headers={"Authorization": f"Bearer {user_token}"}
+        )
+        for _ in range(args.ws_clients)
+    ]
+    readers = [asyncio.create_task(subscriber(ws)) for ws in sockets]
+    try:
+        started = time.perf_counter()
+        for i in range(args.ws_messages):
+            ts = base_ts + timedelta(milliseconds=i)
+            sent_at[ts.isoformat()] = time.perf_counter()
+            await client.post(
+                "/api/robots/data",
+                json=_telemetry(robot_id, ts, rnd, args.products, 1),
+                headers={"Authorization": f"Bearer {robot_token}"},
+            )
+        try:
+            await asyncio.wait_for(done.wait(), timeout=30)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - started
+    finally:
+        for ws in sockets:
+            await ws.close()
+        for task in readers:
+            task.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+
+    return {
+        "clients": args.ws_clients,
+        "messages_sent": args.ws_messages,
+        "deliveries_expected": expected,
+        "deliveries": len(latencies),
+        "deliveries_per_s": round(len(latencies) / elapsed, 1),
+        **_latency_stats(latencies),
+    }
+
+
+# ============ Сравнение ============
+
+def compare(current: Dict[str, Any], baseline_path: str) -> Dict[str, Any]:
+    """Дельты rps и p95/p99 против прошлого прогона (в процентах)."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    out: Dict[str, Any] = {"baseline_commit": baseline.get("meta", {}).get("commit")}
+    for name, cur in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        deltas = {}
+        for key in ("rps", "deliveries_per_s", "p50_ms", "p95_ms", "p99_ms", "db_queries_per_request"):
+            if cur.get(key) is not None and base.get(key):
+                deltas[key] = f"{(cur[key] - base[key]) / base[key] * 100:+.1f}%"
+        out[name] = deltas
+    return out
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+# ============ main ============
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    selected = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    # схема — миграциями, как при деплое (приложение на старте только проверяет ревизию)
+    await upgrade_to_head(admin_engine)
+    if args.reset:
+        await reset_data()
+    seed = await seed_data(args)
+    ids = seed.pop("ids")
+    await admin_engine.dispose()
+
+    server = ServerThread(args.port)
+    server.start()
+    counter = QueryCounter()
+    counter.attach(server.app.container.engine().sync_engine)
+
+    # Redis засеваем в цикле сервера: клиент redis.asyncio привязан к своему event loop
+    redis_ok = server.call(warm_redis(server.app, args))
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    results: Dict[str, Any] = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+            requests_by_name = make_requests(args, ids)
+            for name in selected:
+                if name == "ws":
+                    results[name] = await run_ws_scenario(client, f"ws://127.0.0.1:{args.port}", args)
+                    continue
+                n = args.import_requests if name == "import" else args.export_requests if name == "export" else args.requests
+                results[name] = await run_http_scenario(
+                    client, requests_by_name[name],
+                    requests=n, concurrency=args.concurrency, counter=counter,
+                )
+                print(f"{name:10s} {results[name]['rps']:8.1f} rps  p95={results[name]['p95_ms']}ms", flush=True)
+    finally:
+        server.stop()
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "redis": redis_ok,
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            **seed,
+        },
+        "scenarios": results,
+    }
+    if args.compare:
+        report["comparison"] = compare(report, args.compare)
+    return report
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--port", type=int, default=int(os.getenv("BENCH_PORT", "8091")))
+    # объём данных
+    parser.add_argument("--robots", type=int, default=50)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--history-rows", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--zones", type=int, default=5)
+    parser.add_argument("--reset", action="store_true", help="удалить прошлые BENCH-данные перед засевом")
+    parser.add_argument("--cold-cache", action="store_true", help="не засевать Redis известными SKU")
+    # нагрузка
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scans", type=int, default=3, help="сканов в пакете ingest")
+    parser.add_argument("--export-requests", type=int, default=20)
+    parser.add_argument("--export-ids", type=int, default=500)
+    parser.add_argument("--import-requests", type=int, default=10)
+    parser.add_argument("--import-rows", type=int, default=1000)
+    parser.add_argument("--ws-clients", type=int, default=50)
+    parser.add_argument("--ws-messages", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    # вывод
+    parser.add_argument("--output", help="куда сохранить JSON-отчёт")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    args = parse_args()
+    report = asyncio.run(main_async(args))
+    text_report = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text_report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text_report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/bench_cold_start.py
+"""
+Холодный старт воркера: сколько проходит от запуска процесса до готовности.
+
+  import   — `import main` в свежем интерпретаторе (импорт модулей + create_app)
+  serve    — запуск uvicorn до первого 200 на /ping (import + lifespan: проверка
+             ревизии схемы, подключение к Redis); нужен Postgres/Redis из окружения
+  --top N  — самые дорогие пакеты по `python -X importtime`
+
+Пример:
+    cd back
+    python -m benchmarks.bench_cold_start --runs 5 --top 15
+    python -m benchmarks.bench_cold_start --runs 5 --serve
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, List
+
+BACK_DIR = Path(__file__).resolve().parents[1]
+
+_IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import main; "
+    "print((time.perf_counter() - t) * 1000)"
+)
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "median_ms": round(statistics.median(values), 1),
+        "min_ms": round(min(values), 1),
+        "max_ms": round(max(values), 1),
+    }
+
+
+def measure_import(runs: int) -> Dict[str, float]:
+    times = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SNIPPET],
+            cwd=BACK_DIR, capture_output=True, text=True, check=True,
+        )
+        times.append(float(out.stdout.strip().splitlines()[-1]))
+    return _summary(times)
+
+
+def top_imports(limit: int) -> List[Dict[str, object]]:
+    """
+    Самые дорогие пакеты по `python -X importtime`: для каждого корневого пакета берём
+    наибольшее кумулятивное время среди его модулей (≈ стоимость первого импорта пакета).
+    """
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACK_DIR, capture_output=True, text=True, check=True,
+    )
+    by_package: Dict[str, int] = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            cumulative_us = int(cumulative.strip())
+        except ValueError:
+            continue
+        package = name.strip().split(".")[0]
+        if package == "main":
+            continue
+        by_package[package] = max(by_package.get(package, 0), cumulative_us)
+    ranked = sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+    return [{"package": name, "cumulative_ms": round(us / 1000, 1)} for name, us in ranked]
+
+
+def measure_serve(runs: int, port: int, timeout: float) -> Dict[str, float]:
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACK_DIR, env=os.environ.copy(),
+        )
+        try:
+            while True:
+                if proc.poll() is not None:
+                    raise SystemExit(f"uvicorn exited with code {proc.returncode}")
+                if time.perf_counter() - started > timeout:
+                    raise SystemExit(f"/ping did not answer within {timeout}s")
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/ping", timeout=0.5) as r:
+                        if r.status == 200:
+                            break
+                except OSError:
+                    time.sleep(0.01)
+            times.append((time.perf_counter() - started) * 1000)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+    return _summary(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="показать N самых дорогих импортов")
+    parser.add_argument("--serve", action="store_true", help="замерить старт uvicorn до первого /ping")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    report: Dict[str, object] = {"runs": args.runs, "import": measure_import(args.runs)}
+    if args.top:
+        report["top_imports"] = top_imports(args.top)
+    if args.serve:
+        report["serve_to_first_ping"] = measure_serve(args.runs, args.port, args.timeout)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/bench_ingest_rows.py
+"""
+CPU и память на подготовку строк истории при приёме телеметрии (без БД).
+
+Кадры генерируются как у robot_emulator (bench_telemetry_encoding._packets) и заранее
+разбираются в RobotBase — меряется только путь "кадр -> параметры bulk insert":
+
+  pydantic + orm — InventoryRecordCreate на скан -> InventoryHistory + session.add
+                   (прежний RobotService.process_robot_batch -> create_many)
+  scan row       — ScanRow-кортеж на скан -> dict параметров Core executemany
+                   (RobotService -> InventoryHistoryRepository.insert_rows)
+
+Память — пик tracemalloc на секунду приёма (--rate сканов) в одной пачке.
+"cpu_share_at_rate" — доля одного ядра, которую путь съедает на заданном потоке.
+
+Пример:
+    cd back
+    python -m benchmarks.bench_ingest_rows --rate 10000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Callable, List
+
+from sqlalchemy.orm import Session
+
+from app.db.base import InventoryHistory
+from app.repo.inventory import SCAN_STATUSES, ScanRow
+from app.schemas.inventory import InventoryRecordCreate
+from app.schemas.robot import RobotBase
+from benchmarks.bench_telemetry_encoding import _packets
+
+
+def _orm_path(frames: List[RobotBase]) -> list:
+    session = Session()
+    objs = []
+    for frame in frames:
+        for item in frame.scan_results:
+            rec = InventoryRecordCreate(
+                robot_id=frame.robot_id,
+                product_id=item.product_id,
+                quantity=item.quantity,
+                zone=frame.location.zone,
+                row_number=frame.location.row,
+                shelf_number=frame.location.shelf,
+                status=item.status.upper() if item.status else None,
+                scanned_at=frame.last_update,
+            )
+            obj = InventoryHistory(
+                robot_id=rec.robot_id,
+                product_id=rec.product_id,
+                quantity=rec.quantity,
+                zone=rec.zone,
+                row_number=rec.row_number,
+                shelf_number=rec.shelf_number,
+                status=rec.status,
+                scanned_at=rec.scanned_at,
+            )
+            session.add(obj)
+            objs.append(obj)
+    return objs
+
+
+def _scan_row_path(frames: List[RobotBase]) -> list:
+    rows = []
+    for frame in frames:
+        loc = frame.location
+        for item in frame.scan_results:
+            status = item.status.upper() if item.status else None
+            if item.quantity < 0 or (status is not None and status not in SCAN_STATUSES):
+                raise ValueError(item.product_id)
+            rows.append(ScanRow(
+                frame.robot_id, item.product_id, item.quantity,
+                loc.zone, loc.row, loc.shelf, status, frame.last_update,
+            ))
+    fields = ScanRow._fields
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def _best_seconds(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _peak_bytes(fn: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        result = fn()  # noqa: F841 — держим результат до замера пика
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=int, default=10_000, help="сканов в секунду")
+    parser.add_argument("--robots", type=int, default=50)
+    parser.add_argument("--max-scans", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # кадров ровно на одну секунду потока при среднем (1 + max_scans) / 2 сканов на кадр
+    packets = _packets(args.rate * 2 // (1 + args.max_scans), args.robots, args.max_scans)
+    frames = [RobotBase.model_validate(p) for p in packets]
+    scans = sum(len(f.scan_results) for f in frames)
+
+    results = {"scans": scans, "frames": len(frames)}
+    for name, fn in (("pydantic + orm", _orm_path), ("scan row", _scan_row_path)):
+        seconds = _best_seconds(lambda: fn(frames), args.repeat)
+        results[name] = {
+            "us_per_scan": round(seconds / scans * 1e6, 2),
+            "cpu_share_at_rate": round(seconds / scans * args.rate, 3),
+            "peak_mb": round(_peak_bytes(lambda: fn(frames)) / 2**20, 2),
+        }
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
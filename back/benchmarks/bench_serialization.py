@@ -0,0 +1,199 @@
+# benchmarks/bench_serialization.py
+"""
+CPU на сериализацию больших ответов: путь FastAPI по умолчанию против FastJSONResponse.
+
+Нагрузки:
+  history   — страница /api/inventory/history (InventoryHistoryResponse, 200 строк)
+  dashboard — /api/dashboard/current (DashboardResponse, 500 роботов + 20 сканов)
+  ws        — рассылка notifier-сообщения на N сокетов
+  rows      — страница истории из БД -> модели (SQLite в памяти)
+
+Пути:
+  fastapi default — serialize_response (повторная валидация по response_model +
+                    jsonable dict) + JSONResponse.render (json.dumps)
+  fast json       — app.core.serialization.model_response (pydantic-core сразу в байты)
+  ws send_json    — json.dumps на каждый сокет (прежний ConnectionManager._send)
+  ws encode once  — encode_ws один раз на рассылку
+  orm per row     — InventoryRecordOut.model_validate(orm) на каждую строку (прежний HistoryService)
+  rows_to_models  — строки Core, один TypeAdapter на страницу (app.core.serialization)
+
+Пример:
+    cd back
+    python -m benchmarks.bench_serialization --rows 200 --robots 500
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.serialization import rows_to_models, encode_ws, model_response
+from app.db.base import InventoryHistory
+from app.repo.inventory import ROW_COLUMNS
+from app.schemas.dashboard import DashboardResponse, DashboardStatistics, RecentScanItem, RobotInfo
+from app.schemas.inventory import InventoryHistoryResponse, InventoryRecordOut, PaginationOut
+
+
+def _history(rows: int, seed: int = 42) -> InventoryHistoryResponse:
+    rnd = random.Random(seed)
+    start = datetime(2025, 10, 1, tzinfo=timezone.utc)
+    items = []
+    for i in range(rows):
+        qty = rnd.randint(0, 100)
+        items.append(InventoryRecordOut(
+            id=i + 1,
+            robot_id=f"RB-{i % 50:03d}",
+            product_id=f"TEL-{1000 + rnd.randint(0, 199)}",
+            quantity=qty,
+            zone=rnd.choice("ABCDE"),
+            row_number=rnd.randint(1, 20),
+            shelf_number=rnd.randint(1, 10),
+            status="OK" if qty > 20 else "LOW_STOCK" if qty > 10 else "CRITICAL",
+            scanned_at=start + timedelta(seconds=i),
+            created_at=start + timedelta(seconds=i, milliseconds=250),
+        ))
+    return InventoryHistoryResponse(total=rows * 50, items=items, pagination=PaginationOut(limit=rows, offset=0))
+
+
+def _dashboard(robots: int, seed: int = 42) -> DashboardResponse:
+    rnd = random.Random(seed)
+    now = datetime(2025, 10, 1, 12, tzinfo=timezone.utc)
+    return DashboardResponse(
+        robots=[
+            RobotInfo(
+                robot_id=f"RB-{i:04d}",
+                status=rnd.choice(["online", "offline", "charging"]),
+                battery_level=round(rnd.uniform(5, 100), 1),
+                last_update=now - timedelta(seconds=rnd.randint(0, 600)),
+                zone=rnd.choice("ABCDE"),
+                row=rnd.randint(1, 20),
+                shelf=rnd.randint(1, 10),
+            )
+            for i in range(robots)
+        ],
+        recent_scans=[
+            RecentScanItem(
+                id=i, robot_id=f"RB-{i:04d}", product_id=f"TEL-{1000 + i}", quantity=i, status="OK",
+                zone="A", row_number=1, shelf_number=1, scanned_at=now,
+            )
+            for i in range(20)
+        ],
+        statistics=DashboardStatistics(
+            total_robots=robots, offline_robots=robots // 10, critical_items=7,
+            low_stock_items=12, scans_last_hour=4200,
+        ),
+    )
+
+
+def _fastapi_default(model: Any) -> Callable[[], bytes]:
+    field = create_model_field(name="Response", type_=type(model), mode="serialization")
+
+    def run() -> bytes:
+        content = asyncio.run(serialize_response(field=field, response_content=model))
+        return JSONResponse(content).body
+
+    return run
+
+
+def _bench_rows(rows: int, number: int, repeat: int) -> dict:
+    """
+    Страница истории из БД (SQLite в памяти — важна стоимость на стороне Python):
+    ORM-объекты + model_validate на строку против строк Core + rows_to_models.
+    """
+    engine = create_engine("sqlite://")
+    InventoryHistory.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(InventoryHistory.__table__), [
+            {**r.model_dump(), "scanned_at": r.scanned_at.replace(tzinfo=None),
+             "created_at": r.created_at.replace(tzinfo=None)}
+            for r in _history(rows).items
+        ])
+    session = Session(engine)
+
+    def orm_per_row() -> list:
+        session.expunge_all()  # как в новой сессии запроса: без identity map
+        objs = session.execute(select(InventoryHistory).limit(rows)).scalars().all()
+        return [InventoryRecordOut.model_validate(o) for o in objs]
+
+    def core_rows() -> list:
+        return rows_to_models(InventoryRecordOut, session.execute(select(*ROW_COLUMNS).limit(rows)).all())
+
+    assert [m.model_dump() for m in orm_per_row()] == [m.model_dump() for m in core_rows()]
+    return {
+        "rows": rows,
+        "orm per row us": round(_best_us(orm_per_row, number, repeat), 1),
+        "rows_to_models us": round(_best_us(core_rows, number, repeat), 1),
+    }
+
+
+def _best_us(fn: Callable[[], Any], number: int, repeat: int) -> float:
+    """Лучшее из repeat прогонов, микросекунд на вызов."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - t0)
+    return best / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--robots", type=int, default=500)
+    parser.add_argument("--sockets", type=int, default=200)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = {}
+    for name, model in (("history", _history(args.rows)), ("dashboard", _dashboard(args.robots))):
+        default = _fastapi_default(model)
+        fast = lambda m=model: model_response(m).body  # noqa: E731
+        # оба пути должны отдавать один и тот же JSON
+        assert json.loads(default()) == json.loads(fast())
+        # asyncio.run на каждый вызов — константа, вычитаем её из fastapi default
+        loop_cost = _best_us(lambda: asyncio.run(asyncio.sleep(0)), args.number, args.repeat)
+        results[name] = {
+            "bytes": len(fast()),
+            "fastapi default us": round(_best_us(default, args.number, args.repeat) - loop_cost, 1),
+            "fast json us": round(_best_us(fast, args.number, args.repeat), 1),
+        }
+
+    message = {
+        "type": "inventory_alert",
+        "data": {"product_id": "TEL-1042", "zone": "B", "status": "CRITICAL", "quantity": 3,
+                 "scanned_at": "2025-10-01T12:00:00Z"},
+    }
+    sockets = range(args.sockets)
+
+    def per_socket() -> None:
+        for _ in sockets:
+            json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+    def encode_once() -> None:
+        text = encode_ws(message)
+        for _ in sockets:
+            _ = text
+
+    results["ws"] = {
+        "sockets": args.sockets,
+        "send_json per socket us": round(_best_us(per_socket, args.number, args.repeat), 1),
+        "encode once us": round(_best_us(encode_once, args.number, args.repeat), 1),
+    }
+    results["rows"] = _bench_rows(args.rows, args.number, args.repeat)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
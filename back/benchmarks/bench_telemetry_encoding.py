@@ -0,0 +1,111 @@
+# benchmarks/bench_telemetry_encoding.py
+"""
+Размер пакета телеметрии и CPU на его разбор: JSON против компактного msgpack-кадра.
+
+Пакеты генерируются как у robot_emulator (1-3 скана из каталога, имя товара в каждом
+скане для JSON). Для msgpack имя товара передаётся только при первом появлении SKU
+у робота (known_products на робота).
+
+Декодирование:
+  json (fastapi)   — json.loads + RobotBase.model_validate (как body-параметр FastAPI)
+  json (pydantic)  — RobotBase.model_validate_json (текущий путь /api/robots/data)
+  msgpack compact  — robot_compact.decode_message (строгие проверки + model_validate)
+
+Пример:
+    cd back
+    python -m benchmarks.bench_telemetry_encoding --packets 20000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Set
+
+from app.schemas import robot_compact
+from app.schemas.robot import RobotBase
+
+
+CATALOG = [(f"TEL-{1000 + i}", f"Сетевое оборудование модель {i}") for i in range(200)]
+
+
+def _packets(count: int, robots: int, max_scans: int, seed: int = 42) -> List[dict]:
+    rnd = random.Random(seed)
+    start = datetime(2025, 10, 1, tzinfo=timezone.utc)
+    out = []
+    for i in range(count):
+        scans = []
+        for pid, name in rnd.sample(CATALOG, k=rnd.randint(1, max_scans)):
+            qty = rnd.randint(5, 100)
+            status = "OK" if qty > 20 else "LOW_STOCK" if qty > 10 else "CRITICAL"
+            scans.append({"product_id": pid, "product_name": name, "quantity": qty, "status": status})
+        out.append({
+            "robot_id": f"RB-{i % robots:03d}",
+            "timestamp": (start + timedelta(seconds=i)).isoformat().replace("+00:00", "Z"),
+            "location": {"zone": rnd.choice("ABCDE"), "row": rnd.randint(1, 20), "shelf": rnd.randint(1, 10)},
+            "scan_results": scans,
+            "battery_level": round(rnd.uniform(20, 100), 1),
+            "next_checkpoint": f"A-{rnd.randint(1, 20)}-{rnd.randint(1, 10)}",
+            "status": "online",
+        })
+    return out
+
+
+def _time_per_packet(fn: Callable[[bytes], object], payloads: List[bytes], repeat: int) -> float:
+    """Лучшее из repeat прогонов, микросекунд на пакет."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for p in payloads:
+            fn(p)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(payloads) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--packets", type=int, default=20_000)
+    parser.add_argument("--robots", type=int, default=50)
+    parser.add_argument("--max-scans", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    packets = _packets(args.packets, args.robots, args.max_scans)
+
+    json_payloads = [json.dumps(p, ensure_ascii=False).encode() for p in packets]
+    # все кадры считаем подтверждёнными: имя SKU уходит роботом один раз
+    known: Dict[str, Set[str]] = {}
+    msgpack_payloads = []
+    for p in packets:
+        robot_known = known.setdefault(p["robot_id"], set())
+        msgpack_payloads.append(robot_compact.encode_frame(p, known_products=robot_known))
+        robot_known |= robot_compact.named_products(p)
+
+    # декодеры должны давать одно и то же
+    sample = RobotBase.model_validate_json(json_payloads[-1])
+    [compact] = robot_compact.decode_message(msgpack_payloads[-1])
+    assert compact.model_dump(exclude={"scan_results"}) == sample.model_dump(exclude={"scan_results"})
+
+    results = {
+        "packets": args.packets,
+        "bytes_per_packet": {
+            "json": round(statistics.fmean(map(len, json_payloads)), 1),
+            "msgpack compact": round(statistics.fmean(map(len, msgpack_payloads)), 1),
+        },
+        "decode_us_per_packet": {
+            "json (fastapi)": round(_time_per_packet(
+                lambda b: RobotBase.model_validate(json.loads(b)), json_payloads, args.repeat), 2),
+            "json (pydantic)": round(_time_per_packet(
+                RobotBase.model_validate_json, json_payloads, args.repeat), 2),
+            "msgpack compact": round(_time_per_packet(
+                robot_compact.decode_message, msgpack_payloads, args.repeat), 2),
+        },
+    }
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/openrouter_stub.py
+"""
+Локальная заглушка OpenRouter Chat Completions для тестов и бенчмарков.
+
+Отвечает в формате OpenRouter ({"choices":[{"message":{"content": "<json>"}}]}),
+прогноз строит по INPUT=... из промпта: по одному product_id на входной товар.
+Задержка и отказы настраиваются по модели, чтобы проверять hedged-режим.
+
+Запуск отдельным процессом:
+    uvicorn benchmarks.openrouter_stub:app --port 8089
+    OPENROUTER_BASE_URL=http://127.0.0.1:8089/api/v1 uvicorn main:app
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from typing import Dict, Iterable, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def _predictions_from_prompt(messages: list) -> dict:
+    user = next((m.get("content", "") for m in messages if m.get("role") == "user"), "")
+    products = []
+    for line in user.splitlines():
+        if line.startswith("INPUT="):
+            products = json.loads(line[len("INPUT="):]).get("products", [])
+            break
+
+    predictions = []
+    for p in products:
+        qty = int(p.get("current_qty") or 0)
+        demand = max(1, len(p.get("history") or []))
+        predictions.append({
+            "product_id": p.get("product_id"),
+            "category": p.get("category"),
+            "expected_demand": demand,
+            "days_until_stockout": round(qty / demand, 1),
+            "recommended_order_quantity": max(0, int(p.get("optimal_stock") or 0) - qty),
+        })
+    return {"predictions": predictions, "confidence": 0.75}
+
+
+def make_stub_app(
+    *,
+    default_latency: float = 0.0,
+    latency_by_model: Optional[Dict[str, float]] = None,
+    failing_models: Iterable[str] = (),
+) -> FastAPI:
+    """
+    default_latency  — задержка ответа в секундах
+    latency_by_model — задержка для конкретных моделей (перекрывает default)
+    failing_models   — модели, на которые заглушка отвечает 503
+    """
+    latency_by_model = dict(latency_by_model or {})
+    failing = set(failing_models)
+    stub = FastAPI(title="OpenRouter stub")
+    stub.state.calls = []
+    # можно менять на лету (бенчмарк переключает "медленную" первичную модель)
+    stub.state.latency_by_model = latency_by_model
+
+    @stub.post("/api/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model") or (body.get("models") or [None])[0]
+        stub.state.calls.append(model)
+
+        await asyncio.sleep(stub.state.latency_by_model.get(model, default_latency))
+
+        if model in failing:
+            return JSONResponse(status_code=503, content={"error": f"{model} unavailable"})
+
+        content = json.dumps(_predictions_from_prompt(body.get("messages") or []))
+        return {
+            "id": "stub",
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}],
+        }
+
+    return stub
+
+
+app = make_stub_app(
+    default_latency=float(os.getenv("STUB_LATENCY_SECONDS", "0.05")),
+)
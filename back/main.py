@@ -1,28 +1,43 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware  # 👈 добавлено для CORS
 from contextlib import asynccontextmanager
-from app.db.session import engine
-from app.db.base import Base
 from app.core.container import Container
+from app.db.migrations import ensure_schema_current
 from app.api import health, user, robot, ws, inventory, dashboard, import_csv, export, ai
 from app.core.middleware import AuthMiddleware
 from app.core.robot_middleware import RobotAuthMiddleware
+from app.core.db_stats import DBStatsMiddleware, install_sql_tracing
+from app.core.metrics import register_runtime_collector
+from app.core.serialization import FastJSONResponse
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # контейнер один: собран и провязан в create_app
+    container = app.container
+    engine = container.engine()
 
-    container = Container()
-    app.container = container
-    container.wire(packages=["app.api"])
+    # схему меняют миграции (alembic upgrade head); здесь — один SELECT ревизии
+    await ensure_schema_current(engine)
 
     cache_service = container.cache_service()
     await cache_service.connect()
 
+    # реплика для аналитики догоняется в фоне; до первой синхронизации — Postgres
+    analytics = container.analytics_engine()
+    if analytics is not None:
+        await analytics.start()
+
     yield
 
+    if analytics is not None:
+        await analytics.stop()
+
+    await container.robot_ingest_batcher().shutdown()
+    await container.prediction_jobs().shutdown()
+    # клиент OpenRouter (httpx/h2) закрывается, только если прогноз его создавал
+    for close in reversed(container.shutdown_hooks()):
+        await close()
     try:
         await cache_service.disconnect()
     except Exception:
@@ -30,7 +45,12 @@ async def lifespan(app: FastAPI):
     await engine.dispose()
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Backend", lifespan=lifespan, redirect_slashes=False)
+    app = FastAPI(
+        title="Backend",
+        lifespan=lifespan,
+        redirect_slashes=False,
+        default_response_class=FastJSONResponse,
+    )
 
     # 👇 ДОБАВЛЕНО: Разрешаем запросы с фронта (CORS)
     app.add_middleware(
@@ -44,6 +64,7 @@ def create_app() -> FastAPI:
     container = Container()
     app.container = container
     container.wire(packages=["app.api"])
+    register_runtime_collector(container)
 
     app.include_router(health.router)
     app.include_router(user.router, prefix="/api")
@@ -58,6 +79,9 @@ def create_app() -> FastAPI:
 
     app.add_middleware(AuthMiddleware)
     app.add_middleware(RobotAuthMiddleware)
+
+    install_sql_tracing()
+    app.add_middleware(DBStatsMiddleware)
     return app
 
 app = create_app()
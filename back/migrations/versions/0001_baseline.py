@@ -0,0 +1,88 @@
+"""baseline: схема, которую раньше создавал create_all на старте
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2025-10-27
+
+Базы, поднятые старым кодом (create_all в lifespan), уже содержат эти таблицы —
+существующие таблицы пропускаются, ревизия просто проставляется.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0001_baseline"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.UUID(), primary_key=True),
+            sa.Column("email", sa.String(255)),
+            sa.Column("password_hash", sa.String(255)),
+            sa.Column("user_name", sa.String(255), nullable=True),
+            sa.Column("role", sa.String(50), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+
+    if "robots" not in existing:
+        op.create_table(
+            "robots",
+            sa.Column("robot_id", sa.String(50), primary_key=True),
+            sa.Column("status", sa.String(50), nullable=True),
+            sa.Column("battery_level", sa.Integer(), nullable=False),
+            sa.Column("last_update", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+            sa.Column("zone", sa.String(10), nullable=False),
+            sa.Column("row", sa.Integer(), nullable=False),
+            sa.Column("shelf", sa.Integer(), nullable=False),
+        )
+
+    if "products" not in existing:
+        op.create_table(
+            "products",
+            sa.Column("id", sa.String(50), primary_key=True),
+            sa.Column("name", sa.String(255), nullable=False),
+            sa.Column("category", sa.String(100)),
+            sa.Column("min_stock", sa.Integer(), nullable=False),
+            sa.Column("optimal_stock", sa.Integer(), nullable=False),
+        )
+
+    if "inventory_history" not in existing:
+        op.create_table(
+            "inventory_history",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("robot_id", sa.String(50), sa.ForeignKey("robots.robot_id"), nullable=True),
+            sa.Column("product_id", sa.String(50), sa.ForeignKey("products.id"), nullable=False),
+            sa.Column("quantity", sa.Integer(), nullable=False),
+            sa.Column("zone", sa.String(10), nullable=False),
+            sa.Column("row_number", sa.Integer()),
+            sa.Column("shelf_number", sa.Integer()),
+            sa.Column("status", sa.String(50)),
+            sa.Column("scanned_at", sa.TIMESTAMP(timezone=False), nullable=False),
+            sa.Column("created_at", sa.TIMESTAMP(timezone=False), server_default=sa.func.now(), nullable=False),
+        )
+
+    if "ai_predictions" not in existing:
+        op.create_table(
+            "ai_predictions",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("product_id", sa.String(50), sa.ForeignKey("products.id"), nullable=False),
+            sa.Column("prediction_date", sa.Date(), nullable=False),
+            sa.Column("days_until_stockout", sa.Integer()),
+            sa.Column("recommended_order", sa.Integer()),
+            sa.Column("confidence_score", sa.DECIMAL(3, 2)),
+            sa.Column("created_at", sa.TIMESTAMP(timezone=False), server_default=sa.func.now(), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    for table in ("ai_predictions", "inventory_history", "products", "robots", "users"):
+        op.drop_table(table)
@@ -0,0 +1,34 @@
+"""ingest_keys: ключи идемпотентности приёма телеметрии
+
+Revision ID: 0002_ingest_keys
+Revises: 0001_baseline
+Create Date: 2026-10-19
+
+Повторно присланный кадр (ретрай робота после 5xx/таймаута или переотправка после
+пере-регистрации) с тем же Idempotency-Key не пишет inventory_history второй раз.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0002_ingest_keys"
+down_revision: Union[str, None] = "0001_baseline"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ingest_keys",
+        sa.Column("robot_id", sa.String(50), primary_key=True),
+        sa.Column("key", sa.String(100), primary_key=True),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=False), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_ingest_keys_created_at", "ingest_keys", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ingest_keys_created_at", table_name="ingest_keys")
+    op.drop_table("ingest_keys")
@@ -1,16 +1,64 @@
 # robot_emulator.py
+"""
+Асинхронный симулятор парка роботов (нагрузочный генератор для бэкенда).
+
+Один процесс, один event loop, тысячи виртуальных роботов — каждый робот это
+корутина, а не OS-поток. Транспорт:
+  http — POST /api/robots/data через общий пул httpx.AsyncClient
+  ws   — своё соединение /ws/robots на робота, кадр -> ack по seq
+Кодирование кадров: json или msgpack (компактный формат app/schemas/robot_compact.py).
+
+Настраивается:
+  - склад: зоны/ряды/полки (--zones A-E --rows 20 --shelves 10)
+  - каталог и распределение сканов: --products, --scan-dist uniform|zipf (--zipf-s)
+  - профиль нагрузки: constant | ramp | step | sine (--profile, --profile-args)
+    множитель частоты тиков от времени; интервалы с пуассоновским джиттером (--poisson)
+
+Отчёт: пакеты/сканы в секунду, ошибки, перцентили латентности
+(service — отправка -> ответ, e2e — от запланированного момента тика, без coordinated omission).
+Периодически печатается прогресс, в конце — JSON (--report file.json).
+
+Примеры:
+    python emulator.py --robots 2000 --interval 1 --duration 60 --transport ws --encoding msgpack
+    python emulator.py --robots 500 --interval 0.5 --profile ramp --profile-args 0.1,2 --duration 120
+
+Без аргументов читает переменные окружения API_URL, ROBOTS_COUNT, UPDATE_INTERVAL, TRANSPORT
+и работает бесконечно (как прежний эмулятор в docker-compose).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import bisect
+import itertools
 import json
+import math
 import os
 import random
-import threading
+import signal
 import time
-from dataclasses import dataclass
+import uuid
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Sequence
+
+import httpx
+
+try:
+    # нужны только для TRANSPORT=ws / ENCODING=msgpack
+    import websockets
+except ImportError:  # pragma: no cover
+    websockets = None
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
 
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+# ответы, после которых кадр безопасно повторить с тем же Idempotency-Key
+RETRY_STATUSES = frozenset((502, 503, 504))
+STATUS_CODES = {"OK": 0, "LOW_STOCK": 1, "CRITICAL": 2}
 
 
 def iso_utc_now() -> str:
@@ -24,85 +72,210 @@ class Product:
     name: str
 
 
-class RobotEmulator:
-    def __init__(self, robot_id: str, api_base: str, update_interval: float = 10.0):
-        """
-        robot_id: строковый ID, например 'RB-001'
-        api_base: базовый URL бэкенда, например 'http://backend:8000'
-        """
-        self.robot_id = robot_id
-        self.api_base = api_base.rstrip("/")
-        self.update_interval = update_interval
+# ============ Склад и каталог ============
 
-        # Состояние робота
-        self.battery = 100.0
-        self.zone = "A"
-        self.row = 1
-        self.shelf = 1
-        self.status = "online"  # опционально по схеме
+@dataclass
+class WarehouseLayout:
+    zones: Sequence[str] = ("A", "B", "C", "D", "E")
+    rows: int = 20
+    shelves: int = 10
 
-        # Токен авторизации, получим при регистрации
-        self.token: Optional[str] = None
+    @classmethod
+    def parse_zones(cls, spec: str) -> List[str]:
+        """'A-E' -> [A..E], 'A,B,X' -> [A, B, X]"""
+        if "-" in spec and len(spec) == 3:
+            start, end = spec[0], spec[2]
+            return [chr(c) for c in range(ord(start), ord(end) + 1)]
+        return [z.strip() for z in spec.split(",") if z.strip()]
 
-        # Тестовые товары (могут не существовать в БД — бекенд должен уметь ensure_exist)
-        self.products: List[Product] = [
-            Product("TEL-4567", "Роутер RT-AC68U"),
-            Product("TEL-8901", "Модем DSL-2640U"),
-            Product("TEL-2435", "Коммутатор SG-108"),
-            Product("TEL-6789", "IP-телефон T46S"),
-            Product("TEL-3456", "Кабель UTP Cat6"),
-        ]
 
-        # Настроим сессию requests с ретраями на сетевые сбои
-        self.session = requests.Session()
-        retries = Retry(
-            total=3,
-            backoff_factor=0.5,
-            status_forcelist=[502, 503, 504],
-            allowed_methods=frozenset(["GET", "POST"]),
-        )
-        adapter = HTTPAdapter(max_retries=retries)
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
+class ScanDistribution:
+    """
+    Какие SKU робот видит на тике.
+    uniform — все товары равновероятны; zipf — "горячие" SKU встречаются чаще (вес 1/rank^s).
+    """
+
+    def __init__(
+        self,
+        products: Sequence[Product],
+        kind: str = "uniform",
+        zipf_s: float = 1.1,
+        scans_min: int = 1,
+        scans_max: int = 3,
+    ):
+        self.products = list(products)
+        self.kind = kind
+        self.scans_min = scans_min
+        self.scans_max = min(scans_max, len(self.products))
+        weights = [1.0 / (rank ** zipf_s) for rank in range(1, len(self.products) + 1)]
+        self._cum = list(itertools.accumulate(weights))
+
+    def pick(self, rnd: random.Random) -> List[Product]:
+        k = rnd.randint(self.scans_min, self.scans_max)
+        if self.kind != "zipf":
+            return rnd.sample(self.products, k=k)
+        picked: Dict[str, Product] = {}
+        total = self._cum[-1]
+        while len(picked) < k:
+            p = self.products[bisect.bisect_left(self._cum, rnd.random() * total)]
+            picked[p.id] = p
+        return list(picked.values())
+
+
+def make_catalog(count: int) -> List[Product]:
+    base = [
+        Product("TEL-4567", "Роутер RT-AC68U"),
+        Product("TEL-8901", "Модем DSL-2640U"),
+        Product("TEL-2435", "Коммутатор SG-108"),
+        Product("TEL-6789", "IP-телефон T46S"),
+        Product("TEL-3456", "Кабель UTP Cat6"),
+    ]
+    extra = [Product(f"TEL-{10000 + i}", f"Оборудование #{i}") for i in range(max(0, count - len(base)))]
+    return (base + extra)[:count]
+
+
+def retry_after_seconds(value, default: float = 1.0) -> float:
+    """Retry-After в секундах (HTTP-дата от нашего сервера не приходит — только число)."""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+# ============ Профили нагрузки ============
+
+def make_profile(kind: str, args: Sequence[float], duration: float) -> Callable[[float], float]:
+    """
+    Множитель частоты тиков от времени t (сек с начала прогона):
+      constant            — 1
+      ramp  a,b           — линейно от a до b за duration
+      step  a,b,t_switch  — a до t_switch, затем b
+      sine  a,b,period    — синусоида между a и b
+    """
+    if kind == "constant":
+        return lambda t: 1.0
+    if kind == "ramp":
+        a, b = (list(args) + [0.1, 1.0][len(args):])[:2]
+        span = duration or 60.0
+        return lambda t: a + (b - a) * min(1.0, t / span)
+    if kind == "step":
+        a, b, t_switch = (list(args) + [1.0, 2.0, (duration or 60.0) / 2][len(args):])[:3]
+        return lambda t: a if t < t_switch else b
+    if kind == "sine":
+        a, b, period = (list(args) + [0.5, 1.5, 60.0][len(args):])[:3]
+        return lambda t: a + (b - a) * (1 + math.sin(2 * math.pi * t / period)) / 2
+    raise ValueError(f"Unknown profile {kind!r}")
+
+
+# ============ Метрики ============
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
 
-    # ============ Данные/движение ============
+
+@dataclass
+class FleetStats:
+    started: float = field(default_factory=time.perf_counter)
+    packets: int = 0
+    scans: int = 0
+    bytes_sent: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)
+    throttled: int = 0                  # тики, пропущенные по Retry-After сервера
+    retries: int = 0                    # повторные отправки кадра (5xx, сеть, 401)
+    duplicates: int = 0                 # повторы, которые сервер узнал по Idempotency-Key
+    service_ms: List[float] = field(default_factory=list)
+    e2e_ms: List[float] = field(default_factory=list)
+
+    def ok(self, scans: int, size: int, service_ms: float, e2e_ms: float) -> None:
+        self.packets += 1
+        self.scans += scans
+        self.bytes_sent += size
+        self.service_ms.append(service_ms)
+        self.e2e_ms.append(e2e_ms)
+
+    def error(self, kind: str) -> None:
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def summary(self) -> Dict:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        out: Dict = {
+            "elapsed_s": round(elapsed, 2),
+            "packets": self.packets,
+            "scans": self.scans,
+            "packets_per_s": round(self.packets / elapsed, 1),
+            "scans_per_s": round(self.scans / elapsed, 1),
+            "avg_packet_bytes": round(self.bytes_sent / self.packets, 1) if self.packets else 0,
+            "errors": dict(self.errors),
+            "throttled_ticks": self.throttled,
+            "retries": self.retries,
+            "duplicates": self.duplicates,
+        }
+        for name, values in (("service_ms", self.service_ms), ("e2e_ms", self.e2e_ms)):
+            ordered = sorted(values)
+            out[name] = {
+                f"p{p}": round(percentile(ordered, p), 2) for p in (50, 90, 95, 99)
+            }
+            out[name]["max"] = round(ordered[-1], 2) if ordered else 0.0
+        return out
+
+
+# ============ Виртуальный робот ============
+
+class VirtualRobot:
+    """Состояние одного робота: патруль по складу, батарея, сканы."""
+
+    def __init__(self, robot_id: str, layout: WarehouseLayout, scans: ScanDistribution, seed: int):
+        self.robot_id = robot_id
+        self.layout = layout
+        self.scans = scans
+        self.rnd = random.Random(seed)
+
+        # стартуем в случайной точке, чтобы роботы не шли строем
+        self.zone_idx = self.rnd.randrange(len(layout.zones))
+        self.row = self.rnd.randint(1, layout.rows)
+        self.shelf = self.rnd.randint(1, layout.shelves)
+        self.battery = self.rnd.uniform(60.0, 100.0)
+        self.status = "online"
+
+        self.token: Optional[str] = None
+        self.seq = 0
+        # до этого момента (perf_counter) сервер просил не слать кадры (429 / retry_after)
+        self.not_before = 0.0
+        # SKU, имя которых уже отправлено (компактный формат шлёт имя только раз)
+        self.known_products: set = set()
+
+    @property
+    def zone(self) -> str:
+        return self.layout.zones[self.zone_idx]
 
     def generate_scan_results(self) -> List[Dict]:
-        k = random.randint(1, 3)
-        picked = random.sample(self.products, k=k)
         results: List[Dict] = []
-        for p in picked:
-            qty = random.randint(5, 100)
+        for p in self.scans.pick(self.rnd):
+            qty = self.rnd.randint(5, 100)
             if qty > 20:
                 st = "OK"
             elif qty > 10:
                 st = "LOW_STOCK"
             else:
                 st = "CRITICAL"
-            results.append(
-                {
-                    "product_id": p.id,
-                    "product_name": p.name,   # по схеме поле опционально, можно не присылать
-                    "quantity": qty,
-                    "status": st,
-                }
-            )
+            results.append({"product_id": p.id, "product_name": p.name, "quantity": qty, "status": st})
         return results
 
     def step_location(self) -> None:
-        """Простейший патруль по полкам A..E, рядам 1..20, полкам 1..10"""
+        """Простейший патруль: полки -> ряды -> зоны по кругу"""
         self.shelf += 1
-        if self.shelf > 10:
+        if self.shelf > self.layout.shelves:
             self.shelf = 1
             self.row += 1
-        if self.row > 20:
+        if self.row > self.layout.rows:
             self.row = 1
-            self.zone = chr(ord(self.zone) + 1)
-            if self.zone > "E":
-                self.zone = "A"
+            self.zone_idx = (self.zone_idx + 1) % len(self.layout.zones)
 
         # трата батареи
-        self.battery -= random.uniform(0.1, 0.5)
+        self.battery -= self.rnd.uniform(0.1, 0.5)
         if self.battery < 20:
             # "зарядка" и отметим статус
             self.status = "charging"
@@ -110,103 +283,457 @@ class RobotEmulator:
         else:
             self.status = "online"
 
-    # ============ HTTP-взаимодействие ============
-
-    def headers(self) -> Dict[str, str]:
-        h = {"Content-Type": "application/json"}
-        if self.token:
-            h["Authorization"] = f"Bearer {self.token}"
-        return h
-
-    def register(self) -> None:
-        """POST /api/robots/register -> получить токен."""
-        url = f"{self.api_base}/api/robots/register"
-        payload = {
-            "robot_id": self.robot_id,
-            # стартовые координаты/батарея — поля опциональные по схеме
-            "zone": self.zone,
-            "row": self.row,
-            "shelf": self.shelf,
-            "battery_level": round(self.battery, 1),
-            "status": self.status,
-        }
-        resp = self.session.post(url, json=payload, headers={"Content-Type": "application/json"}, timeout=10)
-        if resp.status_code not in (200, 201):
-            raise RuntimeError(f"[{self.robot_id}] Register failed {resp.status_code}: {resp.text}")
-        data = resp.json()
-        tok = data.get("token")
-        if not tok:
-            raise RuntimeError(f"[{self.robot_id}] Register ok but token missing: {data}")
-        self.token = tok
-        print(f"[{self.robot_id}] Registered, token acquired")
-
-    def send_telemetry_once(self) -> None:
-        """POST /api/robots/data с телеметрией RobotBase."""
-        if not self.token:
-            self.register()
-
-        url = f"{self.api_base}/api/robots/data"
-        body = {
+    def build_telemetry(self) -> Dict:
+        """Тело RobotBase для одного тика."""
+        return {
             "robot_id": self.robot_id,
             "timestamp": iso_utc_now(),
             "location": {"zone": self.zone, "row": self.row, "shelf": self.shelf},
             "scan_results": self.generate_scan_results(),
             "battery_level": round(self.battery, 1),
             "next_checkpoint": f"{self.zone}-{self.row}-{self.shelf}",
-            # "status" — опционально, но может быть полезно
             "status": self.status,
         }
 
-        resp = self.session.post(url, json=body, headers=self.headers(), timeout=10)
+    def encode_compact(
+        self,
+        body: Dict,
+        *,
+        seq: Optional[int] = None,
+        include_robot_id: bool = True,
+        idempotency_key: Optional[str] = None,
+    ) -> bytes:
+        """
+        Компактный msgpack-кадр (формат app/schemas/robot_compact.py). Имя SKU уходит,
+        пока сервер не подтвердил кадр с ним (confirm_products).
+        """
+        scans = []
+        for s in body["scan_results"]:
+            item = [s["product_id"], s["quantity"], STATUS_CODES.get(s["status"], s["status"])]
+            if s["product_id"] not in self.known_products:
+                item.append(s["product_name"])
+            scans.append(item)
+        loc = body["location"]
+        frame = [
+            body["robot_id"] if include_robot_id else None,
+            datetime.now(timezone.utc),
+            loc["zone"], loc["row"], loc["shelf"],
+            body["battery_level"], body["next_checkpoint"], body["status"],
+            scans,
+        ]
+        if seq is not None or idempotency_key:
+            frame.append(seq)
+        if idempotency_key:
+            frame.append(idempotency_key)
+        return msgpack.packb(frame, datetime=True)
 
-        if resp.status_code == 401:
-            # токен просрочен/неверен — пере-регистрация
-            print(f"[{self.robot_id}] 401 Unauthorized, re-registering...")
-            self.token = None
-            self.register()
-            resp = self.session.post(url, json=body, headers=self.headers(), timeout=10)
+    def confirm_products(self, body: Dict) -> None:
+        """Кадр принят (200 / ack) — имена его SKU сервер получил, дальше их не шлём."""
+        self.known_products.update(s["product_id"] for s in body["scan_results"])
 
-        if resp.status_code != 200:
-            raise RuntimeError(f"[{self.robot_id}] Telemetry failed {resp.status_code}: {resp.text}")
 
-        print(f"[{self.robot_id}] Telemetry OK")
+# ============ Парк ============
 
-    def run_forever(self) -> None:
-        """Основной цикл с экспоненциальным бэкоффом при сетевых ошибках."""
-        backoff = 1.0
+@dataclass
+class FleetConfig:
+    api_base: str = "http://backend:8000"
+    robots: int = 5
+    interval: float = 10.0
+    duration: float = 0.0               # 0 — бесконечно
+    transport: str = "http"             # http | ws
+    encoding: str = "json"              # json | msgpack
+    profile: str = "constant"
+    profile_args: Sequence[float] = ()
+    poisson: bool = False
+    layout: WarehouseLayout = field(default_factory=WarehouseLayout)
+    products: int = 5
+    scan_dist: str = "uniform"
+    zipf_s: float = 1.1
+    scans_min: int = 1
+    scans_max: int = 3
+    connections: int = 200              # размер пула httpx
+    retries: int = 2                    # повторов кадра на 502/503/504 и сетевые ошибки
+    retry_backoff: float = 0.2          # пауза перед первым повтором, дальше x2
+    reply_timeout: float = 30.0         # ожидание ack/error на WS-кадр, сек
+    register_concurrency: int = 50
+    report_every: float = 10.0
+    seed: int = 42
+    robot_prefix: str = "RB"
+    quiet: bool = False
+
+
+class Fleet:
+    def __init__(self, config: FleetConfig, client: Optional[httpx.AsyncClient] = None):
+        self.config = config
+        self.stats = FleetStats()
+        self._own_client = client is None
+        self.client = client or httpx.AsyncClient(
+            base_url=config.api_base.rstrip("/"),
+            timeout=30.0,
+            limits=httpx.Limits(
+                max_connections=config.connections,
+                max_keepalive_connections=config.connections,
+            ),
+        )
+        catalog = make_catalog(config.products)
+        scans = ScanDistribution(
+            catalog, config.scan_dist, config.zipf_s, config.scans_min, config.scans_max
+        )
+        width = max(3, len(str(config.robots)))
+        self.robots = [
+            VirtualRobot(f"{config.robot_prefix}-{i:0{width}d}", config.layout, scans, seed=config.seed + i)
+            for i in range(1, config.robots + 1)
+        ]
+        self.rate = make_profile(config.profile, config.profile_args, config.duration)
+        # префикс ключей идемпотентности: seq роботов начинается с 1 в каждом прогоне
+        self.run_id = uuid.uuid4().hex[:12]
+        self._stop = asyncio.Event()
+
+        if config.transport == "ws" and websockets is None:
+            raise RuntimeError("transport=ws requires the 'websockets' package")
+        if config.encoding == "msgpack" and msgpack is None:
+            raise RuntimeError("encoding=msgpack requires the 'msgpack' package")
+
+    def _log(self, msg: str) -> None:
+        if not self.config.quiet:
+            print(msg, flush=True)
+
+    # ---------- регистрация ----------
+
+    async def register(self, robot: VirtualRobot) -> None:
+        """POST /api/robots/register -> получить токен."""
+        payload = {
+            "robot_id": robot.robot_id,
+            "zone": robot.zone,
+            "row": robot.row,
+            "shelf": robot.shelf,
+            "battery_level": round(robot.battery, 1),
+            "status": robot.status,
+        }
+        resp = await self.client.post("/api/robots/register", json=payload)
+        if resp.status_code not in (200, 201):
+            raise RuntimeError(f"[{robot.robot_id}] Register failed {resp.status_code}: {resp.text}")
+        robot.token = resp.json().get("token")
+        if not robot.token:
+            raise RuntimeError(f"[{robot.robot_id}] Register ok but token missing")
+
+    async def register_all(self) -> None:
+        sem = asyncio.Semaphore(self.config.register_concurrency)
+
+        async def one(robot: VirtualRobot) -> None:
+            async with sem:
+                await self.register(robot)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(r) for r in self.robots))
+        self._log(f"Registered {len(self.robots)} robots in {time.perf_counter() - t0:.1f}s")
+
+    # ---------- расписание тиков ----------
+
+    def _next_delay(self, robot: VirtualRobot, elapsed: float) -> float:
+        rate = max(self.rate(elapsed), 1e-6)
+        interval = self.config.interval / rate
+        if self.config.poisson:
+            return robot.rnd.expovariate(1.0 / interval)
+        return interval
+
+    async def _ticks(self, robot: VirtualRobot):
+        """
+        Открытая модель нагрузки: моменты тиков не зависят от времени ответа сервера.
+        Отдаёт запланированный момент (perf_counter) очередного тика.
+        """
+        start = self.stats.started
+        # размазываем первый тик по интервалу, чтобы не было синхронного залпа
+        scheduled = time.perf_counter() + robot.rnd.uniform(0, self.config.interval)
+        while not self._stop.is_set():
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=delay)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+            yield scheduled
+            scheduled += self._next_delay(robot, scheduled - start)
+            # сервер ответил 429: тики до Retry-After пропускаем, а не шлём залпом потом
+            while scheduled < robot.not_before:
+                self.stats.throttled += 1
+                scheduled += self._next_delay(robot, scheduled - start)
+
+    # ---------- транспорт HTTP ----------
+
+    async def _post_frame(self, robot: VirtualRobot, content: bytes, headers: Dict[str, str]) -> Optional[httpx.Response]:
+        """
+        POST кадра с повторами: 502/503/504 и сетевые ошибки — до config.retries раз
+        с экспоненциальной паузой, 401 — пере-регистрация и одна переотправка.
+        Повторы безопасны: Idempotency-Key в headers тот же, сервер не запишет кадр дважды.
+        None — кадр так и не доставлен (ошибка уже учтена в stats).
+        """
+        attempt = 0
+        reregistered = False
         while True:
             try:
-                self.send_telemetry_once()
-                self.step_location()
-                backoff = 1.0
-                time.sleep(self.update_interval)
-            except requests.exceptions.RequestException as e:
-                print(f"[{self.robot_id}] Network error: {e}")
-                time.sleep(backoff)
-                backoff = min(backoff * 2, 30.0)
+                resp = await self.client.post("/api/robots/data", content=content, headers=headers)
+            except httpx.HTTPError as e:
+                self.stats.error(type(e).__name__)
+                if not isinstance(e, httpx.TransportError) or attempt >= self.config.retries:
+                    return None
+            else:
+                if resp.status_code == 401 and not reregistered:
+                    # токен просрочен/неверен — пере-регистрация и тот же кадр ещё раз
+                    self.stats.error("http_401")
+                    try:
+                        await self.register(robot)
+                    except Exception:
+                        self.stats.error("register_failed")
+                        return None
+                    headers["Authorization"] = f"Bearer {robot.token}"
+                    reregistered = True
+                    self.stats.retries += 1
+                    continue
+                if resp.status_code not in RETRY_STATUSES or attempt >= self.config.retries:
+                    return resp
+                self.stats.error(f"http_{resp.status_code}")
+            await asyncio.sleep(self.config.retry_backoff * 2 ** attempt)
+            attempt += 1
+            self.stats.retries += 1
+
+    async def _run_http(self, robot: VirtualRobot) -> None:
+        async for scheduled in self._ticks(robot):
+            robot.seq += 1
+            body = robot.build_telemetry()
+            headers = {
+                "Authorization": f"Bearer {robot.token}",
+                "Idempotency-Key": f"{self.run_id}-{robot.seq}",
+            }
+            if self.config.encoding == "msgpack":
+                content = robot.encode_compact(body)
+                headers["Content-Type"] = MSGPACK_MEDIA_TYPE
+            else:
+                content = json.dumps(body).encode()
+                headers["Content-Type"] = "application/json"
+
+            sent = time.perf_counter()
+            resp = await self._post_frame(robot, content, headers)
+            if resp is None:
+                continue
+            done = time.perf_counter()
+
+            if resp.status_code == 429:
+                self.stats.error("http_429")
+                robot.not_before = done + retry_after_seconds(resp.headers.get("Retry-After"))
+                continue
+            if resp.status_code != 200:
+                self.stats.error(f"http_{resp.status_code}")
+                continue
+            if (resp.json().get("result") or {}).get("duplicate"):
+                self.stats.duplicates += 1
+            robot.confirm_products(body)
+            self.stats.ok(len(body["scan_results"]), len(content), (done - sent) * 1e3, (done - scheduled) * 1e3)
+            robot.step_location()
+
+    # ---------- транспорт WebSocket ----------
+
+    def _ws_url(self) -> str:
+        base = self.config.api_base.rstrip("/")
+        base = base.replace("https://", "wss://", 1).replace("http://", "ws://", 1)
+        return f"{base}/ws/robots"
+
+    async def _run_ws(self, robot: VirtualRobot) -> None:
+        backoff = 1.0
+        ticks = self._ticks(robot)
+        while not self._stop.is_set():
+            try:
+                async with websockets.connect(
+                    self._ws_url(),
+                    additional_headers={"Authorization": f"Bearer {robot.token}"},
+                    open_timeout=30,
+                    max_queue=None,
+                ) as ws:
+                    backoff = 1.0
+                    async for scheduled in ticks:
+                        robot.seq += 1
+                        body = robot.build_telemetry()
+                        if self.config.encoding == "msgpack":
+                            message = robot.encode_compact(
+                                body, seq=robot.seq, include_robot_id=False,
+                                idempotency_key=f"{self.run_id}-{robot.seq}",
+                            )
+                        else:
+                            body.pop("robot_id")  # сервер берёт robot_id из токена
+                            message = json.dumps({
+                                **body, "seq": robot.seq, "idempotency_key": f"{self.run_id}-{robot.seq}",
+                            })
+
+                        sent = time.perf_counter()
+                        await ws.send(message)
+                        try:
+                            reply = await self._ws_reply(ws, robot.seq)
+                        except asyncio.TimeoutError:
+                            # ответа нет — кадр считаем потерянным, робот не висит до конца прогона
+                            self.stats.error("ws_timeout")
+                            continue
+                        done = time.perf_counter()
+
+                        if reply.get("type") != "ack":
+                            if reply.get("retry_after") is not None:
+                                self.stats.error("ws_rate_limited")
+                                robot.not_before = done + retry_after_seconds(reply["retry_after"])
+                            else:
+                                self.stats.error("ws_rejected")
+                            continue
+                        robot.confirm_products(body)
+                        size = len(message) if isinstance(message, bytes) else len(message.encode())
+                        self.stats.ok(len(body["scan_results"]), size, (done - sent) * 1e3, (done - scheduled) * 1e3)
+                        robot.step_location()
+                    return
             except Exception as e:
-                print(f"[{self.robot_id}] Error: {e}")
-                time.sleep(backoff)
+                if self._stop.is_set():
+                    return
+                self.stats.error(f"ws_{type(e).__name__}")
+                await asyncio.sleep(backoff)
                 backoff = min(backoff * 2, 30.0)
 
+    async def _ws_reply(self, ws, seq: int) -> Dict:
+        """
+        Ответ сервера на только что отправленный кадр. Ошибка с seq=null — ответ на
+        сообщение, которое сервер не разобрал (битый JSON/msgpack), т.е. на этот же кадр;
+        ack на кадры, чей таймаут уже вышел, пропускаются. Нет ответа за
+        config.reply_timeout — asyncio.TimeoutError.
+        """
+        deadline = time.perf_counter() + self.config.reply_timeout
+        while True:
+            timeout = max(deadline - time.perf_counter(), 0.0)
+            reply = json.loads(await asyncio.wait_for(ws.recv(), timeout=timeout))
+            if reply.get("seq") == seq or (reply.get("seq") is None and reply.get("type") == "error"):
+                return reply
+
+    # ---------- прогон ----------
+
+    async def _reporter(self) -> None:
+        last_packets, last_t = 0, time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.config.report_every)
+                return
+            except asyncio.TimeoutError:
+                pass
+            now = time.perf_counter()
+            fresh = self.stats.packets - last_packets
+            recent = sorted(self.stats.e2e_ms[-fresh:]) if fresh else []
+            self._log(
+                f"[{now - self.stats.started:7.1f}s] "
+                f"{(self.stats.packets - last_packets) / (now - last_t):8.1f} pkt/s  "
+                f"rate x{self.rate(now - self.stats.started):.2f}  "
+                f"e2e p50={percentile(recent, 50):.1f}ms p99={percentile(recent, 99):.1f}ms  "
+                f"errors={sum(self.stats.errors.values())}"
+            )
+            last_packets, last_t = self.stats.packets, now
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    async def run(self) -> Dict:
+        try:
+            await self.register_all()
+            self.stats = FleetStats()
+            runner = self._run_ws if self.config.transport == "ws" else self._run_http
+            tasks = [asyncio.create_task(runner(r)) for r in self.robots]
+            reporter = asyncio.create_task(self._reporter())
+            if self.config.duration:
+                await asyncio.sleep(self.config.duration)
+                self.stop()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            reporter.cancel()
+            await asyncio.gather(reporter, return_exceptions=True)
+            return self.stats.summary()
+        finally:
+            if self._own_client:
+                await self.client.aclose()
+
+
+# ============ CLI ============
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    env = os.getenv
+    parser = argparse.ArgumentParser(description="Async robot fleet simulator / load generator")
+    parser.add_argument("--api", default=env("API_URL", "http://backend:8000").strip())
+    parser.add_argument("--robots", type=int, default=int(env("ROBOTS_COUNT", "5")))
+    parser.add_argument("--interval", type=float, default=float(env("UPDATE_INTERVAL", "10")),
+                        help="базовый интервал тиков робота, сек")
+    parser.add_argument("--duration", type=float, default=float(env("DURATION", "0")),
+                        help="длительность прогона, сек (0 — бесконечно)")
+    parser.add_argument("--transport", choices=("http", "ws"), default=env("TRANSPORT", "http").lower())
+    parser.add_argument("--encoding", choices=("json", "msgpack"), default=env("ENCODING", "json").lower())
+    parser.add_argument("--profile", choices=("constant", "ramp", "step", "sine"), default=env("PROFILE", "constant"))
+    parser.add_argument("--profile-args", default=env("PROFILE_ARGS", ""),
+                        help="параметры профиля через запятую, напр. 0.1,2 для ramp")
+    parser.add_argument("--poisson", action="store_true", help="экспоненциальные интервалы между тиками")
+    parser.add_argument("--zones", default=env("ZONES", "A-E"))
+    parser.add_argument("--rows", type=int, default=int(env("ROWS", "20")))
+    parser.add_argument("--shelves", type=int, default=int(env("SHELVES", "10")))
+    parser.add_argument("--products", type=int, default=int(env("PRODUCTS", "5")))
+    parser.add_argument("--scan-dist", choices=("uniform", "zipf"), default=env("SCAN_DIST", "uniform"))
+    parser.add_argument("--zipf-s", type=float, default=1.1)
+    parser.add_argument("--scans-min", type=int, default=1)
+    parser.add_argument("--scans-max", type=int, default=3)
+    parser.add_argument("--connections", type=int, default=200)
+    parser.add_argument("--retries", type=int, default=int(env("RETRIES", "2")),
+                        help="повторов кадра на 502/503/504 и сетевые ошибки (с тем же Idempotency-Key)")
+    parser.add_argument("--reply-timeout", type=float, default=30.0,
+                        help="сколько ждать ack/error на WS-кадр, сек (дальше — ошибка ws_timeout)")
+    parser.add_argument("--report-every", type=float, default=10.0)
+    parser.add_argument("--report", help="куда сохранить итоговый JSON")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def config_from_args(args: argparse.Namespace) -> FleetConfig:
+    return FleetConfig(
+        api_base=args.api.rstrip("/"),
+        robots=args.robots,
+        interval=args.interval,
+        duration=args.duration,
+        transport=args.transport,
+        encoding=args.encoding,
+        profile=args.profile,
+        profile_args=[float(x) for x in args.profile_args.split(",") if x.strip()],
+        poisson=args.poisson,
+        layout=WarehouseLayout(WarehouseLayout.parse_zones(args.zones), args.rows, args.shelves),
+        products=args.products,
+        scan_dist=args.scan_dist,
+        zipf_s=args.zipf_s,
+        scans_min=args.scans_min,
+        scans_max=args.scans_max,
+        connections=args.connections,
+        retries=args.retries,
+        reply_timeout=args.reply_timeout,
+        report_every=args.report_every,
+        seed=args.seed,
+    )
+
+
+async def amain(argv: Optional[Sequence[str]] = None) -> Dict:
+    args = parse_args(argv)
+    fleet = Fleet(config_from_args(args))
+    # Ctrl+C / docker stop — мягкая остановка с итоговым отчётом
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, fleet.stop)
+        except (NotImplementedError, RuntimeError):
+            pass
+    summary = await fleet.run()
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    return summary
+
 
 def main():
-    api_url = os.getenv("API_URL", "http://backend:8000").strip().rstrip("/")
-    robots_count = int(os.getenv("ROBOTS_COUNT", "5"))
-    update_interval = float(os.getenv("UPDATE_INTERVAL", "10"))
-
-    threads: List[threading.Thread] = []
-    for i in range(1, robots_count + 1):
-        rid = f"RB-{i:03d}"
-        emu = RobotEmulator(robot_id=rid, api_base=api_url, update_interval=update_interval)
-        t = threading.Thread(target=emu.run_forever, name=f"robot-{rid}", daemon=True)
-        t.start()
-        threads.append(t)
-
-    # держим главный поток
     try:
-        while True:
-            time.sleep(60)
+        asyncio.run(amain())
     except KeyboardInterrupt:
         print("Shutting down robot emulator")
 
@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+from dependency_injector import providers
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock
+
+from app.repo.inventory import EXPORT_COLUMNS
+from app.services.export_service import ExportService
+
+
+def _row(i: int) -> tuple:
+    ts = datetime(2025, 10, 1, 12, 0, i % 60)
+    return (i, "RB-001", f"TEL-{i % 7}", 10 + i, "A", 1, 2, "OK" if i % 2 else None, ts, ts)
+
+
+class _FakeRepo:
+    def __init__(self, rows: int, batch: int):
+        self.rows = [_row(i) for i in range(1, rows + 1)]
+        self.batch = batch
+        self.filters = None
+        self.session = MagicMock(close=AsyncMock())
+
+    async def stream_rows(self, **filters):
+        self.filters = filters
+        for i in range(0, len(self.rows), self.batch):
+            yield self.rows[i:i + self.batch]
+
+
+def _export(repo: _FakeRepo, query: str):
+    from main import app
+
+    with app.container.export_service.override(providers.Object(ExportService(repo))):
+        return TestClient(app).get(f"/api/export/history?{query}")
+
+
+def test_ndjson_stream_with_filters():
+    repo = _FakeRepo(rows=25, batch=10)
+
+    response = _export(repo, "format=ndjson&zone=A&status=ok&batch_size=100")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 25
+    assert lines[0]["scanned_at"] == "2025-10-01T12:00:01"
+    assert list(lines[0]) == list(EXPORT_COLUMNS)
+    assert repo.filters["zones"] == ["A"] and repo.filters["statuses"] == ["OK"]
+    repo.session.close.assert_awaited_once()
+
+
+def test_csv_stream_has_header_and_all_rows():
+    repo = _FakeRepo(rows=12, batch=5)
+
+    response = _export(repo, "format=csv")
+
+    assert response.status_code == 200
+    assert 'filename="inventory_history.csv"' in response.headers["content-disposition"]
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == list(EXPORT_COLUMNS)
+    assert len(rows) == 13
+    assert rows[2][7] == ""  # NULL status
+
+
+def test_arrow_stream_is_readable_ipc():
+    pa = pytest.importorskip("pyarrow")
+    repo = _FakeRepo(rows=30, batch=10)
+
+    response = _export(repo, "format=arrow")
+
+    assert response.status_code == 200
+    reader = pa.ipc.open_stream(response.content)
+    batches = list(reader)
+    assert [b.num_rows for b in batches] == [10, 10, 10]
+    table = pa.Table.from_batches(batches)
+    assert table.column_names == list(EXPORT_COLUMNS)
+    assert table.column("id").to_pylist() == list(range(1, 31))
+
+
+def test_unknown_format_rejected():
+    response = _export(_FakeRepo(rows=1, batch=1), "format=xml")
+    assert response.status_code == 422
@@ -0,0 +1,91 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from dependency_injector import providers
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock
+
+from app.api import health
+from app.services import cache as cache_module
+from app.services.cache import CacheService
+
+
+class _FakeEngine:
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+
+    @asynccontextmanager
+    async def connect(self):
+        if self.fail:
+            raise ConnectionError("db down")
+        await asyncio.sleep(self.delay)
+        yield MagicMock(execute=AsyncMock())
+
+
+def _cache(rtt_ms):
+    cache = CacheService()
+    cache.ping = AsyncMock(return_value=rtt_ms)
+    return cache
+
+
+def _get_ready(engine, cache):
+    from main import app
+
+    with app.container.engine.override(providers.Object(engine)), \
+            app.container.cache_service.override(providers.Object(cache)):
+        return TestClient(app).get("/ready")
+
+
+def test_ready_when_db_and_redis_fast(monkeypatch):
+    monkeypatch.setattr(health.settings, "REDIS_URL", "redis://redis:6379/0")
+
+    response = _get_ready(_FakeEngine(), _cache(1.5))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ready"
+    assert body["checks"]["redis"]["rtt_ms"] == 1.5
+
+
+def test_not_ready_when_db_slow_or_redis_down(monkeypatch):
+    monkeypatch.setattr(health.settings, "REDIS_URL", "redis://redis:6379/0")
+    monkeypatch.setattr(health.settings, "READY_DB_MAX_RTT_MS", 5.0)
+
+    response = _get_ready(_FakeEngine(delay=0.05), _cache(None))
+
+    assert response.status_code == 503
+    checks = response.json()["checks"]
+    assert checks["db"]["ok"] is False and checks["db"]["rtt_ms"] >= 5.0
+    assert checks["redis"] == {"ok": False, "rtt_ms": None, "detail": "disconnected"}
+
+    response = _get_ready(_FakeEngine(fail=True), _cache(1.0))
+    assert response.status_code == 503
+    assert response.json()["checks"]["db"]["detail"] == "db down"
+
+
+@pytest.mark.asyncio
+async def test_cache_service_reconnects_in_background(monkeypatch):
+    """Redis недоступен на старте -> кеш выключен, но фоновое переподключение его возвращает"""
+    monkeypatch.setattr(cache_module.settings, "REDIS_URL", "redis://redis:6379/0")
+    monkeypatch.setattr(cache_module.settings, "REDIS_RECONNECT_MIN_SECONDS", 0.01)
+    monkeypatch.setattr(cache_module.settings, "REDIS_RECONNECT_MAX_SECONDS", 0.02)
+
+    client = MagicMock()
+    client.ping = AsyncMock(side_effect=[ConnectionError("refused")] * 3 + [True])
+    client.close = AsyncMock()
+    monkeypatch.setattr(cache_module.redis, "from_url", lambda *a, **kw: client)
+
+    cache = CacheService()
+    await cache.connect()
+    assert cache.redis_client is None
+
+    for _ in range(100):
+        if cache.redis_client is not None:
+            break
+        await asyncio.sleep(0.01)
+
+    assert cache.redis_client is client
+    assert client.ping.await_count == 4
+    await cache.disconnect()
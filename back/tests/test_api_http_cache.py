@@ -0,0 +1,120 @@
+import time
+from email.utils import formatdate
+
+from dependency_injector import providers
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock
+
+from app.schemas.dashboard import DashboardResponse, DashboardStatistics
+from app.schemas.robot import RobotsListResponse
+
+CHANGED_AT = time.time() - 60
+
+
+def _client(versions):
+    from main import app
+
+    cache = MagicMock(get_versions=AsyncMock(return_value=versions))
+    dashboard = MagicMock()
+    dashboard.get_dashboard_data = AsyncMock(return_value=DashboardResponse(
+        robots=[], recent_scans=[],
+        statistics=DashboardStatistics(
+            total_robots=0, offline_robots=0, critical_items=0, low_stock_items=0, scans_last_hour=0,
+        ),
+    ))
+    robots = MagicMock(get_all_robots=AsyncMock(return_value=RobotsListResponse(total=0, items=[])))
+    app.container.cache_service.override(providers.Object(cache))
+    app.container.dashboard_service.override(providers.Object(dashboard))
+    app.container.robot_service.override(providers.Object(robots))
+    return TestClient(app), dashboard, robots
+
+
+def _reset():
+    from main import app
+
+    for name in ("cache_service", "dashboard_service", "robot_service"):
+        getattr(app.container, name).reset_override()
+
+
+def test_dashboard_etag_roundtrip_skips_service():
+    versions = {"inventory": (5, CHANGED_AT), "robots": (9, CHANGED_AT)}
+    client, dashboard, _ = _client(versions)
+    try:
+        first = client.get("/api/dashboard/current")
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+        assert etag.startswith('W/"inventory.5.') and "-robots.9." in etag and "-t." in etag
+        assert first.headers["cache-control"] == "private, max-age=0, must-revalidate"
+        bucket_start = int(time.time() // 60 * 60)
+        assert first.headers["last-modified"] in {
+            formatdate(max(int(CHANGED_AT), start), usegmt=True) for start in (bucket_start - 60, bucket_start)
+        }
+
+        second = client.get("/api/dashboard/current", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.content == b""
+        assert second.headers["etag"] == etag
+        # версия, под которой отдан ETag, — в ключе single-flight сервиса
+        dashboard.get_dashboard_data.assert_awaited_once_with(version=etag)
+
+        by_date = client.get(
+            "/api/dashboard/current", headers={"If-Modified-Since": first.headers["last-modified"]},
+        )
+        assert by_date.status_code == 304
+    finally:
+        _reset()
+
+
+def test_dashboard_etag_expires_with_time_bucket(monkeypatch):
+    """"Сканов за час" стареет без новых данных: 304 только в пределах окна времени"""
+    now = [CHANGED_AT + 3600 * 2 + 5]
+    monkeypatch.setattr("app.core.http_cache.time.time", lambda: now[0])
+    versions = {"inventory": (5, CHANGED_AT), "robots": (9, CHANGED_AT)}
+    client, dashboard, _ = _client(versions)
+    try:
+        first = client.get("/api/dashboard/current")
+        etag, last_modified = first.headers["etag"], first.headers["last-modified"]
+
+        now[0] += 1
+        assert client.get("/api/dashboard/current", headers={"If-None-Match": etag}).status_code == 304
+
+        now[0] += 60  # версии те же, но окно сменилось
+        fresh = client.get("/api/dashboard/current", headers={"If-None-Match": etag})
+        assert fresh.status_code == 200
+        assert fresh.headers["etag"] != etag
+        by_date = client.get("/api/dashboard/current", headers={"If-Modified-Since": last_modified})
+        assert by_date.status_code == 200
+        assert dashboard.get_dashboard_data.await_count == 3
+    finally:
+        _reset()
+
+
+def test_version_bump_invalidates_etag():
+    versions = {"inventory": (5, CHANGED_AT), "robots": (9, CHANGED_AT)}
+    client, _, robots = _client(versions)
+    try:
+        etag = client.get("/api/robots/all").headers["etag"]
+        assert "inventory" not in etag  # robots/all зависит только от состояния роботов
+
+        versions["inventory"] = (6, time.time())
+        assert client.get("/api/robots/all", headers={"If-None-Match": etag}).status_code == 304
+
+        versions["robots"] = (10, time.time())
+        fresh = client.get("/api/robots/all", headers={"If-None-Match": etag})
+        assert fresh.status_code == 200
+        assert fresh.headers["etag"] != etag
+        assert "last-modified" not in fresh.headers  # изменение в текущей секунде — только ETag
+        assert robots.get_all_robots.await_count == 2
+    finally:
+        _reset()
+
+
+def test_without_redis_no_validators():
+    client, dashboard, _ = _client(None)
+    try:
+        response = client.get("/api/dashboard/current", headers={"If-None-Match": "*"})
+        assert response.status_code == 200
+        assert "etag" not in response.headers
+        dashboard.get_dashboard_data.assert_awaited_once()
+    finally:
+        _reset()
@@ -0,0 +1,117 @@
+import asyncio
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+from dependency_injector import providers
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock
+
+from app.core.admission import AdmissionController
+from app.core.exeptions import RateLimitExceededException
+from app.core.security import SecurityManager
+from app.schemas.robot import RobotRegisterResponse
+from robot_emulator.emulator import Fleet, FleetConfig
+
+
+def _robot_service():
+    service = MagicMock()
+    service.register_robot = AsyncMock(side_effect=lambda req: RobotRegisterResponse(
+        robot_id=req.robot_id, status="online", registered_at=datetime.now(timezone.utc),
+        token=SecurityManager.create_access_token(subject=req.robot_id, token_type="robot", expires_delta=None),
+        create_flag=True,
+    ))
+    service.process_robot_data = AsyncMock(side_effect=lambda r: {
+        "robot": {"robot_id": r.robot_id}, "ingested_records": len(r.scan_results), "created_new_robot": False,
+    })
+    return service
+
+
+@pytest.mark.asyncio
+async def test_slots_queue_then_reject_with_retry_after():
+    admission = AdmissionController(max_concurrent=1, max_waiting=1, queue_timeout=0.05, retry_after=3)
+    release = asyncio.Event()
+
+    async def hold():
+        async with admission.slot():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    assert admission.stats() == {"active": 1, "waiting": 1}
+
+    # очередь полна — отказ сразу, без ожидания
+    with pytest.raises(RateLimitExceededException) as exc:
+        async with admission.slot():
+            pass
+    assert exc.value.status_code == 429
+    assert exc.value.headers["Retry-After"] == "3"
+
+    # ждавший дольше queue_timeout тоже получает 429
+    with pytest.raises(RateLimitExceededException):
+        await waiter
+
+    release.set()
+    await holder
+    async with admission.slot():
+        assert admission.stats() == {"active": 1, "waiting": 0}
+
+
+def test_robot_rate_limit_is_per_robot():
+    admission = AdmissionController(robot_rate=0.5, robot_burst=2)
+
+    admission.check_rate("RB-001")
+    admission.check_rate("RB-001")
+    with pytest.raises(RateLimitExceededException) as exc:
+        admission.check_rate("RB-001")
+    assert exc.value.headers["Retry-After"] == "2"  # токен через 1 / 0.5 с
+
+    admission.check_rate("RB-002")  # соседний робот не страдает
+
+
+def test_endpoint_answers_429_before_touching_service():
+    from main import app
+
+    service = _robot_service()
+    app.container.robot_service.override(providers.Object(service))
+    app.container.ingest_admission.override(providers.Object(AdmissionController(robot_rate=1, robot_burst=1)))
+    token = SecurityManager.create_access_token(subject="RB-001", token_type="robot", expires_delta=None)
+    body = {
+        "robot_id": "RB-001", "timestamp": "2025-10-01T12:00:00Z",
+        "location": {"zone": "A", "row": 1, "shelf": 1}, "scan_results": [],
+        "battery_level": 90, "next_checkpoint": "A-1-2",
+    }
+    try:
+        client = TestClient(app)
+        headers = {"Authorization": f"Bearer {token}"}
+        assert client.post("/api/robots/data", json=body, headers=headers).status_code == 200
+        limited = client.post("/api/robots/data", json=body, headers=headers)
+        assert limited.status_code == 429
+        assert limited.headers["retry-after"] == "1"
+        service.process_robot_data.assert_awaited_once()
+    finally:
+        app.container.robot_service.reset_override()
+        app.container.ingest_admission.reset_override()
+
+
+@pytest.mark.asyncio
+async def test_emulator_honours_retry_after():
+    from main import app
+
+    service = _robot_service()
+    config = FleetConfig(
+        api_base="http://test", robots=5, interval=0.02, duration=0.5, quiet=True, report_every=60,
+    )
+    admission = AdmissionController(robot_rate=0.5, robot_burst=1)
+    with app.container.robot_service.override(providers.Object(service)), \
+            app.container.ingest_admission.override(providers.Object(admission)):
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+        summary = await Fleet(config, client=client).run()
+        await client.aclose()
+
+    # по одному кадру и одному 429 на робота, дальше робот ждёт Retry-After (2 с > duration)
+    assert summary["packets"] == 5
+    assert summary["errors"] == {"http_429": 5}
+    assert summary["throttled_ticks"] > 0
@@ -0,0 +1,69 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from structlog.testing import capture_logs
+
+from app.core import db_stats
+from app.core.db_stats import DBStatsMiddleware, install_sql_tracing, start_request_stats
+
+
+def _engine():
+    install_sql_tracing()
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+        conn.execute(text("INSERT INTO items (name) VALUES ('a'), ('b')"))
+    return engine
+
+
+def test_statements_counted_in_current_context():
+    engine = _engine()
+    stats = start_request_stats()
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT * FROM items")).all()
+        conn.execute(text("SELECT count(*) FROM items WHERE name = :n"), {"n": "a"}).scalar()
+
+    assert stats.queries == 2
+    assert stats.total_ms >= stats.slowest_ms > 0
+    assert stats.slowest_statement.startswith("SELECT")
+
+
+def test_slow_query_logged_with_params_and_plan(monkeypatch):
+    engine = _engine()
+    monkeypatch.setattr(db_stats.settings, "SQL_SLOW_QUERY_MS", 0.000001)
+    monkeypatch.setattr(db_stats.settings, "SQL_SLOW_QUERY_EXPLAIN", True)
+
+    with capture_logs() as logs, engine.connect() as conn:
+        conn.execute(text("SELECT name FROM items WHERE id = :id"), {"id": 1}).all()
+
+    [slow] = [e for e in logs if e["event"] == "db.slow_query"]
+    assert "WHERE id = ?" in slow["statement"]
+    assert slow["params"] == "(1,)"
+    assert slow["plan"]
+
+
+def test_middleware_exposes_db_cost_header():
+    engine = _engine()
+    app = FastAPI()
+
+    @app.get("/items")
+    def items():
+        with engine.connect() as conn:
+            for _ in range(3):
+                conn.execute(text("SELECT * FROM items")).all()
+        return {"ok": True}
+
+    app.add_middleware(DBStatsMiddleware, expose_header=True)
+
+    with capture_logs() as logs:
+        response = TestClient(app).get("/items")
+
+    assert response.headers["x-db-cost"].startswith("queries=3;")
+    assert response.headers["server-timing"].startswith("db;dur=")
+    [line] = [e for e in logs if e["event"] == "http.db_stats"]
+    assert line["db_queries"] == 3
+    assert line["path"] == "/items"
@@ -0,0 +1,59 @@
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from unittest.mock import AsyncMock
+
+from app.services.cache import CacheService
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_cache_service_counts_hits_misses_and_latency():
+    cache = CacheService()
+    cache.redis_client = AsyncMock()
+    cache.redis_client.get.side_effect = ['{"robot_id": "RB-001"}', None]
+
+    hits = _sample("cache_requests_total", method="get_robot_state", result="hit")
+    misses = _sample("cache_requests_total", method="get_robot_state", result="miss")
+    calls = _sample("cache_latency_seconds_count", method="get_robot_state")
+
+    assert await cache.get_robot_state("RB-001") == {"robot_id": "RB-001"}
+    assert await cache.get_robot_state("RB-002") is None
+
+    assert _sample("cache_requests_total", method="get_robot_state", result="hit") == hits + 1
+    assert _sample("cache_requests_total", method="get_robot_state", result="miss") == misses + 1
+    assert _sample("cache_latency_seconds_count", method="get_robot_state") == calls + 2
+
+
+@pytest.mark.asyncio
+async def test_cache_service_without_redis_is_unavailable():
+    cache = CacheService()
+    before = _sample("cache_requests_total", method="get_data_version", result="unavailable")
+
+    assert await cache.get_data_version() is None
+    assert _sample("cache_requests_total", method="get_data_version", result="unavailable") == before + 1
+
+
+def test_metrics_endpoint_exposes_runtime_gauges():
+    from main import app
+
+    response = TestClient(app).get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    for name in (
+        "ingest_frames_total",
+        "ingest_latency_seconds",
+        "ingest_queue_depth",
+        "cache_requests_total",
+        "ai_request_latency_seconds",
+        'ws_connections{endpoint="notifications"}',
+        'ws_send_queue_depth{endpoint="robots"}',
+        "db_pool_size",
+        "db_pool_checked_out",
+    ):
+        assert name in body
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from dependency_injector import providers
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.testclient import TestClient
+from fastapi.utils import create_model_field
+from sqlalchemy.engine import result_tuple
+from unittest.mock import AsyncMock, MagicMock
+
+from app.core.serialization import rows_to_models, dumps, model_response
+from app.db.base import InventoryHistory
+from app.repo.inventory import EXPORT_COLUMNS
+from app.services.dashboard import DashboardService
+from app.schemas.dashboard import DashboardResponse, DashboardStatistics, RobotInfo
+from app.schemas.inventory import InventoryHistoryListOut, InventoryRecordOut
+from app.schemas.robot import RobotBase
+from app.ws.connection_manager import ConnectionManager
+
+TS = datetime(2025, 10, 1, 12, 30, tzinfo=timezone.utc)
+
+
+def _record(i: int) -> InventoryRecordOut:
+    return InventoryRecordOut(
+        id=i, robot_id="RB-001", product_id="TEL-1", quantity=i, zone="A", row_number=1,
+        shelf_number=2, status="OK", scanned_at=TS, created_at=TS,
+    )
+
+
+def test_model_output_matches_fastapi_default():
+    dashboard = DashboardResponse(
+        robots=[RobotInfo(robot_id="RB-001", battery_level=55.5, last_update=TS)],
+        recent_scans=[],
+        statistics=DashboardStatistics(
+            total_robots=1, offline_robots=0, critical_items=0, low_stock_items=0, scans_last_hour=3,
+        ),
+    )
+    robot = RobotBase.model_validate({
+        "robot_id": "RB-001", "timestamp": "2025-10-01T12:30:00Z",
+        "location": {"zone": "A", "row": 1, "shelf": 2}, "scan_results": [],
+        "battery_level": 50, "next_checkpoint": "A-1-2", "status": "online",
+    })
+    for model in (dashboard, robot):
+        field = create_model_field(name="Response", type_=type(model), mode="serialization")
+        expected = JSONResponse(asyncio.run(serialize_response(field=field, response_content=model))).body
+        assert json.loads(model_response(model).body) == json.loads(expected)
+    assert b'"timestamp":"2025-10-01T12:30:00Z"' in dumps(robot)  # alias, как у FastAPI
+
+
+def test_plain_values():
+    payload = {"n": Decimal("1.5"), "ids": {3}, "at": TS, "nested": _record(1)}
+    out = json.loads(dumps(payload))
+    assert out["n"] == 1.5 and out["ids"] == [3]
+    assert out["at"].startswith("2025-10-01T12:30:00")
+    assert out["nested"]["id"] == 1
+
+
+def test_rows_to_models_accepts_any_row_shape():
+    values = (7, "RB-001", "TEL-1", 3, "A", 1, None, "CRITICAL", TS, TS)
+    row = result_tuple(EXPORT_COLUMNS)(values)
+    expected = InventoryRecordOut.model_validate(dict(zip(EXPORT_COLUMNS, values)))
+
+    for source in (row, dict(zip(EXPORT_COLUMNS, values)), InventoryHistory(**dict(zip(EXPORT_COLUMNS, values)))):
+        [built] = rows_to_models(InventoryRecordOut, [source])
+        assert dumps(built) == dumps(expected)
+
+
+@pytest.mark.asyncio
+async def test_dashboard_built_from_core_rows():
+    robot_row = result_tuple(("robot_id", "status", "battery_level", "last_update", "zone", "row", "shelf"))(
+        ("RB-001", "online", 80, TS, "A", 3, 4),
+    )
+    scan_row = result_tuple((
+        "id", "robot_id", "product_id", "quantity", "status", "zone", "row_number", "shelf_number", "scanned_at",
+    ))((1, "RB-001", "TEL-1", 5, "CRITICAL", "A", 3, 4, TS))
+
+    async def execute(query):
+        result = MagicMock()
+        columns = [c.name for c in query.selected_columns]
+        result.all.return_value = [robot_row] if "battery_level" in columns else [scan_row]
+        result.scalar_one.return_value = 1
+        return result
+
+    robot_repo, history_repo = MagicMock(), MagicMock()
+    robot_repo.session.execute = execute
+    history_repo.session.execute = execute
+    svc = DashboardService(robot_repo=robot_repo, history_repo=history_repo)
+    data = await svc._get_all_robots()
+    scans = await svc._get_recent_scans()
+
+    assert json.loads(dumps(data[0]))["battery_level"] == 80.0
+    assert scans[0].scanned_at == TS and scans[0].row_number == 3
+
+
+@pytest.mark.asyncio
+async def test_broadcast_encodes_once():
+    manager = ConnectionManager()
+    sockets = [MagicMock(send_text=AsyncMock()) for _ in range(3)]
+    manager.active_connections = {"u1": {sockets[0], sockets[1]}, "u2": {sockets[2]}}
+
+    await manager.broadcast({"type": "alert", "at": TS})
+
+    texts = {ws.send_text.await_args.args[0] for ws in sockets}
+    assert len(texts) == 1
+    assert json.loads(texts.pop())["type"] == "alert"
+
+
+def test_history_endpoint_keeps_conditional_headers():
+    from main import app
+
+    history = MagicMock()
+    history.get_history = AsyncMock(return_value=InventoryHistoryListOut(
+        items=[_record(i) for i in range(3)], total=3, limit=50, offset=0,
+    ))
+    cache = MagicMock(get_versions=AsyncMock(return_value={
+        "inventory": (4, time.time() - 60), "robots": (1, time.time() - 60),
+    }))
+    app.container.history_service.override(providers.Object(history))
+    app.container.cache_service.override(providers.Object(cache))
+    try:
+        response = TestClient(app).get("/api/inventory/history")
+        assert response.status_code == 200
+        assert response.headers["etag"].startswith('W/"inventory.4.')
+        assert response.headers["content-type"] == "application/json"
+        body = response.json()
+        assert body["total"] == 3 and body["pagination"] == {"limit": 50, "offset": 0}
+        assert body["items"][0]["scanned_at"] == "2025-10-01T12:30:00Z"
+    finally:
+        app.container.history_service.reset_override()
+        app.container.cache_service.reset_override()
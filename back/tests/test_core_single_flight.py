@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.core.single_flight import SingleFlight, single_flight
+from app.services.dashboard import DashboardService
+
+
+class _Service:
+    group = SingleFlight()
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    @single_flight("test.read", group=group)
+    async def read(self, *, zones=None):
+        self.calls += 1
+        await self.release.wait()
+        if zones == ["boom"]:
+            raise RuntimeError("boom")
+        return {"zones": zones, "call": self.calls}
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_calls_share_one_computation():
+    svc = _Service()
+    callers = [asyncio.create_task(svc.read(zones=["A"])) for _ in range(20)]
+    other = asyncio.create_task(svc.read(zones=["B"]))
+    await asyncio.sleep(0)
+    svc.release.set()
+
+    results = await asyncio.gather(*callers)
+
+    assert svc.calls == 2  # A и B
+    assert all(r is results[0] for r in results)
+    assert (await other)["zones"] == ["B"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_followers():
+    svc = _Service()
+    leader = asyncio.create_task(svc.read(zones=["A"]))
+    follower = asyncio.create_task(svc.read(zones=["A"]))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    svc.release.set()
+
+    assert (await follower)["call"] == 1
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter_and_are_not_cached():
+    svc = _Service()
+    svc.release.set()
+
+    results = await asyncio.gather(
+        svc.read(zones=["boom"]), svc.read(zones=["boom"]), return_exceptions=True,
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    with pytest.raises(RuntimeError):
+        await svc.read(zones=["boom"])
+    assert svc.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_ttl_cache_serves_sequential_calls():
+    group = SingleFlight(ttl=60)
+    fn = AsyncMock(return_value=42)
+
+    assert await group.do("x", ("x", 1), fn) == 42
+    assert await group.do("x", ("x", 1), fn) == 42
+    fn.assert_awaited_once()
+
+    group.clear()
+    await group.do("x", ("x", 1), fn)
+    assert fn.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_dashboard_burst_runs_queries_once():
+    calls = 0
+
+    async def execute(_query):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        result = MagicMock()
+        result.all.return_value = []
+        result.scalar_one.return_value = 0
+        return result
+
+    def make_service():
+        robot_repo, history_repo = MagicMock(), MagicMock()
+        robot_repo.session.execute = execute
+        history_repo.session.execute = execute
+        return DashboardService(robot_repo=robot_repo, history_repo=history_repo)
+
+    responses = await asyncio.gather(*(make_service().get_dashboard_data() for _ in range(50)))
+
+    assert calls == 7  # один набор запросов дашборда на 50 запросов
+    assert all(r is responses[0] for r in responses)
+
+
+@pytest.mark.asyncio
+async def test_dashboard_version_splits_inflight_and_cached_results(monkeypatch):
+    """Вызов с новой версией данных не получает результат, начатый/закешированный под старой"""
+    group = SingleFlight(ttl=60)
+    monkeypatch.setattr("app.core.single_flight.reads", group)
+    calls = 0
+
+    async def execute(_query):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        result = MagicMock()
+        result.all.return_value = []
+        result.scalar_one.return_value = calls
+        return result
+
+    def make_service():
+        robot_repo, history_repo = MagicMock(), MagicMock()
+        robot_repo.session.execute = execute
+        history_repo.session.execute = execute
+        return DashboardService(robot_repo=robot_repo, history_repo=history_repo)
+
+    old, new = await asyncio.gather(
+        make_service().get_dashboard_data(version='W/"inventory.5"'),
+        make_service().get_dashboard_data(version='W/"inventory.6"'),
+    )
+    assert old is not new
+    assert calls == 14  # два набора запросов — по одному на версию
+
+    cached = await make_service().get_dashboard_data(version='W/"inventory.6"')
+    assert cached is new and calls == 14
@@ -0,0 +1,60 @@
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import Uuid, create_engine
+from unittest.mock import AsyncMock
+
+from app.db import migrations
+from app.db.base import Base
+
+
+def test_schema_revision_is_alembic_head():
+    script = ScriptDirectory.from_config(Config(str(migrations.ALEMBIC_INI)))
+    assert script.get_current_head() == migrations.SCHEMA_REVISION
+
+
+def _compare_type(context, inspected_column, metadata_column, inspected_type, metadata_type):
+    # SQLite отражает UUID как NUMERIC — это особенность диалекта, не расхождение
+    if isinstance(metadata_type, Uuid):
+        return False
+    return None
+
+
+def test_migrations_produce_model_schema():
+    """upgrade head на пустой БД даёт ту же схему, что описана в моделях"""
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        migrations._upgrade_sync(conn)
+        context = MigrationContext.configure(conn, opts={"compare_type": _compare_type})
+        diff = compare_metadata(context, Base.metadata)
+        revision = MigrationContext.configure(conn).get_current_revision()
+
+    assert diff == []
+    assert revision == migrations.SCHEMA_REVISION
+
+
+@pytest.mark.asyncio
+async def test_outdated_schema_fails_warns_or_migrates(monkeypatch):
+    monkeypatch.setattr(migrations, "current_revision", AsyncMock(return_value=None))
+    upgrade = AsyncMock()
+    monkeypatch.setattr(migrations, "upgrade_to_head", upgrade)
+
+    with pytest.raises(migrations.SchemaOutdatedError):
+        await migrations.ensure_schema_current(object(), mode="fail", auto_migrate=False)
+
+    await migrations.ensure_schema_current(object(), mode="warn", auto_migrate=False)
+    upgrade.assert_not_awaited()
+
+    await migrations.ensure_schema_current(object(), mode="fail", auto_migrate=True)
+    upgrade.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_current_schema_is_a_single_lookup(monkeypatch):
+    current = AsyncMock(return_value=migrations.SCHEMA_REVISION)
+    monkeypatch.setattr(migrations, "current_revision", current)
+
+    await migrations.ensure_schema_current(object(), mode="fail", auto_migrate=False)
+    current.assert_awaited_once()
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import random
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from dependency_injector import providers
+from unittest.mock import AsyncMock, MagicMock
+
+from app.core.security import SecurityManager
+from app.schemas import robot_compact
+from app.schemas.robot import RobotRegisterResponse
+from robot_emulator import emulator
+from robot_emulator.emulator import (
+    Fleet, FleetConfig, ScanDistribution, VirtualRobot, WarehouseLayout, make_catalog, make_profile,
+)
+
+
+def test_profiles():
+    ramp = make_profile("ramp", [0.5, 2.0], duration=10)
+    assert ramp(0) == 0.5 and ramp(5) == pytest.approx(1.25) and ramp(60) == 2.0
+
+    step = make_profile("step", [1, 3, 5], duration=10)
+    assert step(4.9) == 1 and step(5) == 3
+
+    with pytest.raises(ValueError):
+        make_profile("spiky", [], duration=10)
+
+
+def test_zipf_distribution_prefers_hot_skus():
+    """zipf: первый SKU каталога встречается заметно чаще последнего"""
+    catalog = make_catalog(50)
+    dist = ScanDistribution(catalog, "zipf", zipf_s=1.2, scans_min=1, scans_max=1)
+    rnd = random.Random(1)
+    counts = {}
+    for _ in range(5000):
+        [p] = dist.pick(rnd)
+        counts[p.id] = counts.get(p.id, 0) + 1
+
+    assert counts[catalog[0].id] > 10 * counts.get(catalog[-1].id, 1)
+
+
+def test_compact_encoding_matches_server_codec():
+    """Кадр эмулятора разбирается серверным декодером; имя товара — до подтверждения кадра"""
+    layout = WarehouseLayout(["A", "B"], rows=3, shelves=2)
+    robot = VirtualRobot("RB-001", layout, ScanDistribution(make_catalog(3), scans_min=3), seed=1)
+
+    body = robot.build_telemetry()
+    [first] = robot_compact.decode_message(robot.encode_compact(body))
+    # кадр не подтверждён — имена уходят снова
+    [retry] = robot_compact.decode_message(robot.encode_compact(body))
+    robot.confirm_products(body)
+    [second] = robot_compact.decode_message(robot.encode_compact(body))
+
+    assert first.robot_id == "RB-001"
+    assert first.location.zone in ("A", "B")
+    assert [s.quantity for s in first.scan_results] == [s["quantity"] for s in body["scan_results"]]
+    assert all(s.product_name for s in first.scan_results)
+    assert all(s.product_name for s in retry.scan_results)
+    assert not any(s.product_name for s in second.scan_results)
+
+    (seq, keyed), = robot_compact.decode_frames_with_seq(
+        robot.encode_compact(body, seq=5, include_robot_id=False, idempotency_key="run-5"), "RB-001",
+    )
+    assert (seq, keyed.idempotency_key) == (5, "run-5")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("encoding", ["json", "msgpack"])
+async def test_fleet_http_run_reports_throughput(encoding):
+    """Короткий прогон парка против приложения в памяти"""
+    from main import app
+
+    service = MagicMock()
+    service.register_robot = AsyncMock(side_effect=lambda req: RobotRegisterResponse(
+        robot_id=req.robot_id, status="online", registered_at=datetime.now(timezone.utc),
+        token=SecurityManager.create_access_token(subject=req.robot_id, token_type="robot", expires_delta=None),
+        create_flag=True,
+    ))
+    service.process_robot_data = AsyncMock(side_effect=lambda r: {
+        "robot": {"robot_id": r.robot_id}, "ingested_records": len(r.scan_results), "created_new_robot": False,
+    })
+
+    config = FleetConfig(
+        api_base="http://test", robots=20, interval=0.05, duration=0.5,
+        encoding=encoding, quiet=True, report_every=60,
+    )
+    with app.container.robot_service.override(providers.Object(service)):
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+        summary = await Fleet(config, client=client).run()
+        await client.aclose()
+
+    assert service.register_robot.await_count == 20
+    assert summary["packets"] > 20
+    assert summary["errors"] == {}
+    assert summary["e2e_ms"]["p99"] >= summary["e2e_ms"]["p50"] > 0
+
+
+@pytest.mark.asyncio
+async def test_retries_resend_same_idempotency_key():
+    """503 и 401 повторяются тем же кадром с тем же Idempotency-Key"""
+    seen = []
+    replies = iter([503, 401, 200])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/robots/register":
+            return httpx.Response(201, json={"token": f"token-{len(seen)}"})
+        seen.append((request.headers["idempotency-key"], request.headers["authorization"], request.content))
+        return httpx.Response(next(replies), json={"result": {"duplicate": False}})
+
+    config = FleetConfig(api_base="http://test", robots=1, quiet=True, retry_backoff=0.001)
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://test")
+    fleet = Fleet(config, client=client)
+    robot = fleet.robots[0]
+    await fleet.register(robot)
+
+    resp = await fleet._post_frame(robot, b"{}", {
+        "Authorization": f"Bearer {robot.token}", "Idempotency-Key": "run-1",
+    })
+    await client.aclose()
+
+    assert resp.status_code == 200
+    assert [key for key, _, _ in seen] == ["run-1"] * 3
+    assert seen[-1][1] == "Bearer token-2"  # после 401 — новый токен
+    assert fleet.stats.retries == 2
+    assert fleet.stats.errors == {"http_503": 1, "http_401": 1}
+
+
+class _FakeWs:
+    """Сервер отвечает на первый кадр ошибкой с seq=null (не разобрал сообщение), дальше молчит"""
+
+    def __init__(self):
+        self.sent = []
+        self.replies = asyncio.Queue()
+
+    async def send(self, message):
+        self.sent.append(message)
+        if len(self.sent) == 1:
+            self.replies.put_nowait(json.dumps({"type": "error", "seq": None, "detail": "Invalid JSON"}))
+
+    async def recv(self):
+        return await self.replies.get()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.mark.asyncio
+async def test_ws_unmatched_error_and_silence_do_not_hang(monkeypatch):
+    ws = _FakeWs()
+    monkeypatch.setattr(emulator, "websockets", SimpleNamespace(connect=lambda *a, **kw: ws))
+    config = FleetConfig(
+        api_base="http://test", robots=1, interval=0.05, duration=0.6, transport="ws",
+        quiet=True, report_every=60, reply_timeout=0.1,
+    )
+    async with httpx.AsyncClient(base_url="http://test") as client:
+        fleet = Fleet(config, client=client)
+        fleet.register_all = AsyncMock()
+        summary = await asyncio.wait_for(fleet.run(), 5)
+
+    assert summary["errors"]["ws_rejected"] == 1  # ошибка с seq=null — ответ на первый кадр
+    assert summary["errors"]["ws_timeout"] >= 2   # дальше ответов нет — кадры не висят
+    assert len(ws.sent) == 1 + summary["errors"]["ws_timeout"]
@@ -0,0 +1,125 @@
+from datetime import datetime, timezone
+
+import msgpack
+import pytest
+
+from app.schemas import robot_compact
+from app.schemas.robot import RobotBase
+
+
+BODY = {
+    "robot_id": "RB-001",
+    "timestamp": "2025-10-01T12:00:00Z",
+    "location": {"zone": "B", "row": 7, "shelf": 3},
+    "scan_results": [
+        {"product_id": "TEL-1", "product_name": "Роутер", "quantity": 42, "status": "OK"},
+        {"product_id": "TEL-2", "product_name": "Модем", "quantity": 4, "status": "CRITICAL"},
+    ],
+    "battery_level": 87.5,
+    "next_checkpoint": "B-7-4",
+    "status": "online",
+}
+
+
+def test_roundtrip_matches_json_validation():
+    """Компактный кадр декодируется в тот же RobotBase, что и JSON"""
+    [decoded] = robot_compact.decode_message(robot_compact.encode_frame(BODY))
+
+    assert decoded == RobotBase.model_validate(BODY)
+    assert decoded.last_update == datetime(2025, 10, 1, 12, tzinfo=timezone.utc)
+
+
+def test_product_name_sent_until_confirmed():
+    """Имя товара уходит, пока кадр с ним не подтверждён; после — не шлётся"""
+    known = set()
+    first = robot_compact.encode_frame(BODY, known_products=known)
+    # первый кадр получил 429/5xx — известным SKU он не сделал
+    assert robot_compact.encode_frame(BODY, known_products=known) == first
+
+    known |= robot_compact.named_products(BODY)
+    second = robot_compact.encode_frame(BODY, known_products=known)
+
+    assert known == {"TEL-1", "TEL-2"}
+    assert len(second) < len(first)
+    [decoded] = robot_compact.decode_message(second)
+    assert [s.product_name for s in decoded.scan_results] == [None, None]
+    assert [s.status for s in decoded.scan_results] == ["OK", "CRITICAL"]
+
+
+def test_batch_with_seq_and_default_robot_id():
+    """Массив кадров: seq на каждый кадр, robot_id из токена, битый кадр — ошибка только у него"""
+    good = robot_compact.frame_to_array(BODY, seq=1, include_robot_id=False)
+    bad = ["RB-001", 0, "A", "x", 1, 50.0, "A-1-1", None, [], 2]
+    message = msgpack.packb([good, bad], datetime=True)
+
+    (seq1, frame), (seq2, error) = robot_compact.decode_frames_with_seq(message, "RB-001")
+
+    assert seq1 == 1 and frame.robot_id == "RB-001"
+    assert seq2 == 2 and isinstance(error, robot_compact.CompactFrameError)
+
+
+@pytest.mark.parametrize("payload", [b"\xc1", msgpack.packb({"robot_id": "RB-001"}), msgpack.packb([1, 2])])
+def test_invalid_payload_rejected(payload):
+    with pytest.raises(robot_compact.CompactFrameError):
+        robot_compact.decode_message(payload)
+
+
+@pytest.mark.parametrize("scan", [
+    ["TEL-1", 4.7, 0],          # дробное количество не усекается молча
+    ["TEL-1", -1, 0],
+    ["TEL-1", True, 0],
+    ["TEL-1", 4, "BROKEN"],
+    ["TEL-1", 4, 0, 123],       # product_name не строка
+    ["TEL-1", 4, 0, ["x"]],
+])
+def test_invalid_scan_rejected(scan):
+    frame = robot_compact.frame_to_array(BODY)
+    frame[8] = [scan]
+    with pytest.raises(robot_compact.CompactFrameError):
+        robot_compact.decode_message(msgpack.packb(frame, datetime=True))
+
+
+@pytest.mark.parametrize("position, value", [
+    (2, None),           # zone не превращается в "None"
+    (3, 3.9),            # ряд не усекается
+    (4, True),           # bool — не полка 1
+    (5, float("nan")),
+    (5, float("inf")),
+    (5, "87"),
+    (6, {"a": 1}),
+    (7, 1),
+])
+def test_invalid_frame_field_rejected(position, value):
+    """Позиции кадра проверяются так же строго, как JSON-путь, без приведений"""
+    frame = robot_compact.frame_to_array(BODY)
+    frame[position] = value
+    with pytest.raises(robot_compact.CompactFrameError):
+        robot_compact.decode_message(msgpack.packb(frame, datetime=True))
+
+
+def test_idempotency_key_position():
+    """Ключ идемпотентности переживает компактный кадр — с seq и без него"""
+    keyed = {**BODY, "idempotency_key": "run-7"}
+    assert robot_compact.frame_to_array(keyed)[9:] == [None, "run-7"]
+
+    for frame in (robot_compact.frame_to_array(keyed), robot_compact.frame_to_array(keyed, seq=7)):
+        (seq, decoded), = robot_compact.decode_frames_with_seq(msgpack.packb(frame, datetime=True))
+        assert decoded.idempotency_key == "run-7"
+        assert decoded == RobotBase.model_validate(keyed)
+    assert seq == 7
+
+    frame = robot_compact.frame_to_array(BODY, seq=1)
+    for bad in (42, "x" * 101):
+        with pytest.raises(robot_compact.CompactFrameError):
+            robot_compact.decode_message(msgpack.packb(frame + [bad], datetime=True))
+
+
+def test_status_codes_match_scan_statuses():
+    from app.repo.inventory import SCAN_STATUSES
+
+    assert set(robot_compact.STATUS_CODES) == SCAN_STATUSES
+    frame = robot_compact.frame_to_array(BODY)
+    frame[8] = [["TEL-1", 4, "low_stock"]]
+    [decoded] = robot_compact.decode_message(msgpack.packb(frame, datetime=True))
+    assert decoded.scan_results[0].status == "low_stock"
+    assert decoded.idempotency_key is None  # необязательные поля — дефолты модели
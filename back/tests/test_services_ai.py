@@ -0,0 +1,182 @@
+import json
+
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services import ai as ai_module
+from app.schemas.ai import AIPredictionRequest
+from app.services.ai import AIService
+from benchmarks.openrouter_stub import make_stub_app
+
+
+MESSAGES = [
+    {"role": "system", "content": ai_module.SYSTEM_PROMPT},
+    {"role": "user", "content": ai_module._build_user_prompt(7, {"products": [
+        {"product_id": "SKU-1", "category": None, "optimal_stock": 100, "current_qty": 40, "history": []},
+    ]})},
+]
+
+
+@pytest.fixture(autouse=True)
+def openrouter_env(monkeypatch):
+    monkeypatch.setattr(ai_module, "OPENROUTER_API_KEY", "stub-key")
+    monkeypatch.setattr(ai_module, "OPENROUTER_MODELS", ["primary/model", "backup/model"])
+    monkeypatch.setattr(ai_module, "OPENROUTER_HEDGE_AFTER_SECONDS", None)
+
+
+def _service_for(stub) -> AIService:
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub))
+    return AIService(product_repo=None, inventory_repo=None, http_client=client)
+
+
+@pytest.mark.asyncio
+async def test_call_llm_uses_shared_client():
+    """Общий клиент из контейнера используется вместо одноразового"""
+    stub = make_stub_app()
+    svc = _service_for(stub)
+
+    text = await svc._call_llm(MESSAGES)
+
+    assert json.loads(text)["predictions"][0]["product_id"] == "SKU-1"
+    assert stub.state.calls == ["primary/model"]
+    assert not svc.http_client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_openrouter_client_registers_its_close():
+    """Shutdown не создаёт клиент ради aclose: закрытие регистрирует сама фабрика"""
+    from app.core.container import Container
+
+    assert Container.openrouter_client.kwargs["shutdown_hooks"] is Container.shutdown_hooks
+
+    hooks = []
+    client = ai_module.create_openrouter_client(shutdown_hooks=hooks)
+    assert hooks == [client.aclose]
+    for close in hooks:
+        await close()
+    assert client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_hedged_call_returns_backup_when_primary_slow(monkeypatch):
+    """Первичная модель тормозит — ответ берётся от резервной"""
+    monkeypatch.setattr(ai_module, "OPENROUTER_HEDGE_AFTER_SECONDS", 0.05)
+    stub = make_stub_app(latency_by_model={"primary/model": 2.0})
+    svc = _service_for(stub)
+
+    text = await svc._call_llm(MESSAGES)
+
+    assert json.loads(text)["confidence"] == 0.75
+    assert stub.state.calls == ["primary/model", "backup/model"]
+
+
+@pytest.mark.asyncio
+async def test_hedged_call_starts_backup_immediately_on_primary_failure(monkeypatch):
+    """Первичная модель упала сразу — резервная стартует без ожидания порога"""
+    monkeypatch.setattr(ai_module, "OPENROUTER_HEDGE_AFTER_SECONDS", 10.0)
+    stub = make_stub_app(failing_models={"primary/model"})
+    svc = _service_for(stub)
+
+    text = await svc._call_llm(MESSAGES)
+
+    assert json.loads(text)["predictions"]
+    assert stub.state.calls == ["primary/model", "backup/model"]
+
+
+def test_chunk_products_respects_budget_and_groups_categories():
+    """Каталог режется под бюджет токенов, товары одной категории идут подряд"""
+    products = [
+        {"product_id": f"SKU-{i}", "category": "B" if i % 2 else "A", "history": []}
+        for i in range(10)
+    ]
+
+    chunks = ai_module._chunk_products(products, token_budget=10_000, max_products=3)
+
+    assert [len(c) for c in chunks] == [3, 3, 3, 1]
+    flat = [p["category"] for c in chunks for p in c]
+    assert flat == sorted(flat)
+
+    one_per_chunk = ai_module._chunk_products(products, token_budget=1, max_products=100)
+    assert len(one_per_chunk) == 10
+
+
+@pytest.mark.asyncio
+async def test_predict_chunk_retries_only_failed_chunk(monkeypatch):
+    """Упавший чанк повторяется сам по себе"""
+    monkeypatch.setattr(ai_module, "AI_CHUNK_RETRIES", 1)
+    svc = AIService(product_repo=None, inventory_repo=None)
+    calls = []
+
+    async def flaky_call(messages, max_tokens=700):
+        calls.append(max_tokens)
+        if len(calls) == 1:
+            raise RuntimeError("LLM call failed")
+        return json.dumps({"predictions": [{"product_id": "SKU-1"}], "confidence": 1.7})
+
+    monkeypatch.setattr(svc, "_call_llm", flaky_call)
+
+    items, conf = await svc._predict_chunk(7, [{"product_id": "SKU-1"}])
+
+    assert items == [{"product_id": "SKU-1"}]
+    assert conf == 1.0
+    assert len(calls) == 2
+
+
+def _service_with_catalog(size: int, **kwargs) -> AIService:
+    product_repo = AsyncMock()
+    product_repo.list_all.return_value = [
+        MagicMock(id=f"SKU-{i}", category=None, optimal_stock=100) for i in range(size)
+    ]
+    inventory_repo = MagicMock()
+    inventory_repo.session.flush = AsyncMock()
+    svc = AIService(product_repo=product_repo, inventory_repo=inventory_repo, **kwargs)
+    svc._latest_quantity_by_product = AsyncMock(return_value={})
+    svc._history_compact = AsyncMock(return_value={})
+    return svc
+
+
+@pytest.mark.asyncio
+async def test_predict_local_mode_skips_llm(monkeypatch):
+    """В режиме local прогноз считается без OpenRouter"""
+    monkeypatch.setattr(ai_module, "AI_FORECAST_MODE", "local")
+    svc = _service_with_catalog(3)
+    svc._call_llm = AsyncMock()
+
+    result = await svc.predict(AIPredictionRequest(period_days=7))
+
+    assert [p.product_id for p in result.predictions] == ["SKU-0", "SKU-1", "SKU-2"]
+    svc._call_llm.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_predict_falls_back_to_local_when_llm_fails(monkeypatch):
+    """LLM недоступен -> локальный прогноз вместо ошибки"""
+    monkeypatch.setattr(ai_module, "AI_CHUNK_RETRIES", 0)
+    svc = _service_with_catalog(2)
+    svc._call_llm = AsyncMock(side_effect=RuntimeError("LLM call failed"))
+
+    result = await svc.predict(AIPredictionRequest(period_days=7))
+
+    assert len(result.predictions) == 2
+    assert result.predictions[0].expected_demand == 0
+
+
+def test_history_tail_stmt_ranks_per_product_in_postgres():
+    """Top-N сканов на товар считается оконной функцией, а не в Python"""
+    from datetime import datetime
+    from sqlalchemy.dialects import postgresql
+
+    sql = str(ai_module._history_tail_stmt(
+        ["SKU-1"], dt_from=datetime(2025, 10, 1), limit_per_product=32,
+    ).compile(dialect=postgresql.dialect()))
+
+    assert "row_number() OVER (PARTITION BY" in sql
+    assert "rn <=" in sql
+    assert "date_trunc" not in sql
+
+    daily = str(ai_module._history_tail_stmt(
+        ["SKU-1"], dt_from=datetime(2025, 10, 1), limit_per_product=32, daily=True,
+    ).compile(dialect=postgresql.dialect()))
+    assert "date_trunc" in daily
+    assert "day_rn" in daily
@@ -0,0 +1,132 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.repo.inventory import InventoryHistoryRepository
+from app.services.analytics import AnalyticsEngine
+from app.services.history import HistoryService
+from app.services.history_archive import HistoryArchive
+
+pytest.importorskip("duckdb")
+pytest.importorskip("pyarrow")
+
+NOW = datetime(2025, 10, 1, 12, 0)
+
+
+def _row(i: int, ts: datetime, product="TEL-1", status="OK", zone="A", qty=None) -> tuple:
+    return (i, "RB-001", product, qty if qty is not None else 10 + i, zone, 1, 2, status, ts, ts)
+
+
+class _FakeSource:
+    """Postgres-сторона синхронизации: stream_rows(after_id) и count_up_to."""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.after_ids = []
+
+    def __call__(self):
+        repo = AsyncMock(spec=InventoryHistoryRepository)
+        repo.session = MagicMock(close=AsyncMock())
+
+        async def stream_rows(*, after_id, batch_size):
+            self.after_ids.append(after_id)
+            rows = [r for r in self.rows if r[0] > after_id]
+            for i in range(0, len(rows), 2):
+                yield rows[i:i + 2]
+
+        async def count_up_to(max_id):
+            return sum(1 for r in self.rows if r[0] <= max_id)
+
+        repo.stream_rows = stream_rows
+        repo.count_up_to.side_effect = count_up_to
+        return repo
+
+
+@pytest.fixture
+def engine():
+    source = _FakeSource([
+        _row(1, NOW - timedelta(minutes=90), "TEL-1", "OK"),
+        _row(2, NOW - timedelta(minutes=30), "TEL-1", "LOW_STOCK", qty=3),
+        _row(3, NOW - timedelta(minutes=30, seconds=10), "TEL-2", "CRITICAL", zone="B"),
+        _row(4, NOW - timedelta(minutes=5), "TEL-2", None, zone="B", qty=7),
+    ])
+    engine = AnalyticsEngine(repo_factory=source)
+    engine.open()
+    engine.source = source
+    yield engine
+    engine._con.close()
+
+
+@pytest.mark.asyncio
+async def test_sync_then_aggregates(engine):
+    assert not engine.ready
+    assert await engine.sync() == 4
+    assert engine.ready
+
+    summary = await engine.summary()
+    assert summary == {"total": 4, "unique_products": 2, "OK": 1, "LOW_STOCK": 1, "CRITICAL": 1}
+    assert (await engine.summary(zones=["B"], statuses=["CRITICAL"]))["total"] == 1
+
+    activity = await engine.activity_last_hour(now=NOW)
+    assert activity == [(datetime(2025, 10, 1, 11, 29), 1), (datetime(2025, 10, 1, 11, 30), 1),
+                        (datetime(2025, 10, 1, 11, 55), 1)]
+
+    tail = await engine.history_tail(["TEL-1", "TEL-2"], dt_from=NOW - timedelta(days=1), limit_per_product=1)
+    assert [(pid, qty) for pid, _, qty, _ in tail] == [("TEL-1", 3), ("TEL-2", 7)]
+    assert await engine.latest_quantity(["TEL-1", "TEL-2", "TEL-9"]) == {"TEL-1": 3, "TEL-2": 7}
+
+
+@pytest.mark.asyncio
+async def test_sync_is_incremental_and_rebuilds_after_delete(engine):
+    await engine.sync()
+    engine.source.rows.append(_row(5, NOW, "TEL-3"))
+
+    await engine.sync()
+    assert engine.source.after_ids[-1] == 0  # хвост перечитывается (overlap), дублей нет
+    assert (await engine.summary())["total"] == 5
+
+    del engine.source.rows[0]
+    engine._next_reconcile = 0.0
+    await engine.sync()
+    assert (await engine.summary())["total"] == 4
+
+
+@pytest.mark.asyncio
+async def test_archive_is_queried_through_view(engine, tmp_path):
+    archive = HistoryArchive(tmp_path)
+    day = date(2025, 8, 1)
+    writer = archive.day_writer(day)
+    writer.write([_row(100, datetime(2025, 8, 1, 9), "TEL-9", "CRITICAL", zone="C")])
+    writer.commit()
+    archive.set_watermark(datetime(2025, 8, 2))
+    engine.archive = archive
+
+    await engine.sync()
+
+    summary = await engine.summary()
+    assert summary["total"] == 5 and summary["unique_products"] == 3 and summary["CRITICAL"] == 2
+    assert (await engine.summary(zones=["C"]))["total"] == 1
+
+
+@pytest.mark.asyncio
+async def test_history_service_routes_aggregates_to_analytics():
+    repo = AsyncMock(spec=InventoryHistoryRepository)
+    analytics = MagicMock(ready=True)
+    analytics.summary = AsyncMock(return_value={
+        "total": 1, "unique_products": 1, "OK": 1, "LOW_STOCK": 0, "CRITICAL": 0,
+    })
+    analytics.activity_last_hour = AsyncMock(return_value=[(NOW, 3)])
+    svc = HistoryService(repo=repo, analytics=analytics)
+
+    summary = await svc.get_summary(dt_from=None, dt_to=None, zones=None, statuses=None, product_id=None)
+    activity = await svc.get_activity_last_hour()
+
+    assert summary.total == 1 and activity.points[0].count == 3
+    repo.summary.assert_not_awaited()
+    repo.activity_last_hour.assert_not_awaited()
+
+    analytics.ready = False
+    repo.summary.return_value = {"total": 0, "unique_products": 0, "OK": 0, "LOW_STOCK": 0, "CRITICAL": 0}
+    await svc.get_summary(dt_from=None, dt_to=None, zones=None, statuses=None, product_id=None)
+    repo.summary.assert_awaited_once()
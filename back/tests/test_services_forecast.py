@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.forecast import StatisticalForecaster
+
+
+def _history(quantities, start=datetime(2025, 10, 1), step=timedelta(days=1)):
+    """История как в AIService._history_compact: от новых к старым"""
+    points = [
+        {"ts": (start + i * step).isoformat(), "qty": q, "status": "OK"}
+        for i, q in enumerate(quantities)
+    ]
+    return points[::-1]
+
+
+@pytest.fixture
+def forecaster():
+    return StatisticalForecaster()
+
+
+def test_steady_consumption(forecaster):
+    """Равномерный расход 10 шт/день -> спрос, дни до нуля и заказ по рецепту"""
+    products = [{
+        "product_id": "SKU-1",
+        "category": "net",
+        "optimal_stock": 100,
+        "current_qty": 50,
+        "history": _history([100, 90, 80, 70, 60, 50]),
+    }]
+
+    [f] = forecaster.forecast(products, period_days=7)
+
+    assert f.avg_daily_demand == pytest.approx(10.0)
+    assert f.expected_demand == 70
+    assert f.days_until_stockout == pytest.approx(5.0)
+    assert f.recommended_order_quantity == 50  # target = max(100, 70)
+    assert f.anomalous is False
+
+
+def test_restock_not_counted_as_demand(forecaster):
+    """Пополнение склада не уменьшает скорость расхода"""
+    products = [{
+        "product_id": "SKU-1",
+        "optimal_stock": 0,
+        "current_qty": 85,
+        "history": _history([50, 45, 40, 95, 90, 85]),
+    }]
+
+    [f] = forecaster.forecast(products, period_days=2)
+
+    assert f.avg_daily_demand == pytest.approx(5.0)
+    assert f.recommended_order_quantity == 0
+
+
+def test_no_history_is_anomalous_without_stockout(forecaster):
+    """Нет истории -> спрос 0, до нуля 'никогда', SKU отдаём LLM"""
+    [f] = forecaster.forecast(
+        [{"product_id": "SKU-1", "optimal_stock": 100, "current_qty": 30, "history": []}],
+        period_days=7,
+    )
+
+    assert f.expected_demand == 0
+    assert f.days_until_stockout is None
+    assert f.recommended_order_quantity == 70
+    assert f.anomalous is True
+
+
+def test_erratic_consumption_is_anomalous(forecaster):
+    """Сильный разброс скоростей расхода помечается как аномалия"""
+    products = [
+        {"product_id": "steady", "current_qty": 50, "history": _history([100, 90, 80, 70, 60, 50])},
+        {"product_id": "erratic", "current_qty": 9, "history": _history([100, 99, 98, 10, 9, 9])},
+    ]
+
+    steady, erratic = forecaster.forecast(products, period_days=7)
+
+    assert steady.anomalous is False
+    assert erratic.anomalous is True
+    assert erratic.confidence < steady.confidence
@@ -0,0 +1,214 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.repo.inventory import InventoryHistoryRepository
+from app.services.history import HistoryService
+from app.services.history_archive import HistoryArchive
+from app.workers.history_archiver import HistoryArchiver
+
+pytest.importorskip("pyarrow")
+
+
+def _row(i: int, day: date, zone: str, status="OK", product="TEL-1") -> tuple:
+    ts = datetime.combine(day, datetime.min.time()) + timedelta(minutes=i)
+    return (i, "RB-001", product, 10 + i, zone, 1, 2, status, ts, ts)
+
+
+def _fill(archive: HistoryArchive, rows_by_day) -> None:
+    for day, rows in rows_by_day.items():
+        writer = archive.day_writer(day)
+        writer.write(rows)
+        writer.commit()
+    archive.set_watermark(datetime.combine(max(rows_by_day) + timedelta(days=1), datetime.min.time()))
+
+
+@pytest.fixture
+def archive(tmp_path):
+    d1, d2 = date(2025, 9, 1), date(2025, 9, 2)
+    archive = HistoryArchive(tmp_path)
+    _fill(archive, {
+        d1: [_row(1, d1, "A"), _row(2, d1, "B", "CRITICAL", "TEL-2"), _row(3, d1, "A", None)],
+        d2: [_row(4, d2, "A", "LOW_STOCK"), _row(5, d2, "B")],
+    })
+    return archive
+
+
+@pytest.mark.asyncio
+async def test_archive_is_partitioned_and_filtered(archive, tmp_path):
+    assert sorted(p.relative_to(tmp_path).parts[:2] for p in tmp_path.rglob("*.parquet")) == [
+        ("day=2025-09-01", "zone=A"), ("day=2025-09-01", "zone=B"),
+        ("day=2025-09-02", "zone=A"), ("day=2025-09-02", "zone=B"),
+    ]
+
+    rows, total = await archive.list(zones=["A"], limit=10, sort_dir="asc")
+    assert total == 3
+    assert [r["id"] for r in rows] == [1, 3, 4]
+    assert rows[0]["zone"] == "A" and rows[1]["status"] is None
+
+    rows, total = await archive.list(dt_from=datetime(2025, 9, 2), limit=1, offset=1)
+    assert total == 2 and [r["id"] for r in rows] == [4]
+
+    summary = await archive.summary()
+    assert summary["total"] == 5
+    assert summary["products"] == {"TEL-1", "TEL-2"}
+    assert (summary["OK"], summary["LOW_STOCK"], summary["CRITICAL"]) == (2, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_archive_page_reads_only_sort_keys(tmp_path):
+    """Страницы совпадают с полной сортировкой; по диапазону читаются только ключи"""
+    day = date(2025, 9, 1)
+    rows = [_row(i, day, "ABC"[i % 3], product=f"TEL-{i % 4}") for i in range(1, 41)]
+    archive = HistoryArchive(tmp_path)
+    writer = archive.day_writer(day)
+    for i in range(0, len(rows), 7):  # несколько row group и файлов
+        writer.write(rows[i:i + 7])
+    writer.commit()
+    archive.set_watermark(datetime(2025, 9, 2))
+
+    dataset = archive._get_dataset()
+    scanned = []
+
+    class Recording:
+        def to_batches(self, **kw):
+            scanned.append(kw["columns"])
+            return dataset.to_batches(**kw, batch_size=5)
+
+        def to_table(self, **kw):
+            return dataset.to_table(**kw)
+
+    archive._get_dataset = Recording
+
+    expected = sorted(rows, key=lambda r: (r[2], r[0]), reverse=True)  # product_id, затем id
+    for offset in (0, 9, 35):
+        page, total = await archive.list(limit=10, offset=offset, sort_by="product_id")
+        assert total == 40
+        assert [r["id"] for r in page] == [r[0] for r in expected[offset:offset + 10]]
+    assert scanned and all(columns == ["product_id", "id"] for columns in scanned)
+
+
+def _hot_repo(hot_rows):
+    repo = AsyncMock(spec=InventoryHistoryRepository)
+    records = [dict(zip(
+        ("id", "robot_id", "product_id", "quantity", "zone", "row_number",
+         "shelf_number", "status", "scanned_at", "created_at"), r)) for r in hot_rows]
+
+    async def list_(*, limit, offset, sort_dir, **_):
+        ordered = sorted(records, key=lambda r: r["scanned_at"], reverse=sort_dir == "desc")
+        return ordered[offset:offset + max(limit, 0)], len(records)
+
+    repo.list.side_effect = list_
+    return repo
+
+
+@pytest.mark.asyncio
+async def test_history_page_spans_hot_and_archive(archive):
+    today = date(2025, 10, 1)
+    repo = _hot_repo([_row(10, today, "A"), _row(11, today, "A")])
+    svc = HistoryService(repo=repo, archive=archive)
+
+    page = await svc.get_history(
+        dt_from=None, dt_to=None, zones=None, statuses=None,
+        product_id=None, q=None, limit=3, offset=1,
+    )
+    assert page.total == 7
+    assert [r.id for r in page.items] == [10, 5, 4]
+
+    page = await svc.get_history(
+        dt_from=None, dt_to=None, zones=None, statuses=None,
+        product_id=None, q=None, limit=3, offset=4, sort_dir="asc",
+    )
+    assert [r.id for r in page.items] == [5, 10, 11]
+
+
+@pytest.mark.asyncio
+async def test_recent_range_does_not_touch_archive(archive):
+    repo = _hot_repo([_row(10, date(2025, 10, 1), "A")])
+    archive.list = AsyncMock()
+    svc = HistoryService(repo=repo, archive=archive)
+
+    page = await svc.get_history(
+        dt_from=datetime(2025, 9, 30), dt_to=None, zones=None, statuses=None,
+        product_id=None, q=None, limit=10, offset=0,
+    )
+    assert page.total == 1
+    archive.list.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_summary_merges_archive(archive):
+    repo = AsyncMock(spec=InventoryHistoryRepository)
+    repo.summary.return_value = {"total": 2, "unique_products": 2, "OK": 1, "LOW_STOCK": 0, "CRITICAL": 1}
+    repo.distinct_products.return_value = ["TEL-2", "TEL-3"]
+    svc = HistoryService(repo=repo, archive=archive)
+
+    result = await svc.get_summary(dt_from=None, dt_to=None, zones=None, statuses=None, product_id=None)
+
+    assert result.total == 7
+    assert result.unique_products == 3
+    assert (result.OK, result.LOW_STOCK, result.CRITICAL) == (3, 1, 2)
+
+
+def _archiver_repos(pending, commit=None):
+    """Фабрика репозиториев архиватора над словарём день -> строки вместо Postgres"""
+    def repo_factory():
+        repo = AsyncMock(spec=InventoryHistoryRepository)
+        repo.session = MagicMock(close=AsyncMock(), commit=commit or AsyncMock(), rollback=AsyncMock())
+        repo.session.bind.dialect.name = "sqlite"
+
+        async def oldest(before):
+            days = [d for d in pending if datetime.combine(d, datetime.min.time()) < before]
+            return datetime.combine(min(days), datetime.min.time()) if days else None
+
+        async def stream_rows(*, dt_from, dt_to, batch_size):
+            rows = pending[dt_from.date()]
+            for i in range(0, len(rows), 3):
+                yield rows[i:i + 3]
+
+        async def delete_range(*, dt_from, dt_to):
+            return len(pending.pop(dt_from.date()))
+
+        repo.oldest_scanned_before.side_effect = oldest
+        repo.stream_rows = stream_rows
+        repo.delete_scanned_range.side_effect = delete_range
+        return repo
+
+    return repo_factory
+
+
+@pytest.mark.asyncio
+async def test_archiver_moves_full_days_and_advances_watermark(tmp_path):
+    d1 = date(2025, 9, 1)
+    pending = {d1: [_row(i, d1, "AB"[i % 2]) for i in range(1, 8)]}
+
+    archive = HistoryArchive(tmp_path)
+    archiver = HistoryArchiver(_archiver_repos(pending), archive, hot_days=30, batch_size=3)
+
+    report = await archiver.run_once(now=datetime(2025, 10, 15, 12, 0))
+
+    assert report["days"] == 1 and report["rows"] == 7
+    assert archive.watermark() == datetime(2025, 9, 15)
+    assert not list(tmp_path.rglob("*.tmp"))
+    rows, total = await archive.list(limit=100)
+    assert total == 7
+    assert {r["zone"] for r in rows} == {"A", "B"}
+
+
+@pytest.mark.asyncio
+async def test_archiver_failed_commit_unpublishes_files(tmp_path):
+    """COMMIT после DELETE не прошёл — строки остались в Postgres, файлов дня в архиве нет"""
+    d1 = date(2025, 9, 1)
+    pending = {d1: [_row(i, d1, "AB"[i % 2]) for i in range(1, 8)]}
+    commit = AsyncMock(side_effect=RuntimeError("could not serialize access"))
+
+    archive = HistoryArchive(tmp_path)
+    archiver = HistoryArchiver(_archiver_repos(pending, commit), archive, hot_days=30, batch_size=3)
+
+    with pytest.raises(RuntimeError):
+        await archiver.run_once(now=datetime(2025, 10, 15, 12, 0))
+
+    commit.assert_awaited_once()
+    assert not list(tmp_path.rglob("*.parquet")) and not list(tmp_path.rglob("*.tmp"))
+    assert archive.watermark() is None
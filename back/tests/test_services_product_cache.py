@@ -0,0 +1,71 @@
+import pytest
+from unittest.mock import AsyncMock
+
+from app.services.cache import CacheService
+from app.services.product_cache import KnownProductsCache
+
+
+@pytest.fixture
+def mock_cache_service():
+    svc = AsyncMock(spec=CacheService)
+    svc.get_known_products.return_value = set()
+    return svc
+
+
+@pytest.mark.asyncio
+async def test_unknown_until_marked():
+    """Новые SKU считаются неизвестными, после mark_known — известными"""
+    cache = KnownProductsCache(max_size=10, ttl_seconds=60)
+
+    assert await cache.filter_unknown(["SKU-1", "SKU-2"]) == {"SKU-1", "SKU-2"}
+
+    await cache.mark_known(["SKU-1"])
+
+    assert await cache.filter_unknown(["SKU-1", "SKU-2"]) == {"SKU-2"}
+
+
+@pytest.mark.asyncio
+async def test_ttl_expiry(monkeypatch):
+    """Запись протухает по TTL"""
+    now = [1000.0]
+    monkeypatch.setattr("app.services.product_cache.time.monotonic", lambda: now[0])
+    cache = KnownProductsCache(ttl_seconds=10)
+
+    await cache.mark_known(["SKU-1"])
+    assert await cache.filter_unknown(["SKU-1"]) == set()
+
+    now[0] += 11
+    assert await cache.filter_unknown(["SKU-1"]) == {"SKU-1"}
+
+
+@pytest.mark.asyncio
+async def test_bounded_size_evicts_oldest():
+    """Кеш ограничен по размеру, вытесняется самый старый SKU"""
+    cache = KnownProductsCache(max_size=2, ttl_seconds=60)
+
+    await cache.mark_known(["SKU-1", "SKU-2", "SKU-3"])
+
+    assert len(cache) == 2
+    assert await cache.filter_unknown(["SKU-1", "SKU-3"]) == {"SKU-1"}
+
+
+@pytest.mark.asyncio
+async def test_shared_redis_lookup(mock_cache_service):
+    """SKU из общего множества Redis не вставляются и запоминаются локально"""
+    mock_cache_service.get_known_products.return_value = {"SKU-1"}
+    cache = KnownProductsCache(cache_service=mock_cache_service, ttl_seconds=60)
+
+    assert await cache.filter_unknown(["SKU-1", "SKU-2"]) == {"SKU-2"}
+
+    mock_cache_service.get_known_products.reset_mock()
+    assert await cache.filter_unknown(["SKU-1"]) == set()
+    mock_cache_service.get_known_products.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_redis_failure_falls_back_to_insert(mock_cache_service):
+    """Если Redis упал — считаем SKU неизвестными (вставка безопасна через ON CONFLICT)"""
+    mock_cache_service.get_known_products.side_effect = ConnectionError("down")
+    cache = KnownProductsCache(cache_service=mock_cache_service)
+
+    assert await cache.filter_unknown(["SKU-1"]) == {"SKU-1"}
@@ -0,0 +1,154 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from unittest.mock import AsyncMock, MagicMock
+
+from app.repo.inventory import ScanRow
+from app.repo.robot import RobotRepository
+from app.schemas.robot import RobotBase
+from app.services.scan_filter import LastScan, ScanChangeFilter, ScanSnapshot
+from app.services.robot import RobotService
+
+TS = datetime(2025, 10, 1, 12, tzinfo=timezone.utc)
+
+
+def _frame(robot_id: str, *scans: tuple) -> RobotBase:
+    return RobotBase.model_validate({
+        "robot_id": robot_id,
+        "timestamp": TS.isoformat(),
+        "location": {"zone": "B", "row": 4, "shelf": 2},
+        "scan_results": [
+            {"product_id": pid, "quantity": qty, "status": status} for pid, qty, status in scans
+        ],
+        "battery_level": 80,
+        "next_checkpoint": "B-5-1",
+    })
+
+
+def _service() -> RobotService:
+    session = MagicMock()
+
+    @asynccontextmanager
+    async def begin():
+        yield
+
+    session.begin = begin
+    session.flush = AsyncMock()
+    robot_repo = MagicMock()
+    robot_repo.upsert_robot = AsyncMock(side_effect=lambda f: (
+        MagicMock(robot_id=f.robot_id, status="active", last_update=TS), False,
+    ))
+    history_repo = MagicMock(session=session, insert_rows=AsyncMock(return_value=0))
+    product_repo = MagicMock(ensure_products_exist=AsyncMock())
+    return RobotService(robot_repo=robot_repo, product_repo=product_repo, history_repo=history_repo)
+
+
+@pytest.mark.asyncio
+async def test_batch_inserts_scan_rows():
+    svc = _service()
+
+    responses = await svc.process_robot_batch([
+        _frame("RB-001", ("TEL-1", 5, "critical"), ("TEL-2", 40, None)),
+        _frame("RB-002", ("TEL-1", 30, "OK")),
+    ])
+
+    [rows] = svc.history_repo.insert_rows.await_args.args
+    assert rows == [
+        ScanRow("RB-001", "TEL-1", 5, "B", 4, 2, "CRITICAL", TS),
+        ScanRow("RB-001", "TEL-2", 40, "B", 4, 2, None, TS),
+        ScanRow("RB-002", "TEL-1", 30, "B", 4, 2, "OK", TS),
+    ]
+    assert [r["ingested_records"] for r in responses] == [2, 1]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("scan", [("TEL-1", -1, "OK"), ("TEL-1", 5, "BROKEN")])
+async def test_invalid_scan_rejected_before_insert(scan):
+    svc = _service()
+
+    with pytest.raises(ValueError):
+        await svc.process_robot_batch([_frame("RB-001", scan)])
+    svc.history_repo.insert_rows.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_duplicate_frames_skip_writes():
+    svc = _service()
+    # ключ "k1" уже принят раньше: застолбить удаётся только "k2"
+    svc.robot_repo.claim_ingest_keys = AsyncMock(return_value={("RB-001", "k2")})
+    svc.robot_repo.prune_ingest_keys = AsyncMock(return_value=0)
+    frames = [
+        _frame("RB-001", ("TEL-1", 5, "OK")),
+        _frame("RB-001", ("TEL-2", 6, "OK")),
+        _frame("RB-001", ("TEL-2", 6, "OK")),
+    ]
+    for frame, key in zip(frames, ("k1", "k2", "k2")):
+        frame.idempotency_key = key
+
+    responses = await svc.process_robot_batch(frames)
+
+    [keys] = svc.robot_repo.claim_ingest_keys.await_args.args
+    assert keys == [("RB-001", "k1"), ("RB-001", "k2"), ("RB-001", "k2")]
+    [rows] = svc.history_repo.insert_rows.await_args.args
+    assert rows == [ScanRow("RB-001", "TEL-2", 6, "B", 4, 2, "OK", TS)]
+    # повтор в той же пачке — тоже дубль
+    assert [(r["duplicate"], r["ingested_records"]) for r in responses] == [(True, 0), (False, 1), (True, 0)]
+    svc.robot_repo.upsert_robot.assert_awaited_once_with(frames[1])
+
+
+@pytest.mark.asyncio
+async def test_all_duplicates_write_nothing():
+    svc = _service()
+    svc.robot_repo.claim_ingest_keys = AsyncMock(return_value=set())
+    frame = _frame("RB-001", ("TEL-1", 5, "OK"))
+    frame.idempotency_key = "k1"
+
+    [response] = await svc.process_robot_batch([frame])
+
+    assert response["duplicate"] and response["robot"]["robot_id"] == "RB-001"
+    svc.robot_repo.upsert_robot.assert_not_awaited()
+    svc.history_repo.insert_rows.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_store_on_change_skips_unchanged_scans():
+    svc = _service()
+    snapshot = ScanSnapshot({("TEL-1", "B", 4, 2): LastScan(5, "CRITICAL", 0.0, 0.0)}, 900, now=100.0)
+    svc.scan_filter = MagicMock(spec=ScanChangeFilter)
+    svc.scan_filter.snapshot = AsyncMock(return_value=snapshot)
+    svc.scan_filter.commit = AsyncMock()
+
+    [response] = await svc.process_robot_batch([
+        _frame("RB-001", ("TEL-1", 5, "critical"), ("TEL-2", 40, "OK")),
+    ])
+
+    [rows] = svc.history_repo.insert_rows.await_args.args
+    assert rows == [ScanRow("RB-001", "TEL-2", 40, "B", 4, 2, "OK", TS)]
+    assert response["ingested_records"] == 1
+    svc.robot_repo.upsert_robot.assert_awaited_once()  # состояние робота обновляется всегда
+    svc.scan_filter.commit.assert_awaited_once_with(snapshot)
+    assert snapshot.dirty[("TEL-1", "B", 4, 2)] == LastScan(5, "CRITICAL", 0.0, 100.0)
+
+
+@pytest.mark.asyncio
+async def test_ingest_keys_pruned_relative_to_db_now(monkeypatch):
+    """Граница окна — now() в SQL, а не наивное UTC-время из Python"""
+    session = MagicMock(execute=AsyncMock(return_value=MagicMock(rowcount=3)))
+    assert await RobotRepository(session).prune_ingest_keys(timedelta(hours=1)) == 3
+    [stmt] = session.execute.await_args.args
+    compiled = stmt.compile(dialect=postgresql.dialect())
+    assert "ingest_keys.created_at < now() - %(now_1)s" in str(compiled)
+    assert compiled.params["now_1"] == timedelta(hours=1)
+
+    monkeypatch.setattr(RobotService, "_next_keys_prune", 0.0)
+    svc = _service()
+    svc.idempotency_window = 600
+    svc.robot_repo.claim_ingest_keys = AsyncMock(return_value={("RB-001", "k1")})
+    svc.robot_repo.prune_ingest_keys = AsyncMock(return_value=0)
+    frame = _frame("RB-001", ("TEL-1", 5, "OK"))
+    frame.idempotency_key = "k1"
+
+    await svc.process_robot_batch([frame])
+    svc.robot_repo.prune_ingest_keys.assert_awaited_once_with(timedelta(seconds=600))
@@ -0,0 +1,83 @@
+from datetime import datetime
+
+import pytest
+from unittest.mock import AsyncMock
+
+from app.repo.inventory import ScanRow
+from app.services.cache import CacheService
+from app.services.scan_filter import ScanChangeFilter
+
+TS = datetime(2025, 10, 1, 12)
+
+
+def _row(quantity: int, status: str = "OK", product_id: str = "TEL-1") -> ScanRow:
+    return ScanRow("RB-001", product_id, quantity, "A", 3, 2, status, TS)
+
+
+def _slot(row: ScanRow):
+    return row.product_id, row.zone, row.row_number, row.shelf_number
+
+
+@pytest.fixture
+def redis_hash():
+    """CacheService поверх словаря вместо хеша Redis"""
+    store = {}
+    svc = AsyncMock(spec=CacheService)
+    svc.get_shelf_scans.side_effect = lambda fields: [store.get(f) for f in fields]
+    svc.set_shelf_scans.side_effect = lambda scans, ttl_seconds: store.update(scans)
+    return svc
+
+
+async def _ingest(scan_filter: ScanChangeFilter, *rows: ScanRow) -> list:
+    snapshot = await scan_filter.snapshot(_slot(r) for r in rows)
+    kept = [r for r in rows if snapshot.keep(r)]
+    await scan_filter.commit(snapshot)
+    return kept
+
+
+@pytest.mark.asyncio
+async def test_only_changes_are_kept(redis_hash):
+    """Повторный скан с тем же количеством не пишется, изменение — пишется"""
+    scan_filter = ScanChangeFilter(redis_hash, enabled=True, heartbeat_seconds=900)
+
+    assert await _ingest(scan_filter, _row(10), _row(5, product_id="TEL-2")) == [
+        _row(10), _row(5, product_id="TEL-2"),
+    ]
+    assert await _ingest(scan_filter, _row(10), _row(5, product_id="TEL-2")) == []
+    assert await _ingest(scan_filter, _row(9, "LOW_STOCK"), _row(5, product_id="TEL-2")) == [_row(9, "LOW_STOCK")]
+    # повтор полки внутри пачки сравнивается с предыдущим сканом пачки
+    assert await _ingest(scan_filter, _row(9, "LOW_STOCK"), _row(2, "CRITICAL"), _row(2, "CRITICAL")) == [
+        _row(2, "CRITICAL"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_writes_unchanged_scan(redis_hash, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.services.scan_filter.time.time", lambda: now[0])
+    scan_filter = ScanChangeFilter(redis_hash, enabled=True, heartbeat_seconds=60)
+
+    assert await _ingest(scan_filter, _row(10)) == [_row(10)]
+    now[0] += 59
+    assert await _ingest(scan_filter, _row(10)) == []
+    # seen_at обновился, но heartbeat отсчитывается от последней записанной строки
+    now[0] += 1
+    assert await _ingest(scan_filter, _row(10)) == [_row(10)]
+
+
+@pytest.mark.asyncio
+async def test_no_redis_or_rollback_keeps_everything(redis_hash):
+    """Без Redis фильтр не решает ничего; без commit изменение не забывается"""
+    assert await ScanChangeFilter(None, enabled=True).snapshot([_slot(_row(1))]) is None
+    assert await ScanChangeFilter(redis_hash, enabled=False).snapshot([_slot(_row(1))]) is None
+
+    redis_hash.get_shelf_scans.side_effect = ConnectionError("down")
+    assert await ScanChangeFilter(redis_hash, enabled=True).snapshot([_slot(_row(1))]) is None
+
+    redis_hash.get_shelf_scans.side_effect = lambda fields: [None] * len(fields)
+    scan_filter = ScanChangeFilter(redis_hash, enabled=True)
+    snapshot = await scan_filter.snapshot([_slot(_row(1))])
+    assert snapshot.keep(_row(1))
+    # транзакция откатилась — commit не вызывали, следующий скан снова пишется
+    snapshot = await scan_filter.snapshot([_slot(_row(1))])
+    assert snapshot.keep(_row(1))
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.schemas.ai import AIPredictionRequest, AIPredictionResponse, ProductPrediction
+from app.services.cache import CacheService
+from app.workers.prediction_jobs import PredictionJobManager
+
+
+def _make_ai_service(result: AIPredictionResponse):
+    svc = MagicMock()
+    svc.predict = AsyncMock(return_value=result)
+    svc.inventory_repo.session = AsyncMock()
+    svc.product_repo.session = AsyncMock()
+    return svc
+
+
+@pytest.fixture
+def prediction():
+    return AIPredictionResponse(
+        predictions=[ProductPrediction(product_id="SKU-1", expected_demand=5)],
+        confidence=0.7,
+    )
+
+
+@pytest.fixture
+def mock_cache_service():
+    svc = AsyncMock(spec=CacheService)
+    svc.get_data_version.return_value = 3
+    svc.get_ai_result.return_value = None
+    svc.get_ai_job.return_value = None
+    return svc
+
+
+@pytest.mark.asyncio
+async def test_submit_runs_in_background(monkeypatch, prediction):
+    """Задача возвращается сразу, результат появляется после выполнения"""
+    monkeypatch.setattr("app.workers.prediction_jobs.notify_prediction_ready", AsyncMock())
+    ai_svc = _make_ai_service(prediction)
+    manager = PredictionJobManager(ai_service_factory=lambda: ai_svc)
+
+    job = await manager.submit(AIPredictionRequest(period_days=7))
+    assert job.status == "pending"
+
+    await asyncio.gather(*manager._tasks)
+
+    done = await manager.get_job(job.job_id)
+    assert done.status == "done"
+    assert done.result == prediction
+    ai_svc.inventory_repo.session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_failed_prediction_marks_job_failed(monkeypatch):
+    """Ошибка LLM -> статус failed с текстом ошибки"""
+    monkeypatch.setattr("app.workers.prediction_jobs.notify_prediction_ready", AsyncMock())
+    ai_svc = _make_ai_service(None)
+    ai_svc.predict.side_effect = RuntimeError("LLM call failed")
+    manager = PredictionJobManager(ai_service_factory=lambda: ai_svc)
+
+    job = await manager.submit(AIPredictionRequest(period_days=7))
+    await asyncio.gather(*manager._tasks)
+
+    failed = await manager.get_job(job.job_id)
+    assert failed.status == "failed"
+    assert "LLM call failed" in failed.error
+    ai_svc.inventory_repo.session.rollback.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_returns_done_without_llm(mock_cache_service, prediction):
+    """Одинаковый запрос в окне свежести отдаётся из кеша"""
+    mock_cache_service.get_ai_result.return_value = prediction.model_dump(mode="json")
+    factory = MagicMock()
+    manager = PredictionJobManager(ai_service_factory=factory, cache_service=mock_cache_service)
+
+    job = await manager.submit(AIPredictionRequest(period_days=7))
+
+    assert job.status == "done"
+    assert job.cached is True
+    assert job.result == prediction
+    factory.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_cache_key_depends_on_data_version(mock_cache_service):
+    """Ключ не зависит от регистра/порядка категорий, но меняется с версией данных"""
+    manager = PredictionJobManager(ai_service_factory=MagicMock(), cache_service=mock_cache_service)
+
+    k1 = await manager.cache_key(AIPredictionRequest(period_days=7, categories=["B", "a"]))
+    k2 = await manager.cache_key(AIPredictionRequest(period_days=7, categories=["A", "b"]))
+    mock_cache_service.get_data_version.return_value = 4
+    k3 = await manager.cache_key(AIPredictionRequest(period_days=7, categories=["A", "b"]))
+
+    assert k1 == k2
+    assert k1 != k3
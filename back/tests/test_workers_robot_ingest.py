@@ -0,0 +1,184 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from dependency_injector import providers
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock
+
+from app.core.security import SecurityManager
+from app.schemas.robot import RobotBase
+from app.services.robot import validate_scans
+from app.workers.robot_ingest import RobotIngestBatcher
+
+
+def _frame(robot_id: str = "RB-001", scans: int = 1) -> dict:
+    return {
+        "robot_id": robot_id,
+        "timestamp": datetime(2025, 10, 1, tzinfo=timezone.utc).isoformat(),
+        "location": {"zone": "A", "row": 1, "shelf": 1},
+        "scan_results": [
+            {"product_id": f"TEL-{i}", "quantity": 10, "status": "OK"} for i in range(scans)
+        ],
+        "battery_level": 90.0,
+        "next_checkpoint": "A-1-2",
+    }
+
+
+def _fake_service(batches: list, fail: bool = False):
+    async def process_robot_batch(frames):
+        batches.append([f.robot_id for f in frames])
+        if fail:
+            raise RuntimeError("db down")
+        for f in frames:
+            validate_scans(f)  # как RobotService: плохой скан валит всю пачку
+        return [
+            {"robot": {}, "ingested_records": len(f.scan_results), "created_new_robot": False}
+            for f in frames
+        ]
+
+    service = MagicMock()
+    service.process_robot_batch = process_robot_batch
+    service.history_repo.session.close = AsyncMock()
+    return service
+
+
+@pytest.mark.asyncio
+async def test_frames_from_several_robots_written_in_one_batch():
+    """Кадры, пришедшие в окно max_delay, пишутся одной пачкой"""
+    batches = []
+    batcher = RobotIngestBatcher(lambda: _fake_service(batches), max_batch=10, max_delay=0.05)
+
+    futures = [
+        await batcher.submit(RobotBase.model_validate(_frame(f"RB-00{i}", scans=i)))
+        for i in range(1, 4)
+    ]
+    results = await asyncio.gather(*futures)
+    await batcher.shutdown()
+
+    assert batches == [["RB-001", "RB-002", "RB-003"]]
+    assert [r["ingested_records"] for r in results] == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_batch_size_limit_and_failure_propagates():
+    """Пачка не больше max_batch; ошибка записи приходит в future каждого кадра"""
+    batches = []
+    batcher = RobotIngestBatcher(lambda: _fake_service(batches, fail=True), max_batch=2, max_delay=0.05)
+
+    futures = [await batcher.submit(RobotBase.model_validate(_frame())) for _ in range(3)]
+    results = await asyncio.gather(*futures, return_exceptions=True)
+    await batcher.shutdown()
+
+    assert [len(b) for b in batches] == [2, 1]
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_factory_failure_releases_batch():
+    """Упавшая фабрика сервиса не вешает кадры пачки и не съедает слот записи"""
+    batches = []
+    factories = iter([RuntimeError("pool exhausted"), _fake_service(batches)])
+
+    def factory():
+        item = next(factories)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    batcher = RobotIngestBatcher(factory, max_batch=10, max_delay=0.01, max_concurrent_flushes=1)
+
+    failed = await batcher.submit(RobotBase.model_validate(_frame()))
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(failed, 1)
+    ok = await batcher.submit(RobotBase.model_validate(_frame()))
+    assert (await asyncio.wait_for(ok, 1))["ingested_records"] == 1
+    await batcher.shutdown()
+
+
+def test_ws_robots_acks_each_frame():
+    """/ws/robots: авторизация один раз, ack на каждый кадр, чужой robot_id отклоняется"""
+    from main import app
+
+    batches = []
+    batcher = RobotIngestBatcher(lambda: _fake_service(batches), max_batch=50, max_delay=0.01)
+    token = SecurityManager.create_access_token(subject="RB-001", token_type="robot", expires_delta=None)
+
+    with app.container.robot_ingest_batcher.override(providers.Object(batcher)):
+        client = TestClient(app)
+        with client.websocket_connect(
+            "/ws/robots", headers={"Authorization": f"Bearer {token}"}
+        ) as ws:
+            ws.send_json({**_frame(scans=2), "seq": 1})
+            ws.send_json([{**_frame(), "seq": 2}, {**_frame("RB-999"), "seq": 3}])
+            frame_without_id = _frame()
+            frame_without_id.pop("robot_id")
+            ws.send_json({**frame_without_id, "seq": 4})
+
+            replies = {}
+            for _ in range(4):
+                msg = ws.receive_json()
+                replies[msg["seq"]] = msg
+
+    assert replies[1] == {"type": "ack", "seq": 1, "ingested_records": 2, "created_new_robot": False}
+    assert replies[2]["type"] == "ack"
+    assert replies[3]["type"] == "error"
+    assert "mismatch" in replies[3]["detail"]
+    assert replies[4]["type"] == "ack"
+    assert sum(len(b) for b in batches) == 3
+
+
+def test_ws_robots_accepts_compact_binary_frames():
+    """Бинарные сообщения в /ws/robots — компактные msgpack-кадры"""
+    from main import app
+    from app.schemas import robot_compact
+
+    batches = []
+    batcher = RobotIngestBatcher(lambda: _fake_service(batches), max_batch=50, max_delay=0.01)
+    token = SecurityManager.create_access_token(subject="RB-001", token_type="robot", expires_delta=None)
+
+    with app.container.robot_ingest_batcher.override(providers.Object(batcher)):
+        client = TestClient(app)
+        with client.websocket_connect(
+            "/ws/robots", headers={"Authorization": f"Bearer {token}"}
+        ) as ws:
+            ws.send_bytes(robot_compact.encode_frame(_frame(scans=3), seq=7, include_robot_id=False))
+            reply = ws.receive_json()
+
+    assert reply == {"type": "ack", "seq": 7, "ingested_records": 3, "created_new_robot": False}
+    assert batches == [["RB-001"]]
+
+
+def test_ws_robots_rejects_bad_scan_without_failing_batch():
+    """Кадр с плохим сканом получает свою ошибку, кадры других роботов в той же пачке — ack"""
+    from main import app
+
+    batches = []
+    batcher = RobotIngestBatcher(lambda: _fake_service(batches), max_batch=50, max_delay=0.2)
+    headers = {
+        robot_id: {"Authorization": "Bearer " + SecurityManager.create_access_token(
+            subject=robot_id, token_type="robot", expires_delta=None,
+        )}
+        for robot_id in ("RB-001", "RB-002")
+    }
+    bad_status = _frame()
+    bad_status["scan_results"][0]["status"] = "BROKEN"
+    bad_quantity = _frame()
+    bad_quantity["scan_results"][0]["quantity"] = -1
+
+    with app.container.robot_ingest_batcher.override(providers.Object(batcher)):
+        client = TestClient(app)
+        with client.websocket_connect("/ws/robots", headers=headers["RB-001"]) as ws1, \
+                client.websocket_connect("/ws/robots", headers=headers["RB-002"]) as ws2:
+            ws1.send_json([{**_frame(), "seq": 1}, {**bad_status, "seq": 2}, {**bad_quantity, "seq": 3}])
+            ws2.send_json({**_frame("RB-002", scans=2), "seq": 1})
+            replies = {}
+            for _ in range(3):
+                msg = ws1.receive_json()
+                replies[msg["seq"]] = msg
+            other = ws2.receive_json()
+
+    assert [replies[seq]["type"] for seq in (1, 2, 3)] == ["ack", "error", "error"]
+    assert "BROKEN" in replies[2]["detail"]
+    assert other == {"type": "ack", "seq": 1, "ingested_records": 2, "created_new_robot": False}
+    assert batches == [["RB-001", "RB-002"]]